@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_xyyl.settings')
+# 在 ASGI 下为读接口启用原生异步视图（见 settings.ASYNC_API_VIEWS）
+os.environ.setdefault('DJANGO_ASYNC_API_VIEWS', '1')
 
 application = get_asgi_application()
@@ -92,7 +92,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework 配置
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # 从缓存读取已认证的用户（连同用户资料），见 user_management/authentication.py
+        'user_management.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -100,8 +101,60 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'EXCEPTION_HANDLER': 'backend_xyyl.utils.custom_exception_handler',
+    # 基于 orjson 的 JSON 渲染和解析，未安装 orjson 时自动退回标准库 json
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend_xyyl.utils.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'backend_xyyl.utils.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# 缓存配置
+# 本地开发使用进程内缓存；生产环境需要使用多个 worker 共享的后端（见 production.py）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
 }
 
+# 健康统计结果缓存时间（秒），写入新数据时会通过版本号立即失效
+HEALTH_STATISTICS_CACHE_TIMEOUT = 600
+
+# granularity=auto 时健康统计趋势数据默认最多返回的点数（可通过 max_points 参数调整）；
+# 其他粒度只在请求指定 max_points 时降采样
+HEALTH_STATISTICS_MAX_POINTS = 300
+
+# NDJSON 流式导入：请求体最大字节数，以及每次校验并提交的记录数
+HEALTH_INGEST_MAX_BODY_SIZE = 64 * 1024 * 1024
+HEALTH_INGEST_CHUNK_SIZE = 1000
+
+# 读接口（健康记录列表、统计和当前用户信息）是否使用原生异步视图。
+# asgi.py 在加载配置前设置 DJANGO_ASYNC_API_VIEWS=1，WSGI 部署仍使用同步视图
+ASYNC_API_VIEWS = os.environ.get('DJANGO_ASYNC_API_VIEWS') == '1'
+
+# 健康记录保留在原始表中的天数，更早的整月数据由 archive_health_records 命令压缩归档
+HEALTH_ARCHIVE_AFTER_DAYS = 90
+
+# 微信开放接口：地址（压测时可指向 wechat_stub_server 启动的本地模拟服务）、
+# 连接/读取超时（秒）、失败重试次数和每个进程的连接池大小
+WECHAT_API_BASE_URL = os.environ.get('WECHAT_API_BASE_URL', 'https://api.weixin.qq.com')
+WECHAT_API_CONNECT_TIMEOUT = 3.05
+WECHAT_API_READ_TIMEOUT = 5
+WECHAT_API_RETRIES = 2
+WECHAT_API_POOL_SIZE = 10
+# 同一个登录 code 换取的 openid 和用户在缓存中保存的时间（秒），期间的重复登录请求不再访问微信接口
+WECHAT_LOGIN_CACHE_TIMEOUT = 60
+
+# 认证用户缓存时间（秒），用户或用户资料保存后会通过版本号立即失效
+AUTH_USER_CACHE_TIMEOUT = 300
+# 进程内认证用户缓存：确认版本号后直接使用的秒数（其他 worker 停用用户或修改密码后最多延迟这么久生效）和用户数上限
+AUTH_USER_LOCAL_TTL = 5
+AUTH_USER_LOCAL_SIZE = 10000
+
 # JWT基础配置
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -117,8 +170,19 @@ SIMPLE_JWT = {
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    # 黑名单检查使用进程内 LRU 和共享缓存，吊销和记录令牌的语句更少（见 user_management/revocation.py）
+    'TOKEN_REFRESH_SERIALIZER': 'user_management.serializers.TokenRefreshSerializer',
+    # 登录时 last_login 先进入缓冲区，批量写入（见 user_management/last_login.py）
+    'TOKEN_OBTAIN_SERIALIZER': 'user_management.serializers.TokenObtainPairSerializer',
 }
 
+# 进程内缓存的已吊销刷新令牌数量上限
+TOKEN_BLACKLIST_LRU_SIZE = 10000
+
+# 最后登录时间的批量写入：缓冲的用户数达到上限或距上次写入超过间隔（秒）时写入
+LAST_LOGIN_FLUSH_INTERVAL = 10
+LAST_LOGIN_FLUSH_SIZE = 200
+
 # CORS基础配置
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = [
@@ -28,9 +28,9 @@ CORS_ALLOWED_ORIGINS = [
     "https://servicewechat.com",
 ]
 
-# 微信小程序配置
-WECHAT_APP_ID = 'wx1a1bc043dae03c3e'
-WECHAT_APP_SECRET = '28c9f799686403a0cb8c5412d14e76a7'
+# 微信小程序配置（AppSecret 只从环境变量读取，不写入代码库）
+WECHAT_APP_ID = os.environ.get('WECHAT_APP_ID', 'wx1a1bc043dae03c3e')
+WECHAT_APP_SECRET = os.environ.get('WECHAT_APP_SECRET', '')
 
 # 邮件配置
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # 开发环境使用控制台输出
@@ -40,7 +40,8 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'your-email@example.com'
 EMAIL_HOST_PASSWORD = 'your-email-password'
 
-# 日志配置
+# 日志配置（logs/ 目录不纳入版本库，启动时自动创建）
+os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -80,5 +81,9 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        # urllib3 的 DEBUG 日志包含完整请求地址，微信接口的查询参数中有 AppSecret
+        'urllib3': {
+            'level': 'INFO',
+        },
     },
 } 
\ No newline at end of file
@@ -16,6 +16,28 @@ DATABASES = {
     }
 }
 
+# 缓存配置
+# 多个 gunicorn worker 需要共享统计缓存的版本号、登录会话和令牌黑名单等数据。
+# 设置 REDIS_URL 时使用 Redis（需要安装 redis 包）；否则退回数据库缓存，
+# 每次缓存读写都是一条 SQL，写入还会争抢 SQLite 的写锁，首次部署需执行 python manage.py createcachetable
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            # 令牌黑名单要求未过期的吊销条目不被淘汰，默认的 300 条远远不够
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 # 静态文件配置
 STATIC_ROOT = '/home/wyw123/backend_xyyl/static'
 STATIC_URL = '/static/'
@@ -33,7 +55,7 @@ CORS_ALLOWED_ORIGINS = [
 
 # 微信小程序配置
 WECHAT_APP_ID = os.environ.get('WECHAT_APP_ID', 'wx1a1bc043dae03c3e')
-WECHAT_APP_SECRET = os.environ.get('WECHAT_APP_SECRET', '28c9f799686403a0cb8c5412d14e76a7')
+WECHAT_APP_SECRET = os.environ.get('WECHAT_APP_SECRET', '')
 
 # 邮件配置
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -0,0 +1,97 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, MethodNotAllowed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .async_auth import AsyncJWTAuthentication
+from .fast_json import FastJSONRenderer
+
+
+class AsyncAPIView(View):
+    """
+    把 DRF 视图集的某个只读动作以原生异步视图提供（ASGI 部署时使用）
+
+    DRF 的视图只能同步执行，在 ASGI 下每个请求都要占用线程池中的一个线程。
+    这里只做 DRF 请求处理流程中与 I/O 有关的部分：异步 JWT 认证（要求登录）、
+    调用视图集上以 a 开头的异步动作（如 alist），错误交给 EXCEPTION_HANDLER 生成相同结构的响应，
+    结果用 FastJSONRenderer 输出。GET 以外的请求转交给同一视图集的同步视图。
+
+        AsyncAPIView.as_view(viewset_class=HealthRecordViewSet, action='list', sync_actions={'post': 'create'})
+    """
+    viewset_class = None
+    action = None
+    # GET 以外的方法 -> 同步视图集的动作
+    sync_actions = None
+    # 认证时读取用户使用的查询集，默认 User.objects.all()
+    user_queryset = None
+    sync_view = None
+    # 默认使用 DEFAULT_AUTHENTICATION_CLASSES 中第一个支持异步认证（定义了 aauthenticate）的类
+    authentication_class = None
+    renderer_class = FastJSONRenderer
+    # 请求统一由异步的 dispatch 处理，不按方法定义处理函数
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        sync_actions = initkwargs.get('sync_actions', cls.sync_actions)
+        if sync_actions:
+            initkwargs['sync_view'] = initkwargs.get('viewset_class', cls.viewset_class).as_view(sync_actions)
+        # 与 DRF 视图一致，使用令牌认证的接口不做 CSRF 检查
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.sync_view is not None and request.method.lower() in self.sync_actions:
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+        self.args, self.kwargs = args, kwargs
+        self.request = Request(request)
+        self.authenticator = self.get_authentication_class()()
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise MethodNotAllowed(request.method)
+            self.request.user = await self.authenticate(request)
+            viewset = self.viewset_class(
+                request=self.request, args=args, kwargs=kwargs, format_kwarg=None, action=self.action,
+            )
+            response = await getattr(viewset, f'a{self.action}')(self.request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.render(response)
+
+    def get_authentication_class(self):
+        if self.authentication_class is not None:
+            return self.authentication_class
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            if hasattr(authentication_class, 'aauthenticate'):
+                return authentication_class
+        return AsyncJWTAuthentication
+
+    async def authenticate(self, request):
+        result = await self.authenticator.aauthenticate(request, self.user_queryset)
+        if result is None:
+            raise NotAuthenticated()
+        return result[0]
+
+    def handle_exception(self, exc):
+        """与 APIView.handle_exception 一致：认证失败返回 401 并带 WWW-Authenticate 头"""
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            exc.auth_header = self.authenticator.authenticate_header(self.request)
+        context = {'view': self, 'args': self.args, 'kwargs': self.kwargs, 'request': self.request}
+        response = api_settings.EXCEPTION_HANDLER(exc, context)
+        if response is None:
+            raise exc
+        return response
+
+    def render(self, response):
+        """把 DRF Response 渲染为 HttpResponse，保留状态码和自定义响应头"""
+        renderer = self.renderer_class()
+        rendered = HttpResponse(
+            renderer.render(response.data), status=response.status_code, content_type=renderer.media_type,
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                rendered[header] = value
+        return rendered
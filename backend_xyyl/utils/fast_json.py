@@ -0,0 +1,69 @@
+"""
+基于 orjson 的 JSON 渲染器和解析器
+
+输出与 DRF 默认的 JSONRenderer / JSONParser 保持一致：
+- 紧凑格式、非 ASCII 字符（中文提示信息）直接以 UTF-8 输出
+- Decimal、datetime、date、time、Promise 等由 DRF 的 JSONEncoder.default 转换，
+  datetime 的 UTC 偏移同样输出为 Z
+- U+2028 / U+2029 转义为 \\u2028 / \\u2029
+需要缩进输出（Accept 中带 indent 参数、可浏览 API）、编码失败或未安装 orjson 时，
+退回 DRF 基于标准库 json 的实现。
+"""
+import codecs
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders, json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_default = encoders.JSONEncoder().default
+
+if orjson is not None:
+    # datetime/date/time 交给 DRF 的编码规则，非字符串键与标准库一样转为字符串
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """可替换 DRF JSONRenderer 的 orjson 渲染器"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            # 超过 64 位的整数等 orjson 不支持的情况
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """可替换 DRF JSONParser 的 orjson 解析器"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = get_encoding(parser_context or {})
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # 用标准库再解析一次：超过 64 位的整数等可以正常解析，错误信息也与原解析器一致
+            try:
+                parse_constant = json.strict_constant if self.strict else None
+                return json.loads(body.decode(encoding), parse_constant=parse_constant)
+            except ValueError as exc:
+                raise ParseError('JSON parse error - %s' % str(exc))
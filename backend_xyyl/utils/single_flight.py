@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并对同一个键的并发计算，并把结果短时间缓存
+
+    同一进程内的并发调用由第一个线程计算，其余线程等待它的结果；
+    不同 worker 之间通过缓存后端的 add 实现互斥锁，未抢到锁的 worker 轮询缓存等待结果。
+    计算成功后结果保存 timeout 秒，期间的重复调用直接读取缓存。计算抛出异常时不缓存，
+    同一进程内等待的线程收到相同的异常，其他 worker 在锁释放后自行重试。
+    配合共享后端（数据库缓存、Redis 等）才能在多个 gunicorn worker 间生效。
+
+    lock_timeout 需要大于一次计算的最长耗时，否则锁过期后其他 worker 会重复计算。
+    """
+
+    def __init__(self, namespace, timeout=60, lock_timeout=30, poll_interval=0.05, alias='default'):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _keys(self, key):
+        digest = hashlib.md5(str(key).encode('utf-8')).hexdigest()
+        return f'{self.namespace}:result:{digest}', f'{self.namespace}:lock:{digest}'
+
+    def do(self, key, compute):
+        """
+        返回 (结果, 是否共享了其他调用的结果)
+
+        等待超过 lock_timeout 仍未得到结果时抛出 TimeoutError
+        """
+        result_key, lock_key = self._keys(key)
+        value = self.cache.get(result_key, _MISSING)
+        if value is not _MISSING:
+            return value, True
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.event.wait(self.lock_timeout):
+                raise TimeoutError(f'等待 {self.namespace} 的计算结果超时')
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value, shared = self._do_shared(result_key, lock_key, compute)
+            return call.value, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            call.event.set()
+            with self._lock:
+                del self._calls[key]
+
+    def _do_shared(self, result_key, lock_key, compute):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            if self.cache.add(lock_key, token, self.lock_timeout):
+                try:
+                    # 获取锁之前其他 worker 可能刚好完成计算并释放了锁
+                    value = self.cache.get(result_key, _MISSING)
+                    if value is not _MISSING:
+                        return value, True
+                    value = compute()
+                    self.cache.set(result_key, value, self.timeout)
+                    return value, False
+                finally:
+                    if self.cache.get(lock_key) == token:
+                        self.cache.delete(lock_key)
+
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'等待 {self.namespace} 的计算结果超时')
+            time.sleep(self.poll_interval)
+            value = self.cache.get(result_key, _MISSING)
+            if value is not _MISSING:
+                return value, True
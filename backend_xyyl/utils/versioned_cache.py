@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.core.cache import caches
+from django.db import transaction
+
+_MISSING = object()
+
+
+class VersionedCache:
+    """
+    按数据版本号隔离的缓存
+
+    每个数据所有者（通常是用户）在缓存中保存一个版本号，缓存键中包含该版本号。
+    数据写入后只需更换版本号，旧版本的缓存条目自然失效并由后端淘汰，
+    无需扫描或逐个删除。版本号保存在缓存后端中，配合共享后端（Redis、数据库缓存等）
+    可在多个 gunicorn worker 间生效。
+
+    命中计数只在进程内累计：写入共享后端会让每次命中多一次网络往返，
+    数据库缓存下还要多执行 SELECT 和 UPDATE 并争抢 SQLite 的写锁。
+    """
+
+    def __init__(self, namespace, timeout=300, alias='default'):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.alias = alias
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self, owner_id):
+        return f'{self.namespace}:version:{owner_id}'
+
+    def get_version(self, owner_id):
+        """获取所有者当前的数据版本号，不存在时初始化"""
+        key = self._version_key(owner_id)
+        version = self.cache.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not self.cache.add(key, version, None):
+                version = self.cache.get(key) or version
+        return version
+
+    def bump(self, owner_id):
+        """
+        更换所有者的数据版本号
+
+        在事务提交后执行，避免并发读取在提交前用旧数据填充新版本的缓存。
+        版本号使用随机值而不是自增计数，并发更换时不会出现丢失更新。
+        """
+        key = self._version_key(owner_id)
+        transaction.on_commit(lambda: self.cache.set(key, uuid.uuid4().hex, None))
+
+    def _digest(self, parts):
+        return hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def make_key(self, owner_id, *parts, version=None):
+        """version 为调用方已读取的版本号，省去再次读取"""
+        if version is None:
+            version = self.get_version(owner_id)
+        return f'{self.namespace}:{owner_id}:{version}:{self._digest(parts)}'
+
+    def get_or_set(self, owner_id, parts, compute):
+        """
+        读取缓存，未命中时调用 compute() 计算并写入
+
+        返回 (结果, 是否命中)
+        """
+        key = self.make_key(owner_id, *parts)
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self._incr('hits')
+            return value, True
+
+        self._incr('misses')
+        value = compute()
+        self.cache.set(key, value, self.timeout)
+        return value, False
+
+    # 供异步视图使用的版本，使用缓存后端的异步接口，逻辑与同步版本相同
+
+    async def aget_version(self, owner_id):
+        key = self._version_key(owner_id)
+        version = await self.cache.aget(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not await self.cache.aadd(key, version, None):
+                version = await self.cache.aget(key) or version
+        return version
+
+    async def amake_key(self, owner_id, *parts, version=None):
+        if version is None:
+            version = await self.aget_version(owner_id)
+        return f'{self.namespace}:{owner_id}:{version}:{self._digest(parts)}'
+
+    async def aget_or_set(self, owner_id, parts, compute):
+        """get_or_set 的异步版本，compute 为异步函数"""
+        key = await self.amake_key(owner_id, *parts)
+        value = await self.cache.aget(key, _MISSING)
+        if value is not _MISSING:
+            self._incr('hits')
+            return value, True
+
+        self._incr('misses')
+        value = await compute()
+        await self.cache.aset(key, value, self.timeout)
+        return value, False
+
+    def _incr(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """返回当前进程内的命中和未命中次数"""
+        with self._stats_lock:
+            return {'hits': self._stats['hits'], 'misses': self._stats['misses']}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
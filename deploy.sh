@@ -20,6 +20,10 @@ pip install -r requirements.txt
 echo "执行数据库迁移..."
 python manage.py migrate
 
+# 创建数据库缓存表（已存在时自动跳过）
+echo "创建缓存表..."
+python manage.py createcachetable
+
 # 收集静态文件
 echo "收集静态文件..."
 python manage.py collectstatic --noinput
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import HealthRecord
+from django.db import transaction
+from .models import HealthRecord, HealthRecordTombstone
+from . import rollups
+from .cache import statistics_cache
+from .dates import local_date
 
 @admin.register(HealthRecord)
 class HealthRecordAdmin(admin.ModelAdmin):
@@ -8,3 +12,42 @@ class HealthRecordAdmin(admin.ModelAdmin):
     list_filter = ('user', 'record_time')
     search_fields = ('user__username',)
     date_hierarchy = 'record_time'
+
+    # 后台修改记录时同步维护每日汇总；记录改到其他用户名下时，原用户的汇总、统计缓存和同步也要更新
+    def save_model(self, request, obj, form, change):
+        old_user_id = old_day = None
+        if change:
+            old_user_id, old_time = HealthRecord.objects.values_list('user_id', 'record_time').get(pk=obj.pk)
+            old_day = local_date(old_time)
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            days = {local_date(obj.record_time)}
+            if old_user_id == obj.user_id:
+                days.add(old_day)
+            elif old_user_id is not None:
+                HealthRecordTombstone.objects.create(user_id=old_user_id, record_id=obj.pk)
+                rollups.refresh_days(old_user_id, {old_day})
+                statistics_cache.bump(old_user_id)
+            rollups.refresh_days(obj.user_id, days)
+            statistics_cache.bump(obj.user_id)
+
+    def delete_model(self, request, obj):
+        record_id = obj.pk
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            HealthRecordTombstone.objects.create(user_id=obj.user_id, record_id=record_id)
+            rollups.refresh_days(obj.user_id, {local_date(obj.record_time)})
+            statistics_cache.bump(obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        affected = {}
+        tombstones = []
+        for record_id, user_id, record_time in queryset.values_list('id', 'user_id', 'record_time'):
+            affected.setdefault(user_id, set()).add(local_date(record_time))
+            tombstones.append(HealthRecordTombstone(user_id=user_id, record_id=record_id))
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            HealthRecordTombstone.objects.bulk_create(tombstones)
+            for user_id, days in affected.items():
+                rollups.refresh_days(user_id, days)
+                statistics_cache.bump(user_id)
@@ -0,0 +1,156 @@
+"""
+健康数据分析（基于 NumPy 的向量化计算）
+
+一次查询把用户在时间周期内的记录读入数组，然后对每个指标计算：
+记录数、均值、标准差、中位数、P90、最小/最大值、线性趋势斜率（每天变化量）、
+7 天和 30 天滚动均值；血压额外计算变异性指标（SD、CV、ARV）。
+"""
+from datetime import date
+
+import numpy as np
+
+# 分析结果中的指标名 -> HealthRecord 字段
+METRIC_FIELDS = {
+    'weight': 'weight',
+    'systolic': 'systolic_pressure',
+    'diastolic': 'diastolic_pressure',
+    'heartRate': 'heart_rate',
+    'bloodSugar': 'blood_sugar',
+}
+
+ROLLING_WINDOWS = (7, 30)
+
+SECONDS_PER_DAY = 86400
+
+
+def load_series(queryset, archived=None):
+    """
+    一次查询读取记录并转换为数组
+
+    返回字典：time 为以天为单位的时间戳（浮点），day 为本地日期序数，
+    各指标为浮点数组，空值为 NaN；全部按记录时间升序排列。
+    archived 为同一时间周期内的归档记录（archive.Block），直接按列合并。
+    """
+    fields = list(METRIC_FIELDS.values())
+    rows = list(queryset.order_by('record_time', 'id').values_list('record_time', 'record_date', *fields))
+    series = {
+        'time': np.array([row[0].timestamp() for row in rows], dtype=float) / SECONDS_PER_DAY,
+        'day': np.array([row[1].toordinal() for row in rows], dtype=np.int64),
+    }
+    columns = list(zip(*rows)) if rows else [()] * (len(fields) + 2)
+    for index, metric in enumerate(METRIC_FIELDS):
+        # Decimal 和 None 会分别转换为浮点数和 NaN
+        series[metric] = np.array(columns[index + 2], dtype=float)
+
+    if archived is not None and len(archived):
+        archived_series = {'time': archived.times_in_days(), 'day': archived.local_days()}
+        for metric, field in METRIC_FIELDS.items():
+            archived_series[metric] = archived.metric(field)
+        # 归档记录通常早于原始记录，稳定排序保证有交叉时仍按时间升序
+        order = np.argsort(np.concatenate((archived_series['time'], series['time'])), kind='stable')
+        series = {key: np.concatenate((archived_series[key], values))[order] for key, values in series.items()}
+    return series
+
+
+def _round(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def describe(values):
+    """描述性统计：记录数、均值、标准差（样本）、中位数、P90、最小值、最大值"""
+    values = values[~np.isnan(values)]
+    count = int(values.size)
+    if not count:
+        return {'count': 0, 'mean': None, 'std': None, 'median': None, 'p90': None, 'min': None, 'max': None}
+    median, p90 = np.percentile(values, [50, 90])
+    return {
+        'count': count,
+        'mean': _round(values.mean()),
+        'std': _round(values.std(ddof=1)) if count > 1 else 0.0,
+        'median': _round(median),
+        'p90': _round(p90),
+        'min': _round(values.min()),
+        'max': _round(values.max()),
+    }
+
+
+def rolling_means(days, values, window):
+    """
+    按自然日计算滚动均值
+
+    对每个有数据的日期 d，取 [d - window + 1, d] 内全部读数的均值。
+    利用前缀和与二分查找，一次向量化计算所有日期。
+    """
+    mask = ~np.isnan(values)
+    days, values = days[mask], values[mask]
+    if not days.size:
+        return []
+    order = np.argsort(days, kind='stable')
+    days, values = days[order], values[order]
+
+    prefix = np.concatenate(([0.0], np.cumsum(values)))
+    unique_days = np.unique(days)
+    left = np.searchsorted(days, unique_days - window + 1, side='left')
+    right = np.searchsorted(days, unique_days, side='right')
+    means = (prefix[right] - prefix[left]) / (right - left)
+
+    return [
+        {'date': date.fromordinal(day).isoformat(), 'value': value}
+        for day, value in zip(unique_days.tolist(), np.round(means, 2).tolist())
+    ]
+
+
+def trend_slope(times, values):
+    """最小二乘线性趋势的斜率（每天的变化量），数据不足时返回 None"""
+    mask = ~np.isnan(values)
+    times, values = times[mask], values[mask]
+    if values.size < 2 or np.ptp(times) == 0:
+        return None
+    x = times - times.mean()
+    slope = (x * (values - values.mean())).sum() / (x * x).sum()
+    return _round(slope, 4)
+
+
+def variability(values):
+    """
+    血压变异性指标
+
+    sd: 标准差；cv: 变异系数（%）；arv: 平均真实变异，即相邻读数差值绝对值的均值
+    """
+    values = values[~np.isnan(values)]
+    if values.size < 2:
+        return {'sd': None, 'cv': None, 'arv': None}
+    sd = values.std(ddof=1)
+    mean = values.mean()
+    return {
+        'sd': _round(sd),
+        'cv': _round(sd / mean * 100) if mean else None,
+        'arv': _round(np.abs(np.diff(values)).mean()),
+    }
+
+
+def _metric_analytics(series, metric):
+    values = series[metric]
+    result = describe(values)
+    result['slope_per_day'] = trend_slope(series['time'], values)
+    for window in ROLLING_WINDOWS:
+        result[f'rolling_{window}d'] = rolling_means(series['day'], values, window)
+    return result
+
+
+def compute(series):
+    """根据 load_series 读取的数组计算全部分析指标"""
+    return {
+        'count': int(series['time'].size),
+        'weight': _metric_analytics(series, 'weight'),
+        'bloodPressure': {
+            'systolic': _metric_analytics(series, 'systolic'),
+            'diastolic': _metric_analytics(series, 'diastolic'),
+            'variability': {
+                'systolic': variability(series['systolic']),
+                'diastolic': variability(series['diastolic']),
+            },
+        },
+        'heartRate': _metric_analytics(series, 'heartRate'),
+        'bloodSugar': _metric_analytics(series, 'bloodSugar'),
+    }
@@ -0,0 +1,595 @@
+"""
+健康记录冷数据归档
+
+超过保留期的原始记录按 (用户, 本地月份) 打包为一行 HealthRecordArchive：
+每个字段保存为一个定长整数数组（列式），ID 和时间列先做差分，空值另存位图，最后整体 zlib 压缩。
+原始表和它的索引只保留近期数据；列表、导出、统计和分析接口通过本模块透明读取归档数据，
+解包和按时间、日期、小时的筛选分组都以 NumPy 数组运算完成。
+
+详情和增量同步接口直接从归档块读取记录（归档保留记录的 id 和同步序号）；
+修改、删除或按 client_id 重传已归档的记录时，先由 restore 把记录原样移回原始表再写入。
+"""
+import heapq
+import struct
+import uuid
+import zlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import groupby, islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .cache import statistics_cache
+from .dates import local_day_start
+from .models import HealthRecord, HealthRecordArchive
+
+FORMAT_VERSION = 2
+_MAGIC = b'HRA'
+_HEADER = struct.Struct('<3sBI')
+
+# (字段名, 数组类型)：时间为 UTC 微秒时间戳，体重和血糖以 0.01 为单位保存为整数
+COLUMNS = (
+    ('id', '<i8'),
+    ('record_time', '<i8'),
+    ('created_at', '<i8'),
+    ('updated_at', '<i8'),
+    ('weight', '<i4'),
+    ('systolic_pressure', '<i4'),
+    ('diastolic_pressure', '<i4'),
+    ('heart_rate', '<i4'),
+    ('blood_sugar', '<i4'),
+    ('client_id', 'V16'),
+    ('created_seq', '<i8'),
+    ('updated_seq', '<i8'),
+)
+# 各格式版本保存的列：版本 1 没有同步序号，读取时按 0 处理
+VERSION_COLUMNS = {1: COLUMNS[:-2], 2: COLUMNS}
+# 块内按记录时间排序后基本单调递增的列，保存差分以提高压缩率
+DELTA_COLUMNS = ('id', 'record_time', 'created_at', 'updated_at')
+TIME_COLUMNS = ('record_time', 'created_at', 'updated_at')
+NULLABLE_COLUMNS = ('blood_sugar', 'client_id')
+DECIMAL_COLUMNS = ('weight', 'blood_sugar')
+DECIMAL_SCALE = 100
+
+# 归档保存的字段，与 HealthRecord.values() 的字段同名
+FIELDS = tuple(name for name, _ in COLUMNS)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MICROSECONDS = 1000000
+
+
+def _to_microseconds(value):
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * MICROSECONDS + delta.microseconds
+
+
+def _from_microseconds(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def _to_decimal(value):
+    return Decimal(int(value)).scaleb(-2)
+
+
+class Block:
+    """
+    一组按 (record_time, id) 升序排列的归档记录
+
+    columns 为字段名 -> NumPy 数组，nulls 为可空字段名 -> 布尔数组（True 表示空值）。
+    """
+
+    def __init__(self, columns, nulls):
+        self.columns = columns
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS},
+            {name: np.empty(0, dtype=bool) for name in NULLABLE_COLUMNS},
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """由 values_list(*FIELDS) 的结果构造，返回排序后的块"""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        columns, nulls = {}, {}
+        for (name, dtype), values in zip(COLUMNS, zip(*rows)):
+            if name in NULLABLE_COLUMNS:
+                nulls[name] = np.array([value is None for value in values], dtype=bool)
+            if name in TIME_COLUMNS:
+                values = [_to_microseconds(value) for value in values]
+            elif name in DECIMAL_COLUMNS:
+                values = [0 if value is None else int(value * DECIMAL_SCALE) for value in values]
+            elif name == 'client_id':
+                values = np.frombuffer(
+                    b''.join(bytes(16) if value is None else value.bytes for value in values), dtype=dtype
+                )
+            columns[name] = np.array(values, dtype=dtype)
+        return cls(columns, nulls).sorted()
+
+    @classmethod
+    def concat(cls, blocks):
+        blocks = [block for block in blocks if len(block)]
+        if not blocks:
+            return cls.empty()
+        if len(blocks) == 1:
+            return blocks[0]
+        return cls(
+            {name: np.concatenate([block.columns[name] for block in blocks]) for name in FIELDS},
+            {name: np.concatenate([block.nulls[name] for block in blocks]) for name in NULLABLE_COLUMNS},
+        )
+
+    def take(self, index):
+        """按布尔掩码或下标数组选取记录"""
+        return Block(
+            {name: values[index] for name, values in self.columns.items()},
+            {name: values[index] for name, values in self.nulls.items()},
+        )
+
+    def sorted(self):
+        return self.take(np.lexsort((self.columns['id'], self.columns['record_time'])))
+
+    # 压缩格式
+
+    def pack(self):
+        parts = [_HEADER.pack(_MAGIC, FORMAT_VERSION, len(self))]
+        for name, dtype in COLUMNS:
+            values = self.columns[name]
+            if name in DELTA_COLUMNS:
+                values = np.diff(values, prepend=np.zeros(1, dtype=values.dtype))
+            parts.append(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        for name in NULLABLE_COLUMNS:
+            parts.append(np.packbits(self.nulls[name]).tobytes())
+        return zlib.compress(b''.join(parts), 6)
+
+    @classmethod
+    def unpack(cls, data):
+        raw = zlib.decompress(bytes(data))
+        magic, version, count = _HEADER.unpack_from(raw)
+        if magic != _MAGIC or version not in VERSION_COLUMNS:
+            raise ValueError(f'不支持的归档格式: {magic!r} v{version}')
+
+        offset = _HEADER.size
+        columns = {name: np.zeros(count, dtype=dtype) for name, dtype in COLUMNS}
+        nulls = {}
+        for name, dtype in VERSION_COLUMNS[version]:
+            dtype = np.dtype(dtype)
+            values = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+            offset += count * dtype.itemsize
+            columns[name] = np.cumsum(values, dtype=dtype) if name in DELTA_COLUMNS else values
+        for name in NULLABLE_COLUMNS:
+            size = (count + 7) // 8
+            bits = np.frombuffer(raw, dtype=np.uint8, count=size, offset=offset)
+            offset += size
+            nulls[name] = np.unpackbits(bits, count=count).astype(bool)
+        return cls(columns, nulls)
+
+    # 向量化的时间换算
+
+    def in_range(self, start=None, end=None):
+        """记录时间在 [start, end) 内的布尔掩码，边界为 None 表示不限"""
+        times = self.columns['record_time']
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= _to_microseconds(start)
+        if end is not None:
+            mask &= times < _to_microseconds(end)
+        return mask
+
+    def _local_seconds(self):
+        """返回 (本地时间秒数, 时区偏移秒数)，偏移按每个 UTC 小时计算一次"""
+        seconds = self.columns['record_time'] // MICROSECONDS
+        hours, inverse = np.unique(seconds // 3600, return_inverse=True)
+        tz = timezone.get_current_timezone()
+        offsets = np.array([
+            int(datetime.fromtimestamp(int(hour) * 3600, tz).utcoffset().total_seconds()) for hour in hours
+        ], dtype=np.int64)[inverse.reshape(-1)]
+        return seconds + offsets, offsets
+
+    def local_days(self):
+        """每条记录在当前时区下的本地日期序数"""
+        local, _ = self._local_seconds()
+        return local // 86400 + EPOCH_ORDINAL
+
+    def local_hours(self):
+        """每条记录所在本地整点的 UTC 秒数"""
+        local, offsets = self._local_seconds()
+        return local // 3600 * 3600 - offsets
+
+    def times_in_days(self):
+        return self.columns['record_time'] / (MICROSECONDS * 86400)
+
+    def metric(self, name):
+        """指标的浮点数组，空值为 NaN"""
+        values = self.columns[name].astype(float)
+        if name in DECIMAL_COLUMNS:
+            values /= DECIMAL_SCALE
+        if name in self.nulls:
+            values[self.nulls[name]] = np.nan
+        return values
+
+    # 转换为与 HealthRecord.values() 相同的 Python 值
+
+    def iter_dicts(self, descending=False):
+        indexes = range(len(self) - 1, -1, -1) if descending else range(len(self))
+        columns = {name: values.tolist() for name, values in self.columns.items() if name != 'client_id'}
+        client_ids = self.columns['client_id']
+        blood_sugar_null = self.nulls['blood_sugar']
+        client_id_null = self.nulls['client_id']
+        for index in indexes:
+            yield {
+                'id': columns['id'][index],
+                'record_time': _from_microseconds(columns['record_time'][index]),
+                'created_at': _from_microseconds(columns['created_at'][index]),
+                'updated_at': _from_microseconds(columns['updated_at'][index]),
+                'weight': _to_decimal(columns['weight'][index]),
+                'systolic_pressure': columns['systolic_pressure'][index],
+                'diastolic_pressure': columns['diastolic_pressure'][index],
+                'heart_rate': columns['heart_rate'][index],
+                'blood_sugar': None if blood_sugar_null[index] else _to_decimal(columns['blood_sugar'][index]),
+                'client_id': None if client_id_null[index] else uuid.UUID(bytes=client_ids[index].tobytes()),
+                'created_seq': columns['created_seq'][index],
+                'updated_seq': columns['updated_seq'][index],
+            }
+
+
+def archives_for(user_id, start=None, end=None):
+    """与时间区间 [start, end) 有交集的归档块"""
+    queryset = HealthRecordArchive.objects.filter(user_id=user_id)
+    if start is not None:
+        queryset = queryset.filter(last_time__gte=start)
+    if end is not None:
+        queryset = queryset.filter(first_time__lt=end)
+    return queryset
+
+
+def load(user_id, start=None, end=None):
+    """读取时间区间内的全部归档记录，合并为一个按时间升序的块"""
+    blocks = []
+    for data in archives_for(user_id, start, end).order_by('month').values_list('data', flat=True):
+        block = Block.unpack(data)
+        blocks.append(block.take(block.in_range(start, end)))
+    return Block.concat(blocks)
+
+
+def iter_records(user_id, start=None, end=None, descending=False, where=None, skip=0):
+    """
+    按 (record_time, id) 顺序惰性生成时间区间内的归档记录字典
+
+    每次只解包一个月的数据块；where 可以进一步给出按块计算的布尔掩码。
+    skip 为跳过的记录数：完全落在区间内的块直接按记录数跳过，不读取数据。
+    """
+    archives = archives_for(user_id, start, end).order_by('-month' if descending else 'month')
+    for row in archives.values('id', 'record_count', 'first_time', 'last_time'):
+        inside = (
+            where is None
+            and (start is None or row['first_time'] >= start)
+            and (end is None or row['last_time'] < end)
+        )
+        if inside and skip >= row['record_count']:
+            skip -= row['record_count']
+            continue
+
+        block = Block.unpack(HealthRecordArchive.objects.values_list('data', flat=True).get(pk=row['id']))
+        mask = block.in_range(start, end)
+        if where is not None:
+            mask &= where(block)
+        index = np.flatnonzero(mask)
+        if descending:
+            index = index[::-1]
+        if skip >= len(index):
+            skip -= len(index)
+            continue
+        index, skip = index[skip:], 0
+        if descending:
+            index = index[::-1]
+        yield from block.take(index).iter_dicts(descending)
+
+
+def has_archives(user_id):
+    """用户是否有归档数据；结果缓存到用户数据版本更换为止，列表接口不必每次查询"""
+    key = statistics_cache.make_key(user_id, 'has-archives')
+    value = statistics_cache.cache.get(key)
+    if value is None:
+        value = HealthRecordArchive.objects.filter(user_id=user_id).exists()
+        statistics_cache.cache.set(key, value, statistics_cache.timeout)
+    return value
+
+
+async def ahas_archives(user_id):
+    key = await statistics_cache.amake_key(user_id, 'has-archives')
+    value = await statistics_cache.cache.aget(key)
+    if value is None:
+        value = await HealthRecordArchive.objects.filter(user_id=user_id).aexists()
+        await statistics_cache.cache.aset(key, value, statistics_cache.timeout)
+    return value
+
+
+def archive_cutoff(days):
+    """保留最近 days 天的原始记录：返回第一个不归档的月份（本地日期），此前的整月都可以归档"""
+    return (timezone.localdate() - timedelta(days=days)).replace(day=1)
+
+
+def archive_user(user_id, before, batch_size=1000):
+    """
+    把用户在 before 月份之前的原始记录按月归档
+
+    已有归档块的月份（例如后来补录的旧记录）会与新记录合并；
+    归档后客户端按同一 client_id 重传的记录以原始表中的为准，旧副本从归档块中删除。
+    原始记录直接删除，不写删除标记，对客户端而言记录仍然存在。
+    返回 (归档的月份数, 归档的记录数)。
+    """
+    # 延迟导入：rollups 依赖本模块读取归档数据
+    from . import rollups
+
+    queryset = HealthRecord.objects.filter(user_id=user_id, record_time__lt=local_day_start(before))
+    client_ids = {
+        value.bytes for value in queryset.exclude(client_id=None).values_list('client_id', flat=True).iterator()
+    }
+    if client_ids:
+        with transaction.atomic():
+            rollups.refresh_days(user_id, _drop_client_ids(user_id, client_ids))
+
+    rows = queryset.order_by('record_time', 'id').values_list('record_date', *FIELDS).iterator(chunk_size=batch_size)
+    months = records = 0
+    # record_date 为本地日期，按记录时间排序后同一月份的记录是连续的
+    for month, month_rows in groupby(rows, key=lambda row: row[0].replace(day=1)):
+        block = Block.from_rows(row[1:] for row in month_rows)
+        with transaction.atomic():
+            _store_month(user_id, month, block)
+            ids = block.columns['id'].tolist()
+            for offset in range(0, len(ids), batch_size):
+                HealthRecord.objects.filter(pk__in=ids[offset:offset + batch_size]).delete()
+        months += 1
+        records += len(block)
+
+    if records:
+        statistics_cache.bump(user_id)
+    return months, records
+
+
+def _client_id_mask(block, client_ids):
+    return np.array([
+        not null and value.tobytes() in client_ids
+        for value, null in zip(block.columns['client_id'], block.nulls['client_id'])
+    ], dtype=bool)
+
+
+def _match(block, ids, client_ids):
+    """id 在 ids 中或 client_id（16 字节）在 client_ids 中的记录掩码"""
+    mask = np.zeros(len(block), dtype=bool)
+    if ids:
+        mask |= np.isin(block.columns['id'], list(ids))
+    if client_ids:
+        mask |= _client_id_mask(block, client_ids)
+    return mask
+
+
+def find(user_id, ids=(), client_ids=(), start=None, end=None):
+    """按 id 或 client_id 查找时间区间内的归档记录，返回与 HealthRecord.values() 结构相同的字典列表"""
+    client_ids = {value.bytes for value in client_ids}
+    rows = []
+    for data in archives_for(user_id, start, end).order_by('month').values_list('data', flat=True):
+        block = Block.unpack(data)
+        mask = _match(block, ids, client_ids) & block.in_range(start, end)
+        if mask.any():
+            rows.extend(block.take(mask).iter_dicts())
+    return rows
+
+
+def restore(user_id, ids=(), client_ids=()):
+    """
+    把 id 或 client_id 匹配的归档记录移回原始表，返回恢复的记录数
+
+    记录保留原来的 id、时间和同步序号，客户端看到的数据不变；每日汇总同时统计
+    原始记录和归档记录，也不需要重新计算。先不加锁地查找，没有匹配时不写数据库。
+    """
+    if not find(user_id, ids, client_ids):
+        return 0
+    client_ids = {value.bytes for value in client_ids}
+    restored = []
+    with transaction.atomic():
+        for existing in HealthRecordArchive.objects.select_for_update().filter(user_id=user_id):
+            block = Block.unpack(existing.data)
+            mask = _match(block, ids, client_ids)
+            if not mask.any():
+                continue
+            restored.extend(block.take(mask).iter_dicts())
+            block = block.take(~mask)
+            if len(block):
+                _save_block(existing, block)
+            else:
+                existing.delete()
+        records = HealthRecord.objects.bulk_create(
+            [HealthRecord(user_id=user_id, **row) for row in restored], assign_seq=False,
+        )
+        # auto_now_add / auto_now 在插入时改写了时间戳，再写回归档中的原值
+        for record, row in zip(records, restored):
+            record.created_at, record.updated_at = row['created_at'], row['updated_at']
+        HealthRecord.objects.bulk_update(records, ['created_at', 'updated_at'], assign_seq=False)
+        statistics_cache.bump(user_id)
+    return len(restored)
+
+
+def changed_since(user_id, seq, record_id, limit):
+    """增量同步位置 (seq, record_id) 之后修改的归档记录，按 (updated_seq, id) 升序最多返回 limit 条"""
+    rows = []
+    archives = HealthRecordArchive.objects.filter(user_id=user_id, max_seq__gte=seq)
+    for data in archives.values_list('data', flat=True):
+        block = Block.unpack(data)
+        seqs, ids = block.columns['updated_seq'], block.columns['id']
+        rows.extend(block.take((seqs > seq) | ((seqs == seq) & (ids > record_id))).iter_dicts())
+    rows.sort(key=lambda row: (row['updated_seq'], row['id']))
+    return rows[:limit]
+
+
+def _drop_client_ids(user_id, client_ids):
+    """
+    从归档块中删除 client_id 与待归档原始记录相同的旧副本
+
+    返回受影响的本地日期集合，这些日期的每日汇总需要重新计算。
+    """
+    stale_days = set()
+    archives = HealthRecordArchive.objects.select_for_update().filter(user_id=user_id)
+    for existing in archives:
+        block = Block.unpack(existing.data)
+        duplicate = _client_id_mask(block, client_ids)
+        if not duplicate.any():
+            continue
+        stale_days.update(date.fromordinal(day) for day in block.take(duplicate).local_days().tolist())
+        block = block.take(~duplicate)
+        if len(block):
+            _save_block(existing, block)
+        else:
+            existing.delete()
+    return stale_days
+
+
+def _save_block(archive, block):
+    times = block.columns['record_time']
+    archive.data = block.pack()
+    archive.record_count = len(block)
+    archive.first_time = _from_microseconds(times[0])
+    archive.last_time = _from_microseconds(times[-1])
+    archive.max_seq = int(block.columns['updated_seq'].max())
+    archive.save()
+
+
+def _store_month(user_id, month, block):
+    """写入一个月的归档块，与已有的归档块合并"""
+    existing = HealthRecordArchive.objects.select_for_update().filter(user_id=user_id, month=month).first()
+    if existing is None:
+        existing = HealthRecordArchive(user_id=user_id, month=month)
+    else:
+        block = Block.concat([Block.unpack(existing.data), block]).sorted()
+    _save_block(existing, block)
+
+
+class ArchivedRecordList:
+    """
+    原始记录与归档记录合并后的只读序列
+
+    提供分页所需的 count()、切片、order_by() 和 seek()，原始记录为 queryset.values() 的结果，
+    归档记录转换为同样结构的字典，按 (record_time, id) 合并排序。
+    通常归档记录都早于原始记录，此时切片只需读取原始表中对应的一段；
+    有迟到的旧记录尚未归档时，退回逐条归并。
+    """
+    ordered = True
+
+    def __init__(self, queryset, user_id, start=None, end=None, descending=True, bound=None):
+        self.queryset = queryset
+        self.user_id = user_id
+        self.start = start
+        self.end = end
+        self.descending = descending
+        # 键集分页的起点 (record_time, id)，不含该记录
+        self.bound = bound
+
+    def _clone(self, **kwargs):
+        options = {
+            'queryset': self.queryset, 'user_id': self.user_id, 'start': self.start, 'end': self.end,
+            'descending': self.descending, 'bound': self.bound,
+        }
+        options.update(kwargs)
+        return ArchivedRecordList(**options)
+
+    def order_by(self, *fields):
+        return self._clone(queryset=self.queryset.order_by(*fields), descending=fields[0].startswith('-'))
+
+    def seek(self, record_time, pk, reverse):
+        """只保留排序方向上位于 (record_time, pk) 之后的记录"""
+        if reverse:
+            condition = Q(record_time__gte=record_time) & (Q(record_time__gt=record_time) | Q(id__gt=pk))
+        else:
+            condition = Q(record_time__lte=record_time) & (Q(record_time__lt=record_time) | Q(id__lt=pk))
+        return self._clone(queryset=self.queryset.filter(condition), bound=(record_time, pk, reverse))
+
+    def _archives(self):
+        return archives_for(self.user_id, self.start, self.end)
+
+    def _after_bound(self, block):
+        record_time, pk, reverse = self.bound
+        times, ids = block.columns['record_time'], block.columns['id']
+        record_time = _to_microseconds(record_time)
+        if reverse:
+            return (times > record_time) | ((times == record_time) & (ids > pk))
+        return (times < record_time) | ((times == record_time) & (ids < pk))
+
+    def _mask(self, block):
+        mask = block.in_range(self.start, self.end)
+        if self.bound is not None:
+            mask &= self._after_bound(block)
+        return mask
+
+    def _iter_archived(self, skip=0):
+        return iter_records(
+            self.user_id, self.start, self.end, self.descending,
+            where=self._after_bound if self.bound is not None else None, skip=skip,
+        )
+
+    def _archived_count(self):
+        total = 0
+        for row in self._archives().values('id', 'record_count', 'first_time', 'last_time'):
+            inside = (
+                self.bound is None
+                and (self.start is None or row['first_time'] >= self.start)
+                and (self.end is None or row['last_time'] < self.end)
+            )
+            if inside:
+                total += row['record_count']
+            else:
+                data = HealthRecordArchive.objects.values_list('data', flat=True).get(pk=row['id'])
+                total += int(self._mask(Block.unpack(data)).sum())
+        return total
+
+    def count(self):
+        return self.queryset.count() + self._archived_count()
+
+    def __len__(self):
+        return self.count()
+
+    def _overlaps(self):
+        """是否有未归档的原始记录不晚于最新的归档记录"""
+        newest = self._archives().aggregate(newest=Max('last_time'))['newest']
+        return newest is not None and self.queryset.filter(record_time__lte=newest).exists()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('只支持不带步长的切片')
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            raise TypeError('切片需要指定结束位置')
+
+        if self._overlaps():
+            merged = heapq.merge(
+                self.queryset[:stop], self._iter_archived(),
+                key=lambda row: (row['record_time'], row['id']), reverse=self.descending,
+            )
+            return list(islice(merged, start, stop))
+
+        if not self.descending:
+            # 升序时归档记录在前
+            rows = list(islice(self._iter_archived(skip=start), stop - start))
+            if len(rows) < stop - start:
+                skipped = max(start - self._archived_count(), 0) if not rows else 0
+                rows.extend(self.queryset[skipped:skipped + stop - start - len(rows)])
+            return rows
+
+        rows = list(self.queryset[start:stop])
+        if len(rows) < stop - start:
+            skipped = max(start - self.queryset.count(), 0) if not rows else 0
+            rows.extend(islice(self._iter_archived(skip=skipped), stop - start - len(rows)))
+        return rows
+
+    def __iter__(self):
+        return iter(self[0:self.count()])
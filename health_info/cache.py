@@ -0,0 +1,9 @@
+from django.conf import settings
+
+from backend_xyyl.utils.versioned_cache import VersionedCache
+
+# 统计结果缓存：键中包含用户数据版本号，写入健康记录后更换版本号即可使旧结果失效
+statistics_cache = VersionedCache(
+    'health-statistics',
+    timeout=getattr(settings, 'HEALTH_STATISTICS_CACHE_TIMEOUT', 600),
+)
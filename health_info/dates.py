@@ -0,0 +1,52 @@
+"""
+本地日历日与带时区时间之间的转换
+
+数据库中 record_time 以 UTC 保存，按本地日期过滤时如果使用 record_time__date，
+SQLite 需要对每一行调用时区转换函数，无法利用 (user, record_time) 索引。
+这里把本地日期区间转换为半开的时间区间 [start, end)，直接对 record_time 做范围查询。
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def parse_date(value):
+    """解析 YYYY-MM-DD 格式的日期参数，空值返回 None，格式错误抛出 ValueError"""
+    if not value:
+        return None
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def local_date(value):
+    """返回时间在当前时区下的本地日期"""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localtime(value).date()
+
+
+def local_day_start(day):
+    """本地日期零点对应的带时区时间"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def local_day_bounds(start_date=None, end_date=None):
+    """
+    将本地日期区间 [start_date, end_date]（含两端）转换为时间区间 [start, end)
+
+    任一端为 None 时对应的边界也为 None，表示不限。
+    """
+    start = local_day_start(start_date) if start_date else None
+    end = local_day_start(end_date + timedelta(days=1)) if end_date else None
+    return start, end
+
+
+def filter_by_local_days(queryset, start_date=None, end_date=None, field='record_time'):
+    """按本地日期区间过滤查询集，生成可走索引的范围条件"""
+    start, end = local_day_bounds(start_date, end_date)
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
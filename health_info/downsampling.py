@@ -0,0 +1,44 @@
+"""
+趋势数据降采样
+
+使用 Largest-Triangle-Three-Buckets (LTTB) 算法，在保留折线整体形状和峰谷的前提下，
+把点数压缩到前端图表能够展示的数量。
+"""
+
+
+def lttb_indices(xs, ys, threshold):
+    """
+    对按 x 升序排列的点执行 LTTB 降采样，返回保留点的下标列表
+
+    首尾两点总是保留；点数不超过 threshold 或 threshold 小于 3 时原样返回全部下标。
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    # 除首尾两点外，其余点平均分成 threshold - 2 个桶
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点，作为三角形的第三个顶点
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_count
+        avg_y = sum(ys[avg_start:avg_end]) / avg_count
+
+        # 在当前桶中选取与上一个保留点、下一个桶平均点组成三角形面积最大的点
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = range_start, -1.0
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
@@ -0,0 +1,81 @@
+"""
+健康记录 NDJSON 流式导入
+
+请求体每行一条 JSON 格式的健康记录（application/x-ndjson）。逐行读取请求流，
+每凑满 chunk_size 条记录交给调用方校验并提交，内存占用只与分块大小有关，与请求体大小无关。
+没有 Content-Length 的分块传输请求读到 EOF 为止，读取时累计字节数以限制请求体大小。
+"""
+import json
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class IngestChunk:
+    """一个分块：起始行号、成功解析的记录及其行号、解析失败的行"""
+
+    def __init__(self, index, start_line):
+        self.index = index
+        self.start_line = start_line
+        self.end_line = start_line
+        self.records = []
+        self.lines = []
+        self.errors = []
+
+    def __len__(self):
+        return len(self.records) + len(self.errors)
+
+
+def iter_lines(stream, max_size, block_size=READ_BLOCK_SIZE):
+    """按块读取 stream 直到 EOF 并切分为行，累计超过 max_size 字节时抛出 BodyTooLarge"""
+    if stream is None:
+        return
+    size, pending = 0, b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        size += len(block)
+        if size > max_size:
+            raise BodyTooLarge(max_size)
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_chunks(stream, chunk_size):
+    """
+    逐行读取 stream（可迭代的行，如 iter_lines 的结果），按 chunk_size 条记录切分
+
+    空行忽略；无法解析或不是 JSON 对象的行记入分块的 errors，行号从 1 开始。
+    """
+    chunk = IngestChunk(0, 1)
+    for line_number, line in enumerate(stream or (), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if not len(chunk):
+            chunk.start_line = line_number
+        chunk.end_line = line_number
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('记录应为 JSON 对象')
+        except ValueError as e:
+            chunk.errors.append({'line': line_number, 'errors': f'JSON 格式错误: {e}'})
+        else:
+            chunk.records.append(record)
+            chunk.lines.append(line_number)
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = IngestChunk(chunk.index + 1, line_number + 1)
+    if len(chunk):
+        yield chunk
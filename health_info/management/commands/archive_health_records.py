@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from health_info import archive
+from health_info.dates import local_day_start
+from health_info.models import HealthRecord
+
+
+class Command(BaseCommand):
+    help = (
+        '把超过保留期的健康记录按 (用户, 月份) 压缩为列式归档块，并从原始表中删除。'
+        '归档后的记录仍可通过详情、列表、导出、统计、分析和增量同步接口读取；修改或删除前会先恢复到原始表'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='只处理指定用户ID，可重复指定；默认处理全部用户',
+        )
+        parser.add_argument(
+            '--days', type=int, default=settings.HEALTH_ARCHIVE_AFTER_DAYS,
+            help='保留最近多少天的原始记录，更早的整月记录会被归档',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days 不能为负数')
+        before = archive.archive_cutoff(options['days'])
+
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = (HealthRecord.objects
+                .filter(record_time__lt=local_day_start(before))
+                .order_by('user_id')
+                .values_list('user_id', flat=True)
+                .distinct()
+            )
+
+        total_months = total_records = 0
+        for user_id in list(user_ids):
+            months, records = archive.archive_user(user_id, before)
+            if records:
+                self.stdout.write(f'用户 {user_id}: 归档 {months} 个月，共 {records} 条记录')
+            total_months += months
+            total_records += records
+
+        self.stdout.write(self.style.SUCCESS(
+            f'已归档 {before.isoformat()} 之前的记录：{total_months} 个月，共 {total_records} 条'
+        ))
@@ -0,0 +1,232 @@
+import re
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from health_info.models import HealthRecord
+
+# 各接口的典型请求：(说明, 方法, 路径, 参数)
+QUERY_SHAPES = [
+    ('列表', 'get', '/api/health-records/', {}),
+    ('列表 按日期过滤', 'get', '/api/health-records/', {'start_date': '{start}', 'end_date': '{today}'}),
+    ('列表 count=false', 'get', '/api/health-records/', {'count': 'false', 'page': 2}),
+    ('列表 键集分页', 'get', '/api/health-records/', {'pagination': 'cursor'}),
+    ('详情', 'get', '/api/health-records/{record_id}/', {}),
+    ('统计 按天', 'get', '/api/health-records/statistics/', {'type': 'all', 'period': 'month'}),
+    ('统计 按小时', 'get', '/api/health-records/statistics/', {'type': 'all', 'period': 'week', 'granularity': 'hour'}),
+    ('分析', 'get', '/api/health-records/analytics/', {'period': 'month'}),
+    ('导出', 'get', '/api/health-records/export/', {'export_format': 'ndjson', 'start_date': '{start}'}),
+    ('增量同步', 'get', '/api/health-records/changes/', {}),
+    ('批量上传', 'post', '/api/health-records/batch/', None),
+]
+
+TABLE = HealthRecord._meta.db_table
+
+_INDEX_PATTERN = re.compile(r'\busing (?:covering )?index (\w+)|\bscan using (\w+)', re.IGNORECASE)
+_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class Command(BaseCommand):
+    help = (
+        '记录健康记录接口实际执行的查询，用 EXPLAIN 检查使用的索引，'
+        '并测量去掉每个索引后的插入吞吐量。所有数据写入都在事务中完成并最终回滚。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=2000, help='用于执行查询的示例记录数')
+        parser.add_argument('--rows', type=int, default=5000, help='每次插入吞吐量测试写入的记录数')
+        parser.add_argument('--repeat', type=int, default=5, help='插入吞吐量测试的重复次数，取最快一次')
+        parser.add_argument('--skip-insert', action='store_true', help='只分析查询计划，不测量插入吞吐量')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(username=f'index-advisor-{uuid.uuid4().hex[:12]}')
+            HealthRecord.objects.bulk_create(self._make_records(user, options['records']), batch_size=1000)
+
+            shapes = self._capture_query_shapes(user)
+            indexes = self._get_indexes()
+            usage = self._report_query_plans(shapes, indexes)
+            self._report_index_usage(indexes, usage)
+
+            if not options['skip_insert']:
+                self._report_insert_throughput(user, options['rows'], options['repeat'], usage)
+
+            transaction.set_rollback(True)
+
+    def _make_records(self, user, count, offset=0):
+        now = timezone.now()
+        return [
+            HealthRecord(
+                user=user,
+                weight=70 + index % 50 / 10,
+                systolic_pressure=110 + index % 30,
+                diastolic_pressure=70 + index % 20,
+                heart_rate=60 + index % 35,
+                blood_sugar=5 + index % 20 / 10 if index % 2 else None,
+                record_time=now - timedelta(hours=(index + offset) * 3),
+                client_id=uuid.uuid4(),
+            )
+            for index in range(count)
+        ]
+
+    def _capture_query_shapes(self, user):
+        """通过测试客户端请求各接口，按语句形状去重，记录访问健康记录表的查询"""
+        client = APIClient()
+        client.force_authenticate(user)
+        context = {
+            'today': timezone.localdate().isoformat(),
+            'start': (timezone.localdate() - timedelta(days=30)).isoformat(),
+            'record_id': HealthRecord.objects.filter(user=user).values_list('id', flat=True).first(),
+        }
+
+        shapes = OrderedDict()
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for label, method, path, params in QUERY_SHAPES:
+                with CaptureQueriesContext(connection) as captured:
+                    if method == 'post':
+                        records = self._make_records(user, 50, offset=1)
+                        client.post(path, [{
+                            'weight': str(record.weight), 'systolic_pressure': record.systolic_pressure,
+                            'diastolic_pressure': record.diastolic_pressure, 'heart_rate': record.heart_rate,
+                            'record_time': record.record_time.isoformat(), 'client_id': str(record.client_id),
+                        } for record in records], format='json')
+                    else:
+                        params = {key: str(value).format(**context) for key, value in params.items()}
+                        response = client.get(path.format(**context), params)
+                        # 流式响应需要迭代才会执行查询
+                        if getattr(response, 'streaming', False):
+                            b''.join(response.streaming_content)
+
+                for query in captured.captured_queries:
+                    sql = query['sql']
+                    if TABLE not in sql or not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                        continue
+                    shapes.setdefault(_LITERAL_PATTERN.sub('?', sql), (label, sql))
+        return list(shapes.values())
+
+    def _get_indexes(self):
+        """健康记录表上的全部索引: 名称 -> 列"""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, TABLE)
+        return OrderedDict(
+            (name, info['columns'])
+            for name, info in sorted(constraints.items())
+            if (info['index'] or info['unique']) and not info['primary_key']
+        )
+
+    def _get_index_aliases(self, indexes):
+        """SQLite 为唯一约束自动创建的索引在查询计划中显示为 sqlite_autoindex_*，按列映射回约束名"""
+        if connection.vendor != 'sqlite':
+            return {}
+        by_columns = {tuple(columns): name for name, columns in indexes.items()}
+        aliases = {}
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA index_list({connection.ops.quote_name(TABLE)})')
+            for row in cursor.fetchall():
+                if row[1].startswith('sqlite_autoindex_'):
+                    cursor.execute(f'PRAGMA index_info({connection.ops.quote_name(row[1])})')
+                    columns = tuple(info[2] for info in sorted(cursor.fetchall()))
+                    if columns in by_columns:
+                        aliases[row[1]] = by_columns[columns]
+        return aliases
+
+    def _explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return [str(row[-1]) for row in cursor.fetchall()]
+
+    def _report_query_plans(self, shapes, indexes):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'查询计划（共 {len(shapes)} 种查询）'))
+        usage = {name: [] for name in indexes}
+        aliases = self._get_index_aliases(indexes)
+        for label, sql in shapes:
+            plan = self._explain(sql)
+            used = {
+                aliases.get(name, name)
+                for line in plan for match in _INDEX_PATTERN.finditer(line) for name in match.groups() if name
+            }
+            for name in used & set(usage):
+                usage[name].append(label)
+            self.stdout.write(f'[{label}] {sql[:160]}{"..." if len(sql) > 160 else ""}')
+            for line in plan:
+                self.stdout.write(f'    {line}')
+        return usage
+
+    def _report_index_usage(self, indexes, usage):
+        self.stdout.write(self.style.MIGRATE_HEADING('索引使用情况'))
+        for name, columns in indexes.items():
+            labels = sorted(set(usage[name]))
+            description = f'{name} ({", ".join(columns)})'
+            if labels:
+                self.stdout.write(f'{description}: {"、".join(labels)}')
+            else:
+                self.stdout.write(self.style.WARNING(f'{description}: 未被任何查询使用'))
+
+    def _insert_statement(self, user, rows):
+        """
+        预先生成 INSERT 语句和参数
+
+        计时只包含数据库执行 INSERT 和维护索引的时间，不包含构造模型实例等 Python 开销。
+        """
+        records = self._make_records(user, rows, offset=rows)
+        for record in records:
+            record.record_date = timezone.localtime(record.record_time).date()
+        fields = [field for field in HealthRecord._meta.concrete_fields if not field.primary_key]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(TABLE), ', '.join(quote(field.column) for field in fields), ', '.join(['%s'] * len(fields)),
+        )
+        params = [
+            [field.get_db_prep_save(field.pre_save(record, True), connection) for field in fields]
+            for record in records
+        ]
+        return sql, params
+
+    def _insert_time(self, statement, repeat):
+        """在保存点中执行插入并回滚，返回最快一次的耗时（秒）"""
+        sql, params = statement
+        best = float('inf')
+        for _ in range(repeat):
+            savepoint = transaction.savepoint()
+            with connection.cursor() as cursor:
+                start = time.perf_counter()
+                cursor.executemany(sql, params)
+                best = min(best, time.perf_counter() - start)
+            transaction.savepoint_rollback(savepoint)
+        return best
+
+    def _report_insert_throughput(self, user, rows, repeat, usage):
+        """依次去掉模型中定义的每个索引以及全部未使用的索引，测量插入吞吐量的变化"""
+        self.stdout.write(self.style.MIGRATE_HEADING(f'插入吞吐量（每次 {rows} 条，取 {repeat} 次中最快）'))
+        statement = self._insert_statement(user, rows)
+        baseline = rows / self._insert_time(statement, repeat)
+        self.stdout.write(f'{baseline:>10.0f} 条/秒           全部索引')
+
+        # SQLite 的 schema editor 不能在事务中使用，这里直接执行模型索引生成的 DDL，随事务一起回滚
+        editor = connection.schema_editor()
+        model_indexes = HealthRecord._meta.indexes
+        unused = [index for index in model_indexes if not usage.get(index.name)]
+        cases = [(f'去掉 {index.name} ({", ".join(index.fields)})', [index]) for index in model_indexes]
+        if unused:
+            cases.append((f'去掉全部未使用的索引（{len(unused)} 个）', unused))
+        cases.append(('去掉模型中定义的全部索引', model_indexes))
+
+        with connection.cursor() as cursor:
+            for label, dropped in cases:
+                for index in dropped:
+                    cursor.execute(editor.sql_delete_index % {
+                        'name': editor.quote_name(index.name), 'table': editor.quote_name(TABLE),
+                    })
+                throughput = rows / self._insert_time(statement, repeat)
+                for index in dropped:
+                    cursor.execute(str(index.create_sql(HealthRecord, editor)))
+                self.stdout.write(f'{throughput:>10.0f} 条/秒 {throughput / baseline - 1:>+8.1%}  {label}')
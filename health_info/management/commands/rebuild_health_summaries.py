@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from health_info import rollups
+from health_info.cache import statistics_cache
+from health_info.models import DailyHealthSummary
+
+
+class Command(BaseCommand):
+    help = '根据原始健康记录重建每日汇总表，并与原始数据逐行校验'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='只处理指定用户ID，可重复指定；默认处理全部用户',
+        )
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help='只校验不重建，发现不一致时以非零状态退出',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        if not options['verify_only']:
+            with transaction.atomic():
+                summaries = DailyHealthSummary.objects.all()
+                if user_ids:
+                    summaries = summaries.filter(user_id__in=user_ids)
+                # 重建前后有汇总行的用户都可能有过期的统计缓存，提交后更换版本号
+                affected = set(summaries.values_list('user_id', flat=True).distinct())
+                count = rollups.rebuild(user_ids)
+                affected.update(summaries.values_list('user_id', flat=True).distinct())
+                for user_id in affected:
+                    statistics_cache.bump(user_id)
+            self.stdout.write(f'已重建 {count} 条每日汇总')
+
+        mismatches = rollups.verify(user_ids)
+        if mismatches:
+            for user_id, day, field, actual, expected in mismatches[:50]:
+                self.stderr.write(
+                    f'用户 {user_id} {day} {field}: 汇总值 {actual}，原始数据 {expected}'
+                )
+            raise CommandError(f'每日汇总校验失败，共 {len(mismatches)} 处不一致')
+
+        self.stdout.write(self.style.SUCCESS('每日汇总与原始数据一致'))
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+
+
+METRIC_FIELDS = {
+    'weight': 'weight',
+    'systolic': 'systolic_pressure',
+    'diastolic': 'diastolic_pressure',
+    'heart_rate': 'heart_rate',
+    'blood_sugar': 'blood_sugar',
+}
+
+
+def populate_daily_summaries(apps, schema_editor):
+    """根据已有健康记录生成每日汇总"""
+    HealthRecord = apps.get_model('health_info', 'HealthRecord')
+    DailyHealthSummary = apps.get_model('health_info', 'DailyHealthSummary')
+
+    aggregates = {'record_count': Count('id')}
+    for metric, field in METRIC_FIELDS.items():
+        aggregates[f'{metric}_count'] = Count(field)
+        aggregates[f'{metric}_sum'] = Sum(field)
+        aggregates[f'{metric}_min'] = Min(field)
+        aggregates[f'{metric}_max'] = Max(field)
+
+    rows = (HealthRecord.objects
+        .annotate(date=TruncDate('record_time'))
+        .values('user_id', 'date')
+        .annotate(**aggregates)
+        .order_by()
+    )
+    summaries = []
+    for row in rows:
+        for metric in METRIC_FIELDS:
+            if row[f'{metric}_sum'] is None:
+                row[f'{metric}_sum'] = 0
+        summaries.append(DailyHealthSummary(**row))
+    DailyHealthSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_info', '0005_delete_healthreminder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHealthSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('record_count', models.PositiveIntegerField(default=0, verbose_name='记录数')),
+                ('weight_count', models.PositiveIntegerField(default=0)),
+                ('weight_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('weight_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('weight_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('systolic_count', models.PositiveIntegerField(default=0)),
+                ('systolic_sum', models.BigIntegerField(default=0)),
+                ('systolic_min', models.IntegerField(blank=True, null=True)),
+                ('systolic_max', models.IntegerField(blank=True, null=True)),
+                ('diastolic_count', models.PositiveIntegerField(default=0)),
+                ('diastolic_sum', models.BigIntegerField(default=0)),
+                ('diastolic_min', models.IntegerField(blank=True, null=True)),
+                ('diastolic_max', models.IntegerField(blank=True, null=True)),
+                ('heart_rate_count', models.PositiveIntegerField(default=0)),
+                ('heart_rate_sum', models.BigIntegerField(default=0)),
+                ('heart_rate_min', models.IntegerField(blank=True, null=True)),
+                ('heart_rate_max', models.IntegerField(blank=True, null=True)),
+                ('blood_sugar_count', models.PositiveIntegerField(default=0)),
+                ('blood_sugar_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('blood_sugar_min', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('blood_sugar_max', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_health_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '每日健康汇总',
+                'verbose_name_plural': '每日健康汇总',
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_health_summary')],
+            },
+        ),
+        migrations.RunPython(populate_daily_summaries, migrations.RunPython.noop),
+    ]
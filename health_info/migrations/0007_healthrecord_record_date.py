@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def backfill_record_date(apps, schema_editor):
+    """按主键分批回填 record_date，避免一次性加载全部记录"""
+    HealthRecord = apps.get_model('health_info', 'HealthRecord')
+    last_pk = 0
+    while True:
+        batch = list(
+            HealthRecord.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'record_time')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for record in batch:
+            record.record_date = timezone.localtime(record.record_time).date()
+        HealthRecord.objects.bulk_update(batch, ['record_date'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_info', '0006_dailyhealthsummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthrecord',
+            name='record_date',
+            field=models.DateField(editable=False, null=True, verbose_name='记录日期'),
+        ),
+        migrations.RunPython(backfill_record_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='healthrecord',
+            name='record_date',
+            field=models.DateField(editable=False, verbose_name='记录日期'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['user', 'record_date'], name='health_info_user_id_1455d1_idx'),
+        ),
+    ]
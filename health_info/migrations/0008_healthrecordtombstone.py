@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_info', '0007_healthrecord_record_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthRecordTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.BigIntegerField(verbose_name='健康记录ID')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='删除时间')),
+            ],
+            options={
+                'verbose_name': '健康记录删除标记',
+                'verbose_name_plural': '健康记录删除标记',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='health_info_user_id_862ac5_idx'),
+        ),
+        migrations.AddField(
+            model_name='healthrecordtombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_record_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecordtombstone',
+            index=models.Index(fields=['user', 'deleted_at', 'id'], name='health_info_user_id_387f87_idx'),
+        ),
+    ]
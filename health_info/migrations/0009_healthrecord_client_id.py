@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_info', '0008_healthrecordtombstone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthrecord',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True, verbose_name='客户端记录ID'),
+        ),
+        migrations.AddConstraint(
+            model_name='healthrecord',
+            constraint=models.UniqueConstraint(fields=('user', 'client_id'), name='unique_health_record_client_id'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_info', '0009_healthrecord_client_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='healthrecord',
+            name='health_info_record__2ec9be_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='healthrecord',
+            name='health_info_user_id_9d1a81_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='healthrecord',
+            name='health_info_user_id_fc38ec_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='healthrecord',
+            name='health_info_user_id_edb848_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='healthrecord',
+            name='health_info_user_id_15308e_idx',
+        ),
+        migrations.AlterField(
+            model_name='healthrecord',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='health_records', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
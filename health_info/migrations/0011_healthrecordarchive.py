@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_info', '0010_prune_unused_healthrecord_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthRecordArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='月份')),
+                ('record_count', models.PositiveIntegerField(verbose_name='记录数')),
+                ('first_time', models.DateTimeField(verbose_name='最早记录时间')),
+                ('last_time', models.DateTimeField(verbose_name='最晚记录时间')),
+                ('data', models.BinaryField(verbose_name='压缩数据')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_record_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '健康记录归档',
+                'verbose_name_plural': '健康记录归档',
+                'ordering': ['month'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='unique_health_record_archive')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('health_info', '0011_healthrecordarchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthSyncCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health_sync_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField(default=0, verbose_name='当前序号')),
+            ],
+            options={
+                'verbose_name': '健康记录同步序号',
+                'verbose_name_plural': '健康记录同步序号',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='healthrecord',
+            name='health_info_user_id_862ac5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='healthrecordtombstone',
+            name='health_info_user_id_387f87_idx',
+        ),
+        migrations.AddField(
+            model_name='healthrecord',
+            name='created_seq',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='插入序号'),
+        ),
+        migrations.AddField(
+            model_name='healthrecord',
+            name='updated_seq',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='修改序号'),
+        ),
+        migrations.AddField(
+            model_name='healthrecordtombstone',
+            name='deleted_seq',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='删除序号'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['user', 'updated_seq', 'id'], name='health_info_user_id_7b44cc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecordtombstone',
+            index=models.Index(fields=['user', 'deleted_seq', 'id'], name='health_info_user_id_38a661_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_info', '0012_sync_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthrecordarchive',
+            name='max_seq',
+            field=models.BigIntegerField(default=0, verbose_name='最大修改序号'),
+        ),
+    ]
@@ -1,30 +1,268 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .dates import local_date
+
+
+class HealthSyncCounterManager(models.Manager):
+    def next_value(self, user_id):
+        """
+        为用户分配下一个同步序号，必须在写入记录的同一事务中调用
+
+        UPDATE 计数器行加的行锁（SQLite 为数据库写锁）持有到事务提交，同一用户的写事务
+        只能按分配到的序号依次提交，增量同步按序号读取时不会跳过晚提交的事务。
+        """
+        counter = self.filter(user_id=user_id)
+        if not counter.update(value=F('value') + 1):
+            try:
+                with transaction.atomic():
+                    self.create(user_id=user_id, value=1)
+                return 1
+            except IntegrityError:
+                # 并发的事务已创建计数器
+                counter.update(value=F('value') + 1)
+        return counter.values_list('value', flat=True).get()
+
+
+class SyncSequenceQuerySet(models.QuerySet):
+    """
+    批量写入时分配同步序号（bulk_create / bulk_update 不会调用 save）
+
+    每个用户在一次批量写入中分配一个序号，写入 seq_fields 中的字段；
+    新插入的记录还写入 insert_seq_fields。批量写入与分配序号在同一事务中完成。
+    """
+    seq_fields = ()
+    insert_seq_fields = ()
+
+    def _assign_seq(self, objs, fields):
+        seqs = {}
+        for obj in objs:
+            if obj.user_id not in seqs:
+                seqs[obj.user_id] = HealthSyncCounter.objects.next_value(obj.user_id)
+            for field in fields:
+                setattr(obj, field, seqs[obj.user_id])
+
+    def bulk_create(self, objs, *args, assign_seq=True, **kwargs):
+        """assign_seq=False 时保留对象上已有的序号，用于把归档记录原样恢复到原始表"""
+        objs = list(objs)
+        if not assign_seq:
+            return super().bulk_create(objs, *args, **kwargs)
+        if kwargs.get('update_fields'):
+            # 按唯一约束冲突转为更新时，只更新修改序号，保留原来的插入序号
+            kwargs['update_fields'] = [*kwargs['update_fields'], *self.seq_fields]
+        with transaction.atomic(using=self.db, savepoint=False):
+            self._assign_seq(objs, (*self.seq_fields, *self.insert_seq_fields))
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, assign_seq=True, **kwargs):
+        objs = list(objs)
+        if not assign_seq:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            self._assign_seq(objs, self.seq_fields)
+            return super().bulk_update(objs, [*fields, *self.seq_fields], *args, **kwargs)
+
+
+class HealthRecordQuerySet(SyncSequenceQuerySet):
+    """批量写入时同步填充冗余的本地日期字段和同步序号"""
+    seq_fields = ('updated_seq',)
+    insert_seq_fields = ('created_seq',)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.record_date = local_date(obj.record_time)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'record_time' in fields:
+            objs = list(objs)
+            for obj in objs:
+                obj.record_date = local_date(obj.record_time)
+            fields = [*fields, 'record_date']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class TombstoneQuerySet(SyncSequenceQuerySet):
+    seq_fields = ('deleted_seq',)
+
 
 class HealthRecord(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_records')
+    # 不单独为 user_id 建索引，按用户的查询都由以 user 开头的复合索引支持
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_records', db_index=False)
     weight = models.DecimalField(max_digits=5, decimal_places=2, verbose_name='体重(kg)')
     systolic_pressure = models.IntegerField(verbose_name='收缩压(mmHg)')
     diastolic_pressure = models.IntegerField(verbose_name='舒张压(mmHg)')
     heart_rate = models.IntegerField(verbose_name='心率(次/分钟)')
     blood_sugar = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True, verbose_name='血糖(mmol/L)')
     record_time = models.DateTimeField(verbose_name='记录时间')
+    # record_time 在本地时区下的日期，冗余保存以便按天分组时直接使用索引
+    record_date = models.DateField(editable=False, verbose_name='记录日期')
+    # 客户端生成的记录ID，批量同步重试时按 (user, client_id) 去重
+    client_id = models.UUIDField(null=True, blank=True, verbose_name='客户端记录ID')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # 插入和最近一次修改时分配的同步序号（见 HealthSyncCounter），增量同步按序号而不是时间读取
+    created_seq = models.BigIntegerField(default=0, editable=False, verbose_name='插入序号')
+    updated_seq = models.BigIntegerField(default=0, editable=False, verbose_name='修改序号')
+
+    objects = HealthRecordQuerySet.as_manager()
 
     class Meta:
         ordering = ['-record_time']
         verbose_name = '健康记录'
         verbose_name_plural = '健康记录'
-        # 添加索引以提高查询性能
+        # 索引按接口实际执行的查询保留（可用 manage.py health_index_advisor 检查），
+        # 每个索引都会增加批量写入的开销
         indexes = [
-            models.Index(fields=['user', 'record_time']),  # 复合索引，提高按用户和时间过滤的查询
-            models.Index(fields=['record_time']),  # 单独的时间索引
-            models.Index(fields=['user', 'weight']),  # 用户体重查询索引
-            models.Index(fields=['user', 'systolic_pressure', 'diastolic_pressure']),  # 用户血压查询索引
-            models.Index(fields=['user', 'heart_rate']),  # 用户心率查询索引
-            models.Index(fields=['user', 'blood_sugar']),  # 用户血糖查询索引
+            models.Index(fields=['user', 'record_time']),  # 列表、分页、导出、分析和按小时统计
+            models.Index(fields=['user', 'record_date']),  # 按用户和本地日期分组、过滤
+            models.Index(fields=['user', 'updated_seq', 'id']),  # 增量同步按 (updated_seq, id) 范围查找
+        ]
+        constraints = [
+            # client_id 为空的记录不参与唯一性检查；批量上传以该约束为冲突目标做 upsert
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_health_record_client_id'),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.record_time}"
+
+    def save(self, *args, **kwargs):
+        self.record_date = local_date(self.record_time)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated_seq'}
+            if 'record_time' in update_fields:
+                kwargs['update_fields'].add('record_date')
+        with transaction.atomic():
+            self.updated_seq = HealthSyncCounter.objects.next_value(self.user_id)
+            if self._state.adding:
+                self.created_seq = self.updated_seq
+            super().save(*args, **kwargs)
+
+
+class HealthRecordTombstone(models.Model):
+    """已删除健康记录的墓碑，供增量同步接口通知客户端删除本地缓存"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_record_tombstones')
+    record_id = models.BigIntegerField(verbose_name='健康记录ID')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='删除时间')
+    deleted_seq = models.BigIntegerField(default=0, editable=False, verbose_name='删除序号')
+
+    objects = TombstoneQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = '健康记录删除标记'
+        verbose_name_plural = '健康记录删除标记'
+        indexes = [
+            models.Index(fields=['user', 'deleted_seq', 'id']),  # 增量同步按 (deleted_seq, id) 范围查找
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.record_id}"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.deleted_seq = HealthSyncCounter.objects.next_value(self.user_id)
+            super().save(*args, **kwargs)
+
+
+class HealthSyncCounter(models.Model):
+    """
+    每个用户的同步序号计数器
+
+    健康记录的每次写入和删除都在同一事务中把计数器加一，并把新值写入记录的 updated_seq
+    或删除标记的 deleted_seq。时间戳在事务提交前就已确定，晚提交的事务可能带着更早的时间出现，
+    按时间推进的同步位置会永久跳过它们；序号的分配顺序即提交顺序，不存在这个问题。
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='health_sync_counter')
+    value = models.BigIntegerField(default=0, verbose_name='当前序号')
+
+    objects = HealthSyncCounterManager()
+
+    class Meta:
+        verbose_name = '健康记录同步序号'
+        verbose_name_plural = '健康记录同步序号'
+
+    def __str__(self):
+        return f"{self.user_id} - {self.value}"
+
+
+class HealthRecordArchive(models.Model):
+    """
+    归档的健康记录：每个用户每个本地月份一行
+
+    超过保留期的原始记录由 archive_health_records 命令按列打包压缩后写入 data 并从原始表删除，
+    格式见 health_info.archive。first_time / last_time 为块内最早、最晚的记录时间，用于按时间范围筛选；
+    max_seq 为块内最大的修改序号，增量同步只需解包可能包含新变更的块。
+    读取接口会透明地合并归档记录；修改、删除已归档的记录前先把它恢复到原始表。
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_record_archives')
+    month = models.DateField(verbose_name='月份')
+    record_count = models.PositiveIntegerField(verbose_name='记录数')
+    first_time = models.DateTimeField(verbose_name='最早记录时间')
+    last_time = models.DateTimeField(verbose_name='最晚记录时间')
+    data = models.BinaryField(verbose_name='压缩数据')
+    max_seq = models.BigIntegerField(default=0, verbose_name='最大修改序号')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month']
+        verbose_name = '健康记录归档'
+        verbose_name_plural = '健康记录归档'
+        constraints = [
+            # 唯一约束同时作为 (user, month) 复合索引
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_health_record_archive'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.month:%Y-%m}"
+
+
+class DailyHealthSummary(models.Model):
+    """
+    按用户、本地日期汇总的健康记录统计
+
+    由健康记录的写入路径在同一事务内增量维护，统计接口直接读取该表，
+    避免每次请求都扫描全部原始记录。每个指标保存非空记录数、总和、最小值和最大值。
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_health_summaries')
+    date = models.DateField(verbose_name='日期')
+    record_count = models.PositiveIntegerField(default=0, verbose_name='记录数')
+
+    weight_count = models.PositiveIntegerField(default=0)
+    weight_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    weight_min = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    weight_max = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+
+    systolic_count = models.PositiveIntegerField(default=0)
+    systolic_sum = models.BigIntegerField(default=0)
+    systolic_min = models.IntegerField(null=True, blank=True)
+    systolic_max = models.IntegerField(null=True, blank=True)
+
+    diastolic_count = models.PositiveIntegerField(default=0)
+    diastolic_sum = models.BigIntegerField(default=0)
+    diastolic_min = models.IntegerField(null=True, blank=True)
+    diastolic_max = models.IntegerField(null=True, blank=True)
+
+    heart_rate_count = models.PositiveIntegerField(default=0)
+    heart_rate_sum = models.BigIntegerField(default=0)
+    heart_rate_min = models.IntegerField(null=True, blank=True)
+    heart_rate_max = models.IntegerField(null=True, blank=True)
+
+    blood_sugar_count = models.PositiveIntegerField(default=0)
+    blood_sugar_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    blood_sugar_min = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    blood_sugar_max = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = '每日健康汇总'
+        verbose_name_plural = '每日健康汇总'
+        constraints = [
+            # 唯一约束同时作为 (user, date) 复合索引，支持按用户和日期范围查询
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_health_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}"
@@ -0,0 +1,195 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class HealthRecordPagination(PageNumberPagination):
+    """
+    健康记录列表分页
+
+    默认沿用页码分页，兼容现有客户端，另外支持：
+    - page_size: 客户端指定每页条数，不超过 max_page_size
+    - count=false: 不执行 COUNT(*)，多取一条判断是否有下一页
+    - pagination=cursor 或携带 cursor 参数: 基于 (record_time, id) 的键集分页，
+      通过 (user, record_time) 索引直接定位，翻到任意深度耗时不变，也不统计总数
+
+    apaginate_queryset 为供异步视图使用的版本，规则相同，只是改用异步 ORM 读取。
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # 键集分页排序：记录时间倒序，同一时间按 id 倒序
+    ordering = ('-record_time', '-id')
+
+    def _get_mode(self, request):
+        if self.cursor_query_param in request.query_params or request.query_params.get('pagination') == 'cursor':
+            return 'cursor'
+        if request.query_params.get(self.count_query_param, '').lower() in ('false', '0'):
+            return 'nocount'
+        return 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = self._get_mode(request)
+        if self.mode == 'cursor':
+            return self._paginate_by_cursor(queryset, request)
+        if self.mode == 'nocount':
+            return self._paginate_without_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = self._get_mode(request)
+        if self.mode == 'cursor':
+            queryset, page_size, cursor, reverse = self._get_cursor_queryset(queryset, request)
+            return self._finish_cursor_page(*await self._afetch(queryset, 0, page_size), cursor, reverse)
+        if self.mode == 'nocount':
+            page_number, page_size = self._get_page_window(request)
+            items, has_next = await self._afetch(queryset, (page_number - 1) * page_size, page_size)
+            return self._finish_page_without_count(items, has_next, page_number)
+        return await self._apaginate_by_page(queryset, request)
+
+    async def _apaginate_by_page(self, queryset, request):
+        """PageNumberPagination.paginate_queryset 的异步版本：先异步 COUNT，再异步读取当前页"""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count 为 cached_property，预先填入异步查询的结果
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [item async for item in self.page.object_list]
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.mode == 'page':
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.next_link),
+            ('previous', self.previous_link),
+            ('results', data),
+        ]))
+
+    def _fetch(self, queryset, offset, page_size):
+        """多取一条用于判断是否还有更多数据"""
+        items = list(queryset[offset:offset + page_size + 1])
+        return items[:page_size], len(items) > page_size
+
+    async def _afetch(self, queryset, offset, page_size):
+        items = [item async for item in queryset[offset:offset + page_size + 1]]
+        return items[:page_size], len(items) > page_size
+
+    # 不统计总数的页码分页
+
+    def _paginate_without_count(self, queryset, request):
+        page_number, page_size = self._get_page_window(request)
+        items, has_next = self._fetch(queryset, (page_number - 1) * page_size, page_size)
+        return self._finish_page_without_count(items, has_next, page_number)
+
+    def _get_page_window(self, request):
+        page_size = self.get_page_size(request)
+        try:
+            page_number = int(request.query_params.get(self.page_query_param, 1))
+            if page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        return page_number, page_size
+
+    def _finish_page_without_count(self, items, has_next, page_number):
+        if not items and page_number > 1:
+            raise NotFound(self.invalid_page_message)
+
+        url = self.request.build_absolute_uri()
+        self.next_link = replace_query_param(url, self.page_query_param, page_number + 1) if has_next else None
+        if page_number == 1:
+            self.previous_link = None
+        elif page_number == 2:
+            self.previous_link = remove_query_param(url, self.page_query_param)
+        else:
+            self.previous_link = replace_query_param(url, self.page_query_param, page_number - 1)
+        return items
+
+    # 键集分页
+
+    def _encode_cursor(self, item, reverse):
+        record_time, pk = self._position(item)
+        payload = json.dumps({'t': record_time.isoformat(), 'i': pk, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+    def _decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            record_time = parse_datetime(payload['t'])
+            if record_time is None:
+                raise ValueError
+            return record_time, int(payload['i']), bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('无效的分页游标')
+
+    def _position(self, item):
+        if isinstance(item, dict):
+            return item['record_time'], item['id']
+        return item.record_time, item.pk
+
+    def _cursor_link(self, item, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self._encode_cursor(item, reverse))
+
+    def _paginate_by_cursor(self, queryset, request):
+        queryset, page_size, cursor, reverse = self._get_cursor_queryset(queryset, request)
+        return self._finish_cursor_page(*self._fetch(queryset, 0, page_size), cursor, reverse)
+
+    def _get_cursor_queryset(self, queryset, request):
+        """按游标位置和方向过滤、排序，返回 (查询集, 每页条数, 游标, 是否向前翻页)"""
+        page_size = self.get_page_size(request)
+        cursor = self._decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+
+        if cursor and hasattr(queryset, 'seek'):
+            # 合并了归档记录的序列（archive.ArchivedRecordList）自行处理游标位置
+            queryset = queryset.seek(*cursor)
+        elif cursor:
+            record_time, pk, _ = cursor
+            # 写成 record_time <= t AND (record_time < t OR id < pk) 的形式，索引可以按 record_time 做范围查找
+            if reverse:
+                queryset = queryset.filter(Q(record_time__gte=record_time) & (Q(record_time__gt=record_time) | Q(id__gt=pk)))
+            else:
+                queryset = queryset.filter(Q(record_time__lte=record_time) & (Q(record_time__lt=record_time) | Q(id__lt=pk)))
+
+        if reverse:
+            queryset = queryset.order_by('record_time', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        return queryset, page_size, cursor, reverse
+
+    def _finish_cursor_page(self, items, has_more, cursor, reverse):
+        if reverse:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next_link = self._cursor_link(items[-1], reverse=False) if has_next and items else None
+        self.previous_link = self._cursor_link(items[0], reverse=True) if has_previous and items else None
+        return items
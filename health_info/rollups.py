@@ -0,0 +1,408 @@
+"""
+每日健康汇总（DailyHealthSummary）的维护工具
+
+- add_records: 新建记录后在数据库中把增量合并到对应日期的汇总行
+- refresh_days: 记录更新或删除后，按原始数据重新计算受影响日期的汇总行
+- rebuild / verify: 供管理命令全量重建和校验汇总数据
+- bucket_records / bucket_summaries: 统计接口按小时、周、月分桶聚合（abucket_* 为异步版本）
+- bucket_archive / merge_buckets: 已归档记录按小时分桶，并与原始记录的分桶结果合并
+
+已归档的记录（HealthRecordArchive）与原始记录一起参与汇总的重新计算和校验。
+
+调用方需要在与原始记录写入相同的事务中调用这些函数。
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Case, Count, F, Max, Min, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from . import archive
+from .dates import local_date
+from .models import DailyHealthSummary, HealthRecord, HealthRecordArchive
+
+# 汇总指标前缀 -> HealthRecord 字段
+METRIC_FIELDS = {
+    'weight': 'weight',
+    'systolic': 'systolic_pressure',
+    'diastolic': 'diastolic_pressure',
+    'heart_rate': 'heart_rate',
+    'blood_sugar': 'blood_sugar',
+}
+
+# 小数类型的指标，数据库聚合结果需要按两位小数规整
+DECIMAL_METRICS = ('weight', 'blood_sugar')
+DECIMAL_QUANTUM = Decimal('0.01')
+
+# 合并增量时每条 UPDATE 覆盖的日期数，每个日期在每个统计列的 CASE 中占用几个参数
+MERGE_CHUNK_SIZE = 30
+
+# 汇总行中保存的全部统计列
+SUMMARY_VALUE_FIELDS = ['record_count'] + [
+    f'{metric}_{suffix}'
+    for metric in METRIC_FIELDS
+    for suffix in ('count', 'sum', 'min', 'max')
+]
+
+
+def _merge_record(summary, record):
+    """将一条健康记录合并到汇总行"""
+    summary.record_count += 1
+    for metric, field in METRIC_FIELDS.items():
+        value = getattr(record, field)
+        if value is None:
+            continue
+        setattr(summary, f'{metric}_count', getattr(summary, f'{metric}_count') + 1)
+        setattr(summary, f'{metric}_sum', getattr(summary, f'{metric}_sum') + value)
+        current_min = getattr(summary, f'{metric}_min')
+        current_max = getattr(summary, f'{metric}_max')
+        if current_min is None or value < current_min:
+            setattr(summary, f'{metric}_min', value)
+        if current_max is None or value > current_max:
+            setattr(summary, f'{metric}_max', value)
+
+
+def _merge_expressions(deltas):
+    """
+    把 {日期: 新增部分的汇总行} 合并到已有汇总行的 UPDATE 表达式
+
+    计数和总和加上增量，最小值/最大值与增量取较小/较大值，全部在数据库中基于当前行计算。
+    """
+    expressions = {}
+    for name in SUMMARY_VALUE_FIELDS:
+        output_field = DailyHealthSummary._meta.get_field(name)
+        whens = []
+        for day, delta in deltas.items():
+            value = getattr(delta, name)
+            if name.endswith('_min') or name.endswith('_max'):
+                if value is None:
+                    continue
+                pick = Least if name.endswith('_min') else Greatest
+                value = Value(value, output_field=output_field)
+                whens.append(When(date=day, then=pick(Coalesce(F(name), value), value)))
+            elif value:
+                whens.append(When(date=day, then=F(name) + Value(value, output_field=output_field)))
+        if whens:
+            expressions[name] = Case(*whens, default=F(name), output_field=output_field)
+    return expressions
+
+
+def add_records(records):
+    """
+    将新建的健康记录增量合并到每日汇总
+
+    按 (用户, 日期) 分组后，每个用户先用 INSERT ... ON CONFLICT DO NOTHING 补齐缺少的汇总行，
+    再用一条 UPDATE 把各日期的增量合并进去。合并基于行的当前值计算，
+    并发写入同一天的事务不会因同时新建汇总行而冲突，也不会覆盖彼此的结果。
+    """
+    grouped = defaultdict(lambda: defaultdict(list))
+    for record in records:
+        grouped[record.user_id][local_date(record.record_time)].append(record)
+
+    for user_id, days in grouped.items():
+        DailyHealthSummary.objects.bulk_create(
+            [DailyHealthSummary(user_id=user_id, date=day) for day in days],
+            ignore_conflicts=True,
+        )
+        days = list(days.items())
+        for offset in range(0, len(days), MERGE_CHUNK_SIZE):
+            deltas = {}
+            for day, day_records in days[offset:offset + MERGE_CHUNK_SIZE]:
+                deltas[day] = DailyHealthSummary(user_id=user_id, date=day)
+                for record in day_records:
+                    _merge_record(deltas[day], record)
+            DailyHealthSummary.objects.filter(user_id=user_id, date__in=list(deltas)).update(
+                **_merge_expressions(deltas)
+            )
+
+
+def _raw_aggregates():
+    """对原始记录按指标计算记录数、总和、最小值、最大值的聚合表达式"""
+    aggregates = {'record_count': Count('id')}
+    for metric, field in METRIC_FIELDS.items():
+        aggregates[f'{metric}_count'] = Count(field)
+        aggregates[f'{metric}_sum'] = Sum(field)
+        aggregates[f'{metric}_min'] = Min(field)
+        aggregates[f'{metric}_max'] = Max(field)
+    return aggregates
+
+
+def _normalize(row):
+    """把数据库聚合结果规整为与汇总表一致的取值"""
+    for metric in METRIC_FIELDS:
+        if row[f'{metric}_count'] is None:
+            row[f'{metric}_count'] = 0
+        if row[f'{metric}_sum'] is None:
+            row[f'{metric}_sum'] = 0
+    if row['record_count'] is None:
+        row['record_count'] = 0
+    for metric in DECIMAL_METRICS:
+        for suffix in ('sum', 'min', 'max'):
+            value = row[f'{metric}_{suffix}']
+            if value is not None:
+                row[f'{metric}_{suffix}'] = Decimal(value).quantize(DECIMAL_QUANTUM)
+    return row
+
+
+def _aggregate_raw(queryset):
+    """按 (用户, 本地日期) 聚合原始记录，返回 {(user_id, date): 统计字典}"""
+    # record_date 为冗余保存的本地日期，分组时无需逐行做时区转换
+    rows = (queryset
+        .values('user_id', 'record_date')
+        .annotate(**_raw_aggregates())
+        .order_by()
+    )
+    result = {}
+    for row in rows:
+        key = (row.pop('user_id'), row.pop('record_date'))
+        result[key] = _normalize(row)
+    return result
+
+
+def _aggregate_block(block, keys):
+    """
+    按分组键聚合归档块中的记录，返回 {键: 统计字典}，取值与 _aggregate_raw 一致
+
+    keys 为与记录一一对应的整数数组，各指标以整数保存，求和没有精度损失。
+    """
+    if not len(block):
+        return {}
+    groups, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    size = len(groups)
+    columns = {'record_count': np.bincount(inverse, minlength=size).tolist()}
+    for metric, field in METRIC_FIELDS.items():
+        values = block.columns[field].astype(np.int64)
+        present = ~block.nulls[field] if field in block.nulls else np.ones(len(values), dtype=bool)
+        index, values = inverse[present], values[present]
+        minimum = np.full(size, np.iinfo(np.int64).max)
+        maximum = np.full(size, np.iinfo(np.int64).min)
+        np.minimum.at(minimum, index, values)
+        np.maximum.at(maximum, index, values)
+        counts = np.bincount(index, minlength=size)
+        sums = np.zeros(size, dtype=np.int64)
+        np.add.at(sums, index, values)
+        columns[f'{metric}_count'] = counts.tolist()
+        columns[f'{metric}_sum'] = sums.tolist()
+        columns[f'{metric}_min'] = [value if count else None for value, count in zip(minimum.tolist(), counts.tolist())]
+        columns[f'{metric}_max'] = [value if count else None for value, count in zip(maximum.tolist(), counts.tolist())]
+
+    result = {}
+    for position, key in enumerate(groups.tolist()):
+        row = {field: values[position] for field, values in columns.items()}
+        for metric in DECIMAL_METRICS:
+            for suffix in ('sum', 'min', 'max'):
+                value = row[f'{metric}_{suffix}']
+                if value is not None:
+                    row[f'{metric}_{suffix}'] = Decimal(value).scaleb(-2).quantize(DECIMAL_QUANTUM)
+        result[key] = row
+    return result
+
+
+def _aggregate_archive(user_ids=None, days=None):
+    """按 (用户, 本地日期) 聚合已归档的记录，返回结构与 _aggregate_raw 相同"""
+    archives = HealthRecordArchive.objects.all()
+    if user_ids:
+        archives = archives.filter(user_id__in=user_ids)
+    if days is not None:
+        days = set(days)
+        archives = archives.filter(month__in={day.replace(day=1) for day in days})
+
+    result = {}
+    for user_id, data in archives.order_by('user_id', 'month').values_list('user_id', 'data').iterator():
+        block = archive.Block.unpack(data)
+        for ordinal, values in _aggregate_block(block, block.local_days()).items():
+            day = date.fromordinal(ordinal)
+            if days is None or day in days:
+                result[(user_id, day)] = values
+    return result
+
+
+def _combine(first, second):
+    """合并两组统计字典：计数和总和相加，最小值/最大值取两者中的较小/较大值"""
+    result = dict(first)
+    for key, values in second.items():
+        current = result.get(key)
+        if current is None:
+            result[key] = values
+            continue
+        merged = {}
+        for field, value in values.items():
+            other = current[field]
+            if field.endswith('_min') or field.endswith('_max'):
+                pick = min if field.endswith('_min') else max
+                merged[field] = other if value is None else value if other is None else pick(value, other)
+            else:
+                merged[field] = value + other
+        result[key] = merged
+    return result
+
+
+def bucket_archive(block):
+    """把归档记录按本地整点分桶，返回结构与 bucket_records 相同"""
+    hours = _aggregate_block(block, block.local_hours())
+    return [
+        {'bucket': datetime.fromtimestamp(hour, dt_timezone.utc), **values}
+        for hour, values in sorted(hours.items())
+    ]
+
+
+def merge_buckets(*groups):
+    """合并多组分桶统计行，返回按桶升序排列的行"""
+    merged = {}
+    for rows in groups:
+        merged = _combine(merged, {row['bucket']: {k: v for k, v in row.items() if k != 'bucket'} for row in rows})
+    return [{'bucket': bucket, **values} for bucket, values in sorted(merged.items())]
+
+
+def _bucket_records_query(queryset, bucket):
+    return (queryset
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(**_raw_aggregates())
+        .order_by('bucket')
+    )
+
+
+def bucket_records(queryset, bucket):
+    """
+    在数据库中按时间桶聚合原始记录（用于小时粒度）
+
+    bucket 为分桶表达式（如 TruncHour('record_time')），
+    返回按桶升序排列的行，每行包含 bucket 和汇总表的全部统计列。
+    """
+    return [_normalize(row) for row in _bucket_records_query(queryset, bucket)]
+
+
+async def abucket_records(queryset, bucket):
+    """bucket_records 的异步版本"""
+    return [_normalize(row) async for row in _bucket_records_query(queryset, bucket)]
+
+
+def _bucket_summaries_query(queryset, bucket):
+    # 聚合别名不能与汇总表字段同名，先加前缀再还原
+    aggregates = {}
+    for field in SUMMARY_VALUE_FIELDS:
+        if field.endswith('_min'):
+            aggregates[f'bucket_{field}'] = Min(field)
+        elif field.endswith('_max'):
+            aggregates[f'bucket_{field}'] = Max(field)
+        else:
+            aggregates[f'bucket_{field}'] = Sum(field)
+
+    return (queryset
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(**aggregates)
+        .order_by('bucket')
+    )
+
+
+def _unprefix_bucket(row):
+    return _normalize({'bucket': row['bucket'], **{field: row[f'bucket_{field}'] for field in SUMMARY_VALUE_FIELDS}})
+
+
+def bucket_summaries(queryset, bucket):
+    """
+    在数据库中把每日汇总行合并为更粗的时间桶（周、月）
+
+    bucket 为分桶表达式（如 TruncWeek('date')），返回结构与 bucket_records 相同。
+    """
+    return [_unprefix_bucket(row) for row in _bucket_summaries_query(queryset, bucket)]
+
+
+async def abucket_summaries(queryset, bucket):
+    """bucket_summaries 的异步版本"""
+    return [_unprefix_bucket(row) async for row in _bucket_summaries_query(queryset, bucket)]
+
+
+def refresh_days(user_id, days):
+    """
+    按原始记录重新计算指定用户若干日期的汇总行
+
+    用于记录更新和删除：最小值/最大值无法通过减法维护，
+    因此直接对受影响日期做一次走 (user, record_date) 索引的聚合，再合并这些日期所在月份的归档记录。
+    """
+    days = set(days)
+    if not days:
+        return
+
+    fresh = _combine(
+        _aggregate_raw(HealthRecord.objects.filter(user_id=user_id, record_date__in=list(days))),
+        _aggregate_archive([user_id], days),
+    )
+    existing = {
+        summary.date: summary
+        for summary in DailyHealthSummary.objects.filter(user_id=user_id, date__in=list(days))
+    }
+
+    to_create, to_update, to_delete = [], [], []
+    for day in days:
+        values = fresh.get((user_id, day))
+        summary = existing.get(day)
+        if values is None:
+            if summary is not None:
+                to_delete.append(summary.pk)
+            continue
+        if summary is None:
+            to_create.append(DailyHealthSummary(user_id=user_id, date=day, **values))
+        else:
+            for field, value in values.items():
+                setattr(summary, field, value)
+            to_update.append(summary)
+
+    if to_delete:
+        DailyHealthSummary.objects.filter(pk__in=to_delete).delete()
+    if to_create:
+        DailyHealthSummary.objects.bulk_create(to_create)
+    if to_update:
+        DailyHealthSummary.objects.bulk_update(to_update, SUMMARY_VALUE_FIELDS)
+
+
+def _raw_queryset(user_ids=None):
+    queryset = HealthRecord.objects.all()
+    if user_ids:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return queryset
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """根据原始记录和归档记录全量重建每日汇总，返回重建的汇总行数"""
+    summaries = DailyHealthSummary.objects.all()
+    if user_ids:
+        summaries = summaries.filter(user_id__in=user_ids)
+    summaries.delete()
+
+    fresh = _combine(_aggregate_raw(_raw_queryset(user_ids)), _aggregate_archive(user_ids))
+    DailyHealthSummary.objects.bulk_create(
+        [DailyHealthSummary(user_id=user_id, date=day, **values) for (user_id, day), values in fresh.items()],
+        batch_size=batch_size,
+    )
+    return len(fresh)
+
+
+def verify(user_ids=None):
+    """
+    将每日汇总与原始记录（含归档记录）逐行比对
+
+    返回不一致项列表，每项为 (user_id, date, 字段名, 汇总值, 原始值)。
+    """
+    fresh = _combine(_aggregate_raw(_raw_queryset(user_ids)), _aggregate_archive(user_ids))
+    summaries = DailyHealthSummary.objects.all()
+    if user_ids:
+        summaries = summaries.filter(user_id__in=user_ids)
+    stored = {
+        (row.pop('user_id'), row.pop('date')): row
+        for row in summaries.values('user_id', 'date', *SUMMARY_VALUE_FIELDS)
+    }
+
+    mismatches = []
+    for key in sorted(set(fresh) | set(stored)):
+        expected = fresh.get(key, {})
+        actual = stored.get(key, {})
+        for field in SUMMARY_VALUE_FIELDS:
+            if expected.get(field) != actual.get(field):
+                mismatches.append((key[0], key[1], field, actual.get(field), expected.get(field)))
+    return mismatches
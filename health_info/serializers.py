@@ -1,22 +1,175 @@
+import decimal
+import functools
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+from . import archive
+from .dates import local_date
 from .models import HealthRecord
 
+
+class HealthRecordListSerializer(serializers.ListSerializer):
+    """
+    批量创建健康记录
+
+    先由 ListSerializer 校验全部记录，再在同一事务中分块 bulk_create，
+    避免逐条调用 HealthRecordSerializer.create 产生一条 INSERT（和一次隐式事务）。
+
+    携带 client_id 的记录按 (user, client_id) 做 upsert，客户端重试同一批数据时
+    不会产生重复记录；与已有记录完全相同的直接跳过。已归档的同 client_id 记录
+    先恢复到原始表，再参与比较和 upsert。写入后：
+    - inserted: 未携带 client_id、新插入的记录，可增量更新每日汇总
+    - refresh_dates: upsert 涉及的本地日期（含被覆盖记录原来的日期），需要重新汇总
+    - skipped: 跳过的重复记录数
+    """
+    # 每条 INSERT 语句包含的记录数，兼顾 SQLite 的参数个数上限
+    bulk_batch_size = 500
+    # 按 client_id 冲突时覆盖的字段
+    upsert_fields = [
+        'weight', 'systolic_pressure', 'diastolic_pressure', 'heart_rate', 'blood_sugar',
+        'record_time', 'record_date', 'updated_at',
+    ]
+
+    def create(self, validated_data):
+        user = self.context['request'].user
+        plain, keyed = [], {}
+        for item in validated_data:
+            if item.get('client_id'):
+                # 同一请求内重复的 client_id 以最后一条为准
+                keyed[item['client_id']] = item
+            else:
+                plain.append(HealthRecord(user=user, **item))
+
+        if keyed and archive.has_archives(user.id):
+            archive.restore(user.id, client_ids=keyed)
+        existing = self._get_existing(user, list(keyed))
+        upserts = []
+        self.refresh_dates = set()
+        self.skipped = len(validated_data) - len(plain) - len(keyed)
+        for client_id, item in keyed.items():
+            current = existing.get(client_id)
+            if current is not None and all(getattr(current, field) == value for field, value in item.items()):
+                self.skipped += 1
+                continue
+            record = HealthRecord(user=user, **item)
+            upserts.append(record)
+            self.refresh_dates.add(local_date(record.record_time))
+            if current is not None:
+                self.refresh_dates.add(current.record_date)
+
+        with transaction.atomic():
+            self.inserted = HealthRecord.objects.bulk_create(plain, batch_size=self.bulk_batch_size)
+            if upserts:
+                HealthRecord.objects.bulk_create(
+                    upserts,
+                    batch_size=self.bulk_batch_size,
+                    update_conflicts=True,
+                    unique_fields=['user', 'client_id'],
+                    update_fields=self.upsert_fields,
+                )
+        return self.inserted + upserts
+
+    def _get_existing(self, user, client_ids):
+        """分块查询用户已有的同 client_id 记录"""
+        existing = {}
+        for start in range(0, len(client_ids), self.bulk_batch_size):
+            chunk = client_ids[start:start + self.bulk_batch_size]
+            # 去掉默认的 record_time 排序，否则 SQLite 会为避免排序改用 (user, record_time) 索引
+            for record in HealthRecord.objects.filter(user=user, client_id__in=chunk).order_by():
+                existing[record.client_id] = record
+        return existing
+
+
 class HealthRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = HealthRecord
         fields = ['id', 'weight', 'systolic_pressure', 'diastolic_pressure', 
-                 'heart_rate', 'blood_sugar', 'record_time', 'created_at', 'updated_at']
+                 'heart_rate', 'blood_sugar', 'record_time', 'client_id', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+        list_serializer_class = HealthRecordListSerializer
 
     def create(self, validated_data):
         """
-        创建健康记录，支持单条和批量创建
-        
-        如果 validated_data 中已包含 user 字段（批量创建时），则直接使用
-        否则从请求上下文中获取用户（单条创建时）
+        创建单条健康记录
+
+        如果 validated_data 中已包含 user 字段，则直接使用
+        否则从请求上下文中获取用户；批量创建由 HealthRecordListSerializer 处理
         """
         # 如果 validated_data 中没有 user 字段，则从请求上下文中获取
         if 'user' not in validated_data and 'request' in self.context:
             validated_data['user'] = self.context['request'].user
         
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data) 
+
+
+def _compile_converter(field, tz):
+    """
+    为序列化器字段生成等价的快速转换函数
+
+    常见字段类型直接展开 DRF 的 to_representation 逻辑（省去逐次的 getattr 和配置查找），
+    其余字段退回 field.to_representation，保证输出与序列化器完全一致。
+    """
+    if isinstance(field, serializers.DecimalField) and field.decimal_places is not None \
+            and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) \
+            and not field.localize and not field.normalize_output:
+        exponent = Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+        return lambda value: f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+
+    if isinstance(field, serializers.DateTimeField) and tz is not None \
+            and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601 \
+            and not hasattr(field, 'timezone'):
+        # 与 DateTimeField.enforce_timezone 相同，转换到当前时区后输出 ISO 8601
+        def convert_datetime(value):
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert_datetime
+
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return str
+
+    if isinstance(field, serializers.IntegerField):
+        return int
+
+    return field.to_representation
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_columns(serializer_class, tz):
+    """按序列化器类和当前时区缓存 (输出字段名, 模型字段, 转换函数) 列表"""
+    fields = [field for field in serializer_class().fields.values() if not field.write_only]
+    return tuple((field.field_name, field.source, _compile_converter(field, tz)) for field in fields)
+
+
+class HealthRecordReader:
+    """
+    健康记录列表和详情的只读快速路径
+
+    通过 queryset.values() 读取字段值，不创建模型实例，再用按字段预先生成的转换函数
+    转成可直接输出的字典，结果与 HealthRecordSerializer(instance).data 逐字节一致。
+    """
+
+    def __init__(self, serializer_class=HealthRecordSerializer):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.columns = _compile_columns(serializer_class, tz)
+        self.sources = [source for _, source, _ in self.columns]
+
+    def values(self, queryset):
+        """转换为 values() 查询集，只读取需要输出的字段"""
+        return queryset.values(*self.sources)
+
+    def to_representation(self, row):
+        return {
+            name: None if row[source] is None else convert(row[source])
+            for name, source, convert in self.columns
+        }
+
+    def to_list(self, rows):
+        return [self.to_representation(row) for row in rows]
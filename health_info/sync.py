@@ -0,0 +1,88 @@
+"""
+健康记录增量同步
+
+同步令牌记录客户端上次同步到的位置：健康记录的 (updated_seq, id) 和删除标记的 (deleted_seq, id)。
+序号由 HealthSyncCounter 在写入事务中分配，同一用户的写事务按序号顺序提交，
+因此客户端读到某个序号时，更小序号的变更都已提交，位置只向前推进也不会遗漏变更。
+客户端每次携带上次返回的令牌请求，服务端只返回此后新建、修改和删除的记录，
+两类查询分别走 (user, updated_seq, id) 和 (user, deleted_seq, id) 索引做范围查找。
+已归档的记录保留同步序号，按同样的位置从归档块中读取并合并。
+"""
+import base64
+import heapq
+import json
+
+from django.db.models import Q
+
+from . import archive
+from .models import HealthRecord, HealthRecordTombstone
+
+INITIAL_POSITION = {'s': 0, 'i': 0, 'ds': 0, 'di': 0}
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(position):
+    """position 为 {'s': 修改序号, 'i': id, 'ds': 删除序号, 'di': id}"""
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    """
+    解析同步令牌，空令牌表示首次同步
+
+    按时间记录位置的旧令牌无法换算为序号，按首次同步处理，客户端按记录 id 覆盖本地数据即可。
+    """
+    if not token:
+        return dict(INITIAL_POSITION)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+        if 'u' in payload and 's' not in payload:
+            return dict(INITIAL_POSITION)
+        return {key: int(payload[key]) for key in INITIAL_POSITION}
+    except (TypeError, ValueError, KeyError, UnicodeError, AttributeError) as e:
+        raise InvalidSyncToken(str(e))
+
+
+def _after(queryset, seq_field, seq, id_value):
+    """(seq_field, id) 严格大于给定位置的记录，写成可走复合索引的范围条件"""
+    return queryset.filter(
+        Q(**{f'{seq_field}__gte': seq})
+        & (Q(**{f'{seq_field}__gt': seq}) | Q(id__gt=id_value))
+    )
+
+
+def get_changes(user, token, limit):
+    """
+    获取令牌之后的变更
+
+    返回 (新建或修改的记录列表, 删除的记录ID列表, 新令牌, 是否还有更多变更)。
+    每类变更最多返回 limit 条，has_more 为 True 时客户端应使用新令牌继续请求。
+    """
+    position = decode_token(token)
+
+    records = list(
+        _after(HealthRecord.objects.filter(user=user), 'updated_seq', position['s'], position['i'])
+        .order_by('updated_seq', 'id')[:limit + 1]
+    )
+    if archive.has_archives(user.id):
+        archived = [
+            HealthRecord(user=user, **row)
+            for row in archive.changed_since(user.id, position['s'], position['i'], limit + 1)
+        ]
+        records = list(heapq.merge(records, archived, key=lambda record: (record.updated_seq, record.id)))
+    tombstones = list(
+        _after(HealthRecordTombstone.objects.filter(user=user), 'deleted_seq', position['ds'], position['di'])
+        .order_by('deleted_seq', 'id')
+        .values_list('id', 'record_id', 'deleted_seq')[:limit + 1]
+    )
+    has_more = len(records) > limit or len(tombstones) > limit
+    records, tombstones = records[:limit], tombstones[:limit]
+
+    if records:
+        position['s'], position['i'] = records[-1].updated_seq, records[-1].id
+    if tombstones:
+        position['di'], position['ds'] = tombstones[-1][0], tombstones[-1][2]
+    return records, [record_id for _, record_id, _ in tombstones], encode_token(position), has_more
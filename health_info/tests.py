@@ -1,3 +1,1071 @@
-from django.test import TestCase
+import base64
+import json
+import statistics
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection
+from django.db.models import Count, Q
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend_xyyl.utils.async_views import AsyncAPIView
+from backend_xyyl.utils.fast_json import FastJSONParser, FastJSONRenderer
+from .admin import HealthRecordAdmin
+from .models import DailyHealthSummary, HealthRecord, HealthRecordArchive, HealthRecordTombstone
+from . import archive, ingest, rollups
+from .cache import statistics_cache
+from .dates import local_day_bounds
+from .downsampling import lttb_indices
+from .pagination import HealthRecordPagination
+from .serializers import HealthRecordReader, HealthRecordSerializer
+from .views import HealthRecordViewSet
+
+
+def make_record_data(days_ago=0, hour=9, **overrides):
+    """构造一条健康记录的请求数据"""
+    record_time = timezone.make_aware(
+        datetime.combine(timezone.localdate() - timedelta(days=days_ago), datetime.min.time())
+    ) + timedelta(hours=hour)
+    data = {
+        'weight': '70.50',
+        'systolic_pressure': 120,
+        'diastolic_pressure': 80,
+        'heart_rate': 72,
+        'blood_sugar': '5.60',
+        'record_time': record_time.isoformat(),
+    }
+    data.update(overrides)
+    return data
+
+
+class HealthRecordAPITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='tester', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_record(self, **kwargs):
+        response = self.client.post('/api/health-records/', make_record_data(**kwargs), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+
+class DailySummaryTests(HealthRecordAPITestCase):
+    def test_create_update_delete_keep_summaries_in_sync(self):
+        first = self.create_record(days_ago=1, weight='70.00')
+        self.create_record(days_ago=1, hour=20, weight='72.00', blood_sugar=None)
+        self.create_record(days_ago=3, weight='69.00')
+
+        summary = DailyHealthSummary.objects.get(user=self.user, date=timezone.localdate() - timedelta(days=1))
+        self.assertEqual(summary.record_count, 2)
+        self.assertEqual(summary.weight_sum, Decimal('142.00'))
+        self.assertEqual(summary.blood_sugar_count, 1)
+
+        # 修改记录日期后，新旧两天的汇总都应更新
+        response = self.client.patch(
+            f"/api/health-records/{first['id']}/",
+            {'record_time': make_record_data(days_ago=3)['record_time']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+        response = self.client.delete(f"/api/health-records/{first['id']}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+    def test_batch_updates_summaries(self):
+        records = [make_record_data(days_ago=day % 5, hour=day % 24) for day in range(20)]
+        response = self.client.post('/api/health-records/batch/', records, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(DailyHealthSummary.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+    def test_merge_is_computed_in_database(self):
+        self.create_record(days_ago=1, weight='70.00')
+        records = [
+            HealthRecord.objects.create(
+                user=self.user, weight=weight, systolic_pressure=120, diastolic_pressure=80, heart_rate=72,
+                record_time=datetime.fromisoformat(make_record_data(days_ago=day)['record_time']),
+            )
+            for day, weight in ((1, Decimal('65.00')), (2, Decimal('71.00')))
+        ]
+        # 补齐汇总行和合并增量各一条语句，不先读取汇总行，并发写入同一天时不会覆盖彼此的结果
+        with self.assertNumQueries(2):
+            rollups.add_records(records)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+        summary = DailyHealthSummary.objects.get(user=self.user, date=timezone.localdate() - timedelta(days=1))
+        self.assertEqual((summary.record_count, summary.weight_min, summary.weight_max), (2, Decimal('65.00'), Decimal('70.00')))
+
+    def test_admin_owner_change_updates_previous_owner(self):
+        record = HealthRecord.objects.get(pk=self.create_record(days_ago=1)['id'])
+        other = User.objects.create_user(username='other', password='testpass123')
+        record.user = other
+        with self.captureOnCommitCallbacks(execute=True):
+            HealthRecordAdmin(HealthRecord, admin.site).save_model(None, record, None, change=True)
+
+        self.assertFalse(DailyHealthSummary.objects.filter(user=self.user).exists())
+        self.assertEqual(rollups.verify([self.user.id, other.id]), [])
+        self.assertTrue(HealthRecordTombstone.objects.filter(user=self.user, record_id=record.pk).exists())
+
+    def test_index_advisor_reports_usage_and_rolls_back(self):
+        self.create_record()
+        out = StringIO()
+        call_command('health_index_advisor', records=50, rows=20, repeat=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn(f"{LocalDayFilterTests.USER_TIME_INDEX} (user_id, record_time): ", output)
+        self.assertIn('去掉模型中定义的全部索引', output)
+        self.assertEqual(HealthRecord.objects.count(), 1)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.create_record(days_ago=2)
+        DailyHealthSummary.objects.filter(user=self.user).update(weight_sum=0)
+        self.assertNotEqual(rollups.verify(), [])
+        version = statistics_cache.get_version(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_health_summaries', stdout=StringIO())
+        self.assertEqual(rollups.verify(), [])
+        # 重建后缓存中按旧汇总计算的统计结果失效
+        self.assertNotEqual(statistics_cache.get_version(self.user.id), version)
+
+
+class BatchCreateTests(HealthRecordAPITestCase):
+    def test_batch_insert_query_count_does_not_grow_with_size(self):
+        records = [make_record_data(days_ago=index % 3, hour=index % 24) for index in range(120)]
+        # 含首次写入时创建同步序号计数器的 4 条语句
+        with self.assertNumQueries(12):
+            response = self.client.post('/api/health-records/batch/', records, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['count'], 120)
+
+        created = HealthRecord.objects.filter(user=self.user)
+        self.assertEqual(created.count(), 120)
+        self.assertFalse(created.filter(record_date__isnull=True).exists())
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+    def test_invalid_record_rejects_whole_batch(self):
+        records = [make_record_data(), make_record_data(heart_rate='abc')]
+        response = self.client.post('/api/health-records/batch/', records, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(HealthRecord.objects.filter(user=self.user).exists())
+
+
+class ClientIdUpsertTests(HealthRecordAPITestCase):
+    def make_batch(self, size=6):
+        return [
+            make_record_data(days_ago=index % 3, hour=index, client_id=str(uuid.uuid4()))
+            for index in range(size)
+        ]
+
+    def test_retry_is_noop(self):
+        records = self.make_batch()
+        first = self.client.post('/api/health-records/batch/', records, format='json')
+        self.assertEqual(first.json()['count'], 6)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            retry = self.client.post('/api/health-records/batch/', records, format='json')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual((retry.json()['count'], retry.json()['skipped']), (0, 6))
+        # 没有写入时不需要让统计缓存失效
+        self.assertEqual(callbacks, [])
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 6)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+    def test_changed_retry_updates_in_place(self):
+        records = self.make_batch()
+        self.client.post('/api/health-records/batch/', records, format='json')
+        original = HealthRecord.objects.get(client_id=records[0]['client_id'])
+
+        records[0].update(weight='80.00', record_time=make_record_data(days_ago=5)['record_time'])
+        records.append(make_record_data(client_id=str(uuid.uuid4())))
+        response = self.client.post('/api/health-records/batch/', records, format='json')
+        self.assertEqual((response.json()['count'], response.json()['skipped']), (2, 5))
+
+        updated = HealthRecord.objects.get(client_id=records[0]['client_id'])
+        self.assertEqual((updated.pk, updated.weight), (original.pk, Decimal('80.00')))
+        self.assertEqual(updated.record_date, timezone.localdate() - timedelta(days=5))
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 7)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+    def test_client_id_is_unique_per_user(self):
+        data = make_record_data(client_id=str(uuid.uuid4()))
+        self.create_record(client_id=data['client_id'])
+        response = self.client.post('/api/health-records/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('client_id', response.json()['detail'])
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(other)
+        response = self.client.post('/api/health-records/batch/', [data], format='json')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_other_integrity_errors_are_not_reported_as_client_id(self):
+        data = make_record_data(client_id=str(uuid.uuid4()))
+        with mock.patch.object(rollups, 'add_records', side_effect=IntegrityError('unique_daily_health_summary')):
+            response = self.client.post('/api/health-records/', data, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(HealthRecord.objects.filter(user=self.user).exists())
+
+@override_settings(HEALTH_INGEST_CHUNK_SIZE=2)
+class PartialBatchTests(HealthRecordAPITestCase):
+    def test_valid_rows_are_committed(self):
+        records = [make_record_data(days_ago=index, hour=index) for index in range(5)]
+        records[1]['heart_rate'] = 'abc'
+        records[3] = 'not a record'
+        response = self.client.post('/api/health-records/batch/?partial=true', records, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual((body['accepted'], body['rejected']), (3, 2))
+        self.assertEqual([error['index'] for error in body['errors']], [1, 3])
+        self.assertIn('heart_rate', body['errors'][0]['errors'])
+        self.assertEqual(
+            sorted(body['ids']),
+            list(HealthRecord.objects.filter(user=self.user).order_by('id').values_list('id', flat=True)),
+        )
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+    def test_failed_chunk_does_not_roll_back_others(self):
+        records = [make_record_data(days_ago=index) for index in range(6)]
+        with mock.patch.object(rollups, 'add_records', side_effect=[None, DatabaseError('locked'), None]), \
+                self.assertLogs('health_info.views', 'ERROR') as logs:
+            response = self.client.post('/api/health-records/batch/?partial=true', records, format='json')
+        self.assertIn('DatabaseError: locked', logs.output[0])
+        body = response.json()
+        self.assertEqual((body['accepted'], body['rejected']), (4, 2))
+        self.assertEqual([error['index'] for error in body['errors']], [2, 3])
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 4)
+
+    def test_all_rows_invalid(self):
+        response = self.client.post('/api/health-records/batch/?partial=true', [{'weight': 'x'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ids'], [])
+
+@override_settings(HEALTH_INGEST_CHUNK_SIZE=4)
+class IngestTests(HealthRecordAPITestCase):
+    def post_ndjson(self, lines, content_type='application/x-ndjson'):
+        body = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        return self.client.post('/api/health-records/ingest/', body, content_type=content_type)
+
+    def test_chunks_are_committed_with_progress(self):
+        lines = [make_record_data(days_ago=index % 3, hour=index) for index in range(10)]
+        lines.insert(5, '')
+        response = self.post_ndjson(lines)
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual(body['count'], 10)
+        self.assertEqual(
+            [(chunk['start_line'], chunk['end_line'], chunk['count']) for chunk in body['chunks']],
+            [(1, 4, 4), (5, 9, 4), (10, 11, 2)],
+        )
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(rollups.verify([self.user.id]), [])
+
+    def test_invalid_chunk_is_skipped(self):
+        lines = [make_record_data(hour=index) for index in range(8)]
+        lines[1] = '{not json'
+        lines[2] = make_record_data(heart_rate='abc')
+        response = self.post_ndjson(lines)
+        self.assertEqual(response.status_code, 400)
+        first, second = response.json()['chunks']
+        self.assertEqual([error['line'] for error in first['errors']], [2, 3])
+        self.assertIn('heart_rate', first['errors'][1]['errors'])
+        self.assertEqual((first['count'], second['count']), (0, 4))
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 4)
+
+    @override_settings(HEALTH_INGEST_MAX_BODY_SIZE=100)
+    def test_body_size_and_content_type_limits(self):
+        response = self.post_ndjson([make_record_data()] * 3)
+        self.assertEqual(response.status_code, 413)
+        response = self.post_ndjson([make_record_data()], content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(HealthRecord.objects.filter(user=self.user).exists())
+
+    def post_chunked(self, lines, terminated=True):
+        # 分块传输的请求没有 Content-Length，由服务器在 wsgi.input 读到 EOF 时结束
+        body = '\n'.join(json.dumps(line) for line in lines).encode()
+        return self.client.post(
+            '/api/health-records/ingest/', body, content_type='application/x-ndjson',
+            CONTENT_LENGTH='', **{'wsgi.input': BytesIO(body), 'wsgi.input_terminated': terminated},
+        )
+
+    def test_chunked_body_is_read_until_eof(self):
+        lines = [make_record_data(hour=index) for index in range(6)]
+        with mock.patch.object(ingest, 'READ_BLOCK_SIZE', 100):
+            response = self.post_chunked(lines)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['count'], 6)
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 6)
+
+        with override_settings(HEALTH_INGEST_MAX_BODY_SIZE=1000):
+            response = self.post_chunked(lines * 3)
+        self.assertEqual(response.status_code, 413)
+
+    def test_missing_length_is_rejected(self):
+        response = self.post_chunked([make_record_data()], terminated=False)
+        self.assertEqual(response.status_code, 411)
+        self.assertFalse(HealthRecord.objects.filter(user=self.user).exists())
+
+class ReaderTests(HealthRecordAPITestCase):
+    def test_reader_output_matches_serializer(self):
+        self.create_record(blood_sugar=None)
+        self.create_record(days_ago=1, weight='65.1', client_id=str(uuid.uuid4()))
+        queryset = HealthRecord.objects.filter(user=self.user)
+        for tz in ('Asia/Shanghai', 'UTC'):
+            with timezone.override(tz):
+                expected = JSONRenderer().render(HealthRecordSerializer(queryset, many=True).data)
+                reader = HealthRecordReader()
+                self.assertEqual(JSONRenderer().render(reader.to_list(reader.values(queryset))), expected)
+
+    def test_list_and_retrieve_use_reader(self):
+        record = self.create_record()
+        self.assertEqual(self.client.get(f"/api/health-records/{record['id']}/").json(), record)
+        self.assertEqual(self.client.get('/api/health-records/').json()['results'], [record])
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f"/api/health-records/{record['id']}/").status_code, 404)
+
+class FastJSONTests(HealthRecordAPITestCase):
+    payload = {
+        'message': '成功创建 2 条健康记录\u2028',
+        'decimal': Decimal('70.50'),
+        'utc': datetime(2024, 5, 1, 8, 30, tzinfo=dt_timezone.utc),
+        'local': timezone.localtime(datetime(2024, 5, 1, 8, 30, 0, 123456, tzinfo=dt_timezone.utc)),
+        'date': date(2024, 5, 1),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'big': 2 ** 70,
+        3: [1.5, None, True],
+    }
+
+    def test_renderer_matches_drf(self):
+        for media_type in (None, 'application/json', 'application/json; indent=2'):
+            self.assertEqual(
+                FastJSONRenderer().render(self.payload, media_type),
+                JSONRenderer().render(self.payload, media_type),
+            )
+        with mock.patch('backend_xyyl.utils.fast_json.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_parser_matches_drf(self):
+        body = json.dumps({'weight': '70.50', 'note': '早餐后', 'big': 2 ** 70}).encode()
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"weight": NaN}'))
+
+    def test_api_round_trip(self):
+        record = self.create_record()
+        response = self.client.get(f"/api/health-records/{record['id']}/", HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content, JSONRenderer().render(record))
+
+class StatisticsTests(HealthRecordAPITestCase):
+    def test_statistics_match_raw_records(self):
+        self.create_record(days_ago=0, weight='70.00', systolic_pressure=118, heart_rate=70, blood_sugar='5.20')
+        self.create_record(days_ago=0, hour=18, weight='71.00', systolic_pressure=126, heart_rate=80, blood_sugar=None)
+        self.create_record(days_ago=2, weight='69.50', diastolic_pressure=76, heart_rate=66, blood_sugar='6.10')
+        # 超出周期范围的记录不参与统计
+        self.create_record(days_ago=40, weight='90.00')
+
+        weight = self.client.get('/api/health-records/statistics/', {'type': 'weight', 'period': 'week'}).json()
+        self.assertEqual(weight['count'], 3)
+        self.assertEqual(weight['average'], 70.17)
+        self.assertEqual(weight['max'], 71.0)
+        self.assertEqual(weight['min'], 69.5)
+        self.assertEqual([point['value'] for point in weight['data']], [69.5, 70.5])
+
+        pressure = self.client.get('/api/health-records/statistics/', {'type': 'bloodPressure', 'period': 'week'}).json()
+        self.assertEqual(pressure['count'], 3)
+        self.assertEqual(pressure['max'], '126.0/80.0')
+        self.assertEqual(pressure['min'], '118.0/76.0')
+
+        sugar = self.client.get('/api/health-records/statistics/', {'type': 'bloodSugar', 'period': 'week'}).json()
+        self.assertEqual(sugar['count'], 2)
+        self.assertEqual(sugar['average'], '5.7')
+
+        heart = self.client.get('/api/health-records/statistics/', {'type': 'heartRate', 'period': 'all'}).json()
+        self.assertEqual(heart['count'], 4)
+        self.assertEqual(len(heart['data']), 3)
+
+    def test_unknown_type_is_rejected(self):
+        response = self.client.get('/api/health-records/statistics/', {'type': 'steps'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_all_types_in_one_query(self):
+        self.create_record(days_ago=0)
+        self.create_record(days_ago=1, blood_sugar=None)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/health-records/statistics/', {'type': 'all', 'period': 'month'})
+        combined = response.json()
+        self.assertEqual(set(combined), {'weight', 'bloodPressure', 'heartRate', 'bloodSugar'})
+        for record_type, expected in combined.items():
+            single = self.client.get('/api/health-records/statistics/', {'type': record_type, 'period': 'month'})
+            self.assertEqual(single.json(), expected)
+
+
+class StatisticsCacheTests(HealthRecordAPITestCase):
+    def get_statistics(self):
+        return self.client.get('/api/health-records/statistics/', {'type': 'weight', 'period': 'week'})
+
+    def test_cached_until_user_writes(self):
+        self.create_record(days_ago=0, weight='70.00')
+        statistics_cache.reset_stats()
+
+        self.assertEqual(self.get_statistics()['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get_statistics()
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(statistics_cache.stats(), {'hits': 1, 'misses': 1})
+
+        # 写入提交后版本号更换，下一次请求重新计算
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_record(days_ago=0, weight='72.00')
+        response = self.get_statistics()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 2)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_cache_table',
+    }})
+    def test_hit_only_reads_database_cache(self):
+        call_command('createcachetable', stdout=StringIO())
+        self.create_record(days_ago=0)
+        self.assertEqual(self.get_statistics()['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_statistics()
+        self.assertEqual(response['X-Cache'], 'HIT')
+        # 版本号和结果各一条 SELECT，命中计数不写入缓存后端
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries.captured_queries))
+
+    def test_versions_are_per_user(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.get_statistics()
+        with self.captureOnCommitCallbacks(execute=True):
+            statistics_cache.bump(other.id)
+        self.assertEqual(self.get_statistics()['X-Cache'], 'HIT')
+
+
+class LocalDayFilterTests(HealthRecordAPITestCase):
+    # migration 0003 中 (user, record_time) 复合索引的名称
+    USER_TIME_INDEX = 'health_info_user_id_bc4769_idx'
+
+    def test_bounds_are_half_open_local_days(self):
+        start, end = local_day_bounds(date(2025, 3, 1), date(2025, 3, 2))
+        self.assertEqual(timezone.localtime(start).isoformat(), '2025-03-01T00:00:00+08:00')
+        self.assertEqual(timezone.localtime(end).isoformat(), '2025-03-03T00:00:00+08:00')
+
+    def test_list_filter_includes_whole_local_day(self):
+        # 本地时间 00:30 和 23:30 的记录在 UTC 下分属前一天和当天
+        self.create_record(days_ago=1, hour=0.5)
+        self.create_record(days_ago=1, hour=23.5)
+        self.create_record(days_ago=0, hour=0.5)
+        day = (timezone.localdate() - timedelta(days=1)).isoformat()
+
+        response = self.client.get('/api/health-records/', {'start_date': day, 'end_date': day})
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_list_query_uses_composite_index(self):
+        request = APIRequestFactory().get('/api/health-records/', {'start_date': '2025-01-01', 'end_date': '2025-01-31'})
+        request = Request(request)
+        request.user = self.user
+        view = HealthRecordViewSet(request=request, format_kwarg=None)
+
+        plan = view.get_queryset().explain()
+        self.assertIn(self.USER_TIME_INDEX, plan)
+        self.assertIn('record_time>', plan)
+        self.assertIn('record_time<', plan)
+
+
+class RecordDateTests(HealthRecordAPITestCase):
+    def test_record_date_is_local_day(self):
+        # UTC 16:30 对应北京时间次日 00:30
+        record = HealthRecord.objects.create(
+            user=self.user, weight='70.00', systolic_pressure=120, diastolic_pressure=80,
+            heart_rate=70, record_time=datetime(2025, 3, 1, 16, 30, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(record.record_date, date(2025, 3, 2))
+
+        record.record_time = datetime(2025, 3, 1, 8, 0, tzinfo=dt_timezone.utc)
+        record.save(update_fields=['record_time'])
+        record.refresh_from_db()
+        self.assertEqual(record.record_date, date(2025, 3, 1))
+
+    def test_bulk_create_fills_record_date(self):
+        records = HealthRecord.objects.bulk_create([
+            HealthRecord(
+                user=self.user, weight='70.00', systolic_pressure=120, diastolic_pressure=80,
+                heart_rate=70, record_time=datetime(2025, 3, 1, 16, 30, tzinfo=dt_timezone.utc),
+            )
+        ])
+        self.assertEqual(records[0].record_date, date(2025, 3, 2))
+
+    def test_day_grouping_uses_record_date_index(self):
+        plan = (HealthRecord.objects
+            .filter(user=self.user, record_date__in=[date(2025, 3, 1)])
+            .values('record_date')
+            .annotate(count=Count('id'))
+            .order_by()
+            .explain())
+        self.assertIn('health_info_user_id_1455d1_idx', plan)
+
+
+class StatisticsGranularityTests(HealthRecordAPITestCase):
+    def get_statistics(self, **params):
+        params.setdefault('type', 'weight')
+        params.setdefault('period', 'all')
+        return self.client.get('/api/health-records/statistics/', params)
+
+    def test_week_and_month_buckets_keep_summary(self):
+        for days_ago in range(0, 60, 3):
+            self.create_record(days_ago=days_ago, weight=f'{60 + days_ago % 7}.00')
+
+        daily = self.get_statistics(granularity='day').json()
+        for granularity in ('week', 'month'):
+            result = self.get_statistics(granularity=granularity).json()
+            self.assertEqual(result['granularity'], granularity)
+            self.assertLess(len(result['data']), len(daily['data']))
+            for key in ('average', 'max', 'min', 'count'):
+                self.assertEqual(result[key], daily[key])
+
+    def test_hour_buckets(self):
+        self.create_record(days_ago=0, hour=8)
+        self.create_record(days_ago=0, hour=8.5, weight='71.50')
+        self.create_record(days_ago=0, hour=20)
+
+        result = self.get_statistics(granularity='hour', period='week').json()
+        today = timezone.localdate().isoformat()
+        self.assertEqual(
+            result['data'],
+            [{'date': f'{today} 08:00', 'value': 71.0}, {'date': f'{today} 20:00', 'value': 70.5}],
+        )
+
+    def test_auto_granularity_and_downsampling(self):
+        records = [make_record_data(days_ago=day, weight=f'{60 + day % 10}.00') for day in range(120)]
+        self.client.post('/api/health-records/batch/', records, format='json')
+
+        result = self.get_statistics(granularity='auto', max_points=200).json()
+        self.assertEqual(result['granularity'], 'day')
+
+        result = self.get_statistics(granularity='auto', max_points=30).json()
+        self.assertEqual(result['granularity'], 'week')
+
+        result = self.get_statistics(granularity='day', max_points=20).json()
+        self.assertEqual(len(result['data']), 20)
+        self.assertEqual(result['count'], 120)
+
+    def test_day_granularity_is_not_downsampled_by_default(self):
+        records = [make_record_data(days_ago=day) for day in range(12)]
+        self.client.post('/api/health-records/batch/', records, format='json')
+        with mock.patch.object(HealthRecordViewSet, 'DEFAULT_MAX_POINTS', 5):
+            # 旧版客户端不传 granularity 和 max_points，按天返回全部点
+            self.assertEqual(len(self.get_statistics().json()['data']), 12)
+            result = self.get_statistics(granularity='auto').json()
+        self.assertEqual(result['granularity'], 'week')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get_statistics(granularity='minute').status_code, 400)
+        self.assertEqual(self.get_statistics(max_points='abc').status_code, 400)
+        self.assertEqual(self.get_statistics(max_points=100000).status_code, 400)
+
+
+class DownsamplingTests(TestCase):
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        xs = list(range(100))
+        ys = [0] * 100
+        ys[37] = 50
+        indices = lttb_indices(xs, ys, 10)
+        self.assertEqual(len(indices), 10)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 99)
+        self.assertIn(37, indices)
+        self.assertEqual(indices, sorted(indices))
+
+    def test_lttb_returns_all_points_under_threshold(self):
+        self.assertEqual(lttb_indices([1, 2, 3], [1, 2, 3], 10), [0, 1, 2])
+
+
+class AnalyticsTests(HealthRecordAPITestCase):
+    def test_analytics_matches_reference_values(self):
+        weights = ['70.00', '71.00', '69.00', '72.00', '73.00']
+        for days_ago, weight in zip(range(8, 3, -1), weights):
+            self.create_record(days_ago=days_ago, weight=weight, systolic_pressure=110 + days_ago * 2)
+        self.create_record(days_ago=1, hour=12, weight='74.00', blood_sugar=None)
+
+        response = self.client.get('/api/health-records/analytics/', {'period': 'month'})
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+
+        values = [float(w) for w in weights] + [74.0]
+        weight = result['weight']
+        self.assertEqual(result['count'], 6)
+        self.assertEqual(weight['mean'], round(statistics.fmean(values), 2))
+        self.assertEqual(weight['std'], round(statistics.stdev(values), 2))
+        self.assertEqual(weight['median'], statistics.median(values))
+        self.assertGreater(weight['slope_per_day'], 0)
+        # 最后一天的 7 天窗口包含第 7 天前到当天的 5 条读数
+        self.assertEqual(weight['rolling_7d'][-1]['value'], round(statistics.fmean(values[1:]), 2))
+        self.assertEqual(weight['rolling_30d'][-1]['value'], round(statistics.fmean(values), 2))
+
+        self.assertEqual(result['bloodSugar']['count'], 5)
+        variability = result['bloodPressure']['variability']['systolic']
+        self.assertEqual(variability['arv'], 2.0)
+
+    def test_analytics_without_records(self):
+        result = self.client.get('/api/health-records/analytics/').json()
+        self.assertEqual(result['count'], 0)
+        self.assertIsNone(result['weight']['mean'])
+        self.assertEqual(result['weight']['rolling_7d'], [])
+
+
+class ExportTests(HealthRecordAPITestCase):
+    def test_csv_export_streams_all_records(self):
+        for days_ago in range(30):
+            self.create_record(days_ago=days_ago)
+
+        response = self.client.get('/api/health-records/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'id,weight,systolic_pressure,diastolic_pressure,heart_rate,blood_sugar,record_time,client_id,created_at,updated_at')
+        self.assertEqual(len(lines), 31)
+
+    def test_ndjson_export_matches_serializer_and_filters(self):
+        self.create_record(days_ago=5)
+        self.create_record(days_ago=1, blood_sugar=None)
+        day = (timezone.localdate() - timedelta(days=1)).isoformat()
+
+        response = self.client.get('/api/health-records/export/', {'export_format': 'ndjson', 'start_date': day})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        listed = self.client.get('/api/health-records/', {'start_date': day}).json()['results']
+        self.assertEqual(records, listed)
+
+    def test_unknown_export_format(self):
+        response = self.client.get('/api/health-records/export/', {'export_format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PaginationTests(HealthRecordAPITestCase):
+    def setUp(self):
+        super().setUp()
+        records = [make_record_data(days_ago=index // 3, hour=index % 3) for index in range(25)]
+        # 两条记录时间相同，验证键集分页按 id 区分
+        records.append(make_record_data(days_ago=2, hour=1))
+        self.client.post('/api/health-records/batch/', records, format='json')
+        self.expected_ids = list(
+            HealthRecord.objects.filter(user=self.user).order_by('-record_time', '-id').values_list('id', flat=True)
+        )
+
+    def test_page_number_mode_is_unchanged(self):
+        result = self.client.get('/api/health-records/').json()
+        self.assertEqual(result['count'], 26)
+        self.assertEqual([record['id'] for record in result['results']], self.expected_ids[:20])
+
+    def test_page_size_is_capped(self):
+        result = self.client.get('/api/health-records/', {'page_size': 5}).json()
+        self.assertEqual(len(result['results']), 5)
+        self.assertEqual(HealthRecordPagination.max_page_size, 100)
+        result = self.client.get('/api/health-records/', {'page_size': 1000}).json()
+        self.assertEqual(len(result['results']), 26)
+
+    def test_skip_count(self):
+        # 是否有归档数据的检查结果会被缓存，先请求一次
+        self.client.get('/api/health-records/', {'count': 'false'})
+        with self.assertNumQueries(1):
+            result = self.client.get('/api/health-records/', {'count': 'false', 'page': 2, 'page_size': 10}).json()
+        self.assertNotIn('count', result)
+        self.assertEqual([record['id'] for record in result['results']], self.expected_ids[10:20])
+        self.assertIn('page=3', result['next'])
+
+    def test_cursor_walk_forward_and_back(self):
+        seen = []
+        pages = []
+        url = '/api/health-records/?pagination=cursor&page_size=7'
+        while url:
+            result = self.client.get(url).json()
+            self.assertNotIn('count', result)
+            pages.append(result)
+            seen.extend(record['id'] for record in result['results'])
+            url = result['next']
+        self.assertEqual(seen, self.expected_ids)
+
+        previous = self.client.get(pages[2]['previous']).json()
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/health-records/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_query_uses_composite_index(self):
+        record = HealthRecord.objects.filter(user=self.user).order_by('-record_time', '-id')[10]
+        plan = (HealthRecord.objects
+            .filter(user=self.user)
+            .filter(Q(record_time__lte=record.record_time) & (Q(record_time__lt=record.record_time) | Q(id__lt=record.id)))
+            .order_by('-record_time', '-id')[:21]
+            .explain())
+        self.assertIn(LocalDayFilterTests.USER_TIME_INDEX, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class SyncChangesTests(HealthRecordAPITestCase):
+    def get_changes(self, token=None, **params):
+        if token:
+            params['sync_token'] = token
+        response = self.client.get('/api/health-records/changes/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_initial_sync_then_deltas(self):
+        first = self.create_record(days_ago=2)
+        second = self.create_record(days_ago=1)
+
+        initial = self.get_changes()
+        self.assertEqual([record['id'] for record in initial['created']], [first['id'], second['id']])
+        self.assertEqual(initial['updated'], [])
+        self.assertFalse(initial['has_more'])
+
+        # 没有变更时返回空结果，令牌保持可用
+        empty = self.get_changes(initial['sync_token'])
+        self.assertEqual((empty['created'], empty['updated'], empty['deleted']), ([], [], []))
+
+        third = self.create_record(days_ago=0)
+        self.client.patch(f"/api/health-records/{first['id']}/", {'heart_rate': 90}, format='json')
+        self.client.delete(f"/api/health-records/{second['id']}/")
+
+        delta = self.get_changes(empty['sync_token'])
+        self.assertEqual([record['id'] for record in delta['created']], [third['id']])
+        self.assertEqual([record['id'] for record in delta['updated']], [first['id']])
+        self.assertEqual(delta['updated'][0]['heart_rate'], 90)
+        self.assertEqual(delta['deleted'], [second['id']])
+
+        final = self.get_changes(delta['sync_token'])
+        self.assertEqual((final['created'], final['updated'], final['deleted']), ([], [], []))
+
+    def test_paged_sync_with_limit(self):
+        for days_ago in range(5):
+            self.create_record(days_ago=days_ago)
+        seen, token = [], None
+        while True:
+            result = self.get_changes(token, limit=2)
+            seen.extend(record['id'] for record in result['created'])
+            token = result['sync_token']
+            if not result['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(HealthRecord.objects.values_list('id', flat=True)))
+
+    def test_changes_are_per_user_and_use_index(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        HealthRecord.objects.create(
+            user=other, weight='60.00', systolic_pressure=110, diastolic_pressure=70,
+            heart_rate=60, record_time=timezone.now(),
+        )
+        self.assertEqual(self.get_changes()['created'], [])
+
+        plan = (HealthRecord.objects
+            .filter(user=self.user)
+            .filter(Q(updated_seq__gte=5) & (Q(updated_seq__gt=5) | Q(id__gt=1)))
+            .order_by('updated_seq', 'id')
+            .explain())
+        self.assertIn('health_info_user_id_7b44cc_idx', plan)
+
+    def test_late_commit_with_earlier_timestamp_is_not_skipped(self):
+        first = self.create_record(days_ago=1)
+        token = self.get_changes()['sync_token']
+
+        # 模拟在上次同步之前取得时间戳、之后才提交的事务
+        second = self.create_record(days_ago=0)
+        HealthRecord.objects.filter(pk=second['id']).update(
+            created_at=timezone.now() - timedelta(hours=1), updated_at=timezone.now() - timedelta(hours=1),
+        )
+        delta = self.get_changes(token)
+        self.assertEqual([record['id'] for record in delta['created']], [second['id']])
+
+        self.client.patch(f"/api/health-records/{first['id']}/", {'heart_rate': 90}, format='json')
+        delta = self.get_changes(delta['sync_token'])
+        self.assertEqual([record['id'] for record in delta['updated']], [first['id']])
+
+    def test_legacy_time_token_restarts_sync(self):
+        record = self.create_record()
+        legacy = base64.urlsafe_b64encode(json.dumps(
+            {'u': timezone.now().isoformat(), 'i': record['id'], 'd': None, 'di': 0}
+        ).encode()).decode()
+        result = self.get_changes(legacy)
+        self.assertEqual([item['id'] for item in result['created']], [record['id']])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/health-records/changes/', {'sync_token': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ArchiveTests(HealthRecordAPITestCase):
+    def setUp(self):
+        super().setUp()
+        records = [
+            make_record_data(
+                days_ago=index * 3, hour=index % 24,
+                weight=f'{65 + index % 10}.{index % 100:02d}', systolic_pressure=110 + index % 25,
+                heart_rate=60 + index % 30, blood_sugar=None if index % 4 == 0 else f'{5 + index % 3}.{index % 10}0',
+                **({'client_id': str(uuid.uuid4())} if index % 2 else {}),
+            )
+            for index in range(80)
+        ]
+        # 同一时间的两条记录，验证归档后仍按 id 排序
+        records.append(make_record_data(days_ago=150, hour=150 // 3 % 24))
+        response = self.client.post('/api/health-records/batch/', records, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def archive(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_health_records', days=90, stdout=StringIO())
+
+    def snapshot(self):
+        """收集所有读取接口的输出，用于比较归档前后的结果"""
+        pages, url = [], '/api/health-records/?page_size=9'
+        while url:
+            result = self.client.get(url).json()
+            pages.append(result['results'])
+            url = result['next']
+        cursor_ids, url = [], '/api/health-records/?pagination=cursor&page_size=7'
+        while url:
+            result = self.client.get(url).json()
+            cursor_ids.extend(record['id'] for record in result['results'])
+            url = result['next']
+        start_date = (timezone.localdate() - timedelta(days=200)).isoformat()
+        end_date = (timezone.localdate() - timedelta(days=50)).isoformat()
+        return {
+            'pages': pages,
+            'cursor': cursor_ids,
+            'filtered': self.client.get(
+                '/api/health-records/', {'start_date': start_date, 'end_date': end_date, 'page': 2}
+            ).json(),
+            'export': b''.join(self.client.get('/api/health-records/export/').streaming_content),
+            'hourly': self.client.get(
+                '/api/health-records/statistics/', {'type': 'all', 'period': 'all', 'granularity': 'hour'}
+            ).json(),
+            'daily': self.client.get('/api/health-records/statistics/', {'type': 'all', 'period': 'all'}).json(),
+            'analytics': self.client.get('/api/health-records/analytics/', {'period': 'all'}).json(),
+        }
+
+    def test_reads_are_unchanged_after_archiving(self):
+        before = self.snapshot()
+        self.archive()
+
+        cutoff = local_day_bounds(archive.archive_cutoff(90))[0]
+        self.assertFalse(HealthRecord.objects.filter(record_time__lt=cutoff).exists())
+        self.assertTrue(HealthRecord.objects.exists())
+        self.assertEqual(
+            sum(HealthRecordArchive.objects.values_list('record_count', flat=True)) + HealthRecord.objects.count(), 81,
+        )
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(rollups.rebuild(), DailyHealthSummary.objects.count())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_late_record_merges_into_archive(self):
+        self.archive()
+        archived = archive.load(self.user.id)
+        client_id = next(
+            str(uuid.UUID(bytes=value.tobytes()))
+            for value, null in zip(archived.columns['client_id'], archived.nulls['client_id']) if not null
+        )
+        # 补录一条旧记录，并重传一条已归档的记录
+        self.client.post('/api/health-records/batch/', [
+            make_record_data(days_ago=200, hour=5),
+            make_record_data(days_ago=120, client_id=client_id, weight='99.00'),
+        ], format='json')
+
+        expected = sorted(
+            {(row['record_time'], row['id']) for row in archived.iter_dicts() if row['client_id'] != uuid.UUID(client_id)}
+            | set(HealthRecord.objects.values_list('record_time', 'id')),
+            reverse=True,
+        )
+        result = self.client.get('/api/health-records/', {'page_size': 100}).json()
+        # 重传的已归档记录恢复到原始表后被覆盖，不产生重复记录
+        self.assertEqual(result['count'], 82)
+        self.assertEqual([record['id'] for record in result['results']], [pk for _, pk in expected])
+        weights = [record['weight'] for record in result['results'] if record['client_id'] == client_id]
+        self.assertEqual(weights, ['99.00'])
+
+        self.archive()
+        result = self.client.get('/api/health-records/', {'page_size': 100}).json()
+        self.assertEqual(result['count'], 82)
+        weights = [record['weight'] for record in result['results'] if record['client_id'] == client_id]
+        self.assertEqual(weights, ['99.00'])
+        self.assertEqual(rollups.verify(), [])
+
+    def test_retried_batch_after_archiving_is_skipped(self):
+        keyed = [
+            {key: value for key, value in record.items() if key not in ('id', 'created_at', 'updated_at')}
+            for record in self.client.get('/api/health-records/', {'page_size': 100}).json()['results']
+            if record['client_id']
+        ]
+        self.archive()
+        response = self.client.post('/api/health-records/batch/', keyed, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['skipped'], len(keyed))
+        self.assertEqual(self.client.get('/api/health-records/').json()['count'], 81)
+
+        response = self.client.post('/api/health-records/', keyed[-1], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_archived_records_stay_addressable(self):
+        record_id = HealthRecord.objects.order_by('record_time').values_list('id', flat=True).first()
+        detail = self.client.get(f'/api/health-records/{record_id}/').json()
+        self.archive()
+        self.assertFalse(HealthRecord.objects.filter(pk=record_id).exists())
+        self.assertEqual(self.client.get(f'/api/health-records/{record_id}/').json(), detail)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/health-records/{record_id}/', {'heart_rate': 99}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['created_at'], detail['created_at'])
+        self.assertEqual(self.client.get(f'/api/health-records/{record_id}/').json()['heart_rate'], 99)
+        self.assertEqual(self.client.get('/api/health-records/').json()['count'], 81)
+        self.assertEqual(rollups.verify(), [])
+
+        other_id = int(archive.load(self.user.id).columns['id'][0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/health-records/{other_id}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/health-records/{other_id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/health-records/').json()['count'], 80)
+        self.assertEqual(rollups.verify(), [])
+
+    def test_sync_includes_archived_records(self):
+        token = self.client.get('/api/health-records/changes/').json()['sync_token']
+        self.archive()
+        result = self.client.get('/api/health-records/changes/', {'limit': 1000}).json()
+        self.assertEqual(len(result['created']), 81)
+        self.assertEqual(self.client.get('/api/health-records/changes/', {'sync_token': token}).json()['created'], [])
+
+        # 分页读取时归档记录与原始记录按 (修改序号, id) 合并
+        seen, token = [], None
+        while True:
+            result = self.client.get('/api/health-records/changes/', {'sync_token': token or '', 'limit': 7}).json()
+            seen.extend(record['id'] for record in result['created'])
+            token = result['sync_token']
+            if not result['has_more']:
+                break
+        expected = archive.load(self.user.id).columns['id'].tolist() + list(HealthRecord.objects.values_list('id', flat=True))
+        self.assertEqual(sorted(seen), sorted(expected))
+
+    def test_block_round_trip(self):
+        rows = list(HealthRecord.objects.order_by('record_time', 'id').values_list(*archive.FIELDS))
+        block = archive.Block.unpack(archive.Block.from_rows(reversed(rows)).pack())
+        self.assertEqual(
+            [tuple(row[field] for field in archive.FIELDS) for row in block.iter_dicts()], rows,
+        )
+        days = list(HealthRecord.objects.order_by('record_time', 'id').values_list('record_date', flat=True))
+        self.assertEqual(block.local_days().tolist(), [day.toordinal() for day in days])
+
+
+class AsyncViewTests(HealthRecordAPITestCase):
+    list_view = staticmethod(AsyncAPIView.as_view(
+        viewset_class=HealthRecordViewSet, action='list', sync_actions={'post': 'create'},
+    ))
+    statistics_view = staticmethod(AsyncAPIView.as_view(viewset_class=HealthRecordViewSet, action='statistics'))
+
+    def setUp(self):
+        super().setUp()
+        records = [make_record_data(days_ago=index // 3, hour=index % 3 * 5) for index in range(40)]
+        self.client.post('/api/health-records/batch/', records, format='json')
+        self.token = str(AccessToken.for_user(self.user))
+
+    def call(self, view, path, params=None, method='get', token=None, **extra):
+        factory = AsyncRequestFactory()
+        token = self.token if token is None else token
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        request = getattr(factory, method)(path, params, headers=headers, **extra)
+        return async_to_sync(view)(request)
+
+    def test_list_matches_sync_view(self):
+        for params in (
+            {},
+            {'page': 2},
+            {'count': 'false', 'page': 3, 'page_size': 7},
+            {'pagination': 'cursor', 'page_size': 6},
+            {'start_date': (timezone.localdate() - timedelta(days=5)).isoformat()},
+        ):
+            expected = self.client.get('/api/health-records/', params).json()
+            response = self.call(self.list_view, '/api/health-records/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), expected, params)
+
+        # 沿游标翻页
+        url = self.call(self.list_view, '/api/health-records/', {'pagination': 'cursor', 'page_size': 6})
+        next_link = json.loads(url.content)['next']
+        response = self.call(self.list_view, next_link)
+        self.assertEqual(json.loads(response.content), self.client.get(next_link).json())
+
+    def test_list_includes_archived_records(self):
+        self.create_record(days_ago=200)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_health_records', days=90, stdout=StringIO())
+        expected = self.client.get('/api/health-records/', {'page': 3}).json()
+        self.assertEqual(expected['count'], 41)
+        response = self.call(self.list_view, '/api/health-records/', {'page': 3})
+        self.assertEqual(json.loads(response.content), expected)
+
+    def test_statistics_matches_sync_view_and_uses_cache(self):
+        for params in (
+            {'type': 'all', 'period': 'month'},
+            {'type': 'weight', 'period': 'week', 'granularity': 'hour'},
+            {'type': 'bloodPressure', 'period': 'all', 'granularity': 'auto', 'max_points': 10},
+        ):
+            cache.clear()
+            expected = self.client.get('/api/health-records/statistics/', params).json()
+            cache.clear()
+            response = self.call(self.statistics_view, '/api/health-records/statistics/', params)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(json.loads(response.content), expected, params)
+            response = self.call(self.statistics_view, '/api/health-records/statistics/', params)
+            self.assertEqual(response['X-Cache'], 'HIT')
+
+        response = self.call(self.statistics_view, '/api/health-records/statistics/', {'type': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_authentication_errors_match_sync_view(self):
+        anonymous = APIClient()
+        expected = anonymous.get('/api/health-records/')
+        response = self.call(self.list_view, '/api/health-records/', token='')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content), expected.json())
+        self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+
+        response = self.call(self.list_view, '/api/health-records/', token='not-a-token')
+        self.assertEqual(response.status_code, 401)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.call(self.list_view, '/api/health-records/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_methods_use_sync_view(self):
+        response = self.call(
+            self.list_view, '/api/health-records/', json.dumps(make_record_data()),
+            method='post', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 41)
+
+        response = self.call(self.statistics_view, '/api/health-records/statistics/', method='post')
+        self.assertEqual(response.status_code, 405)
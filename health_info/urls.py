@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from backend_xyyl.utils.async_views import AsyncAPIView
 from .views import HealthRecordViewSet
 
 router = DefaultRouter()
@@ -8,4 +10,15 @@ router.register(r'health-records', HealthRecordViewSet, basename='health-record'
 urlpatterns = [
     # 只包含路由器生成的URLs，动作路由会自动注册为 /health-records/batch/
     path('', include(router.urls)),
-] 
\ No newline at end of file
+]
+
+if settings.ASYNC_API_VIEWS:
+    # ASGI 部署时列表和统计的 GET 请求使用原生异步视图，排在路由器之前优先匹配
+    urlpatterns = [
+        path('health-records/', AsyncAPIView.as_view(
+            viewset_class=HealthRecordViewSet, action='list', sync_actions={'post': 'create'},
+        )),
+        path('health-records/statistics/', AsyncAPIView.as_view(
+            viewset_class=HealthRecordViewSet, action='statistics',
+        )),
+    ] + urlpatterns
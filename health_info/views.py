@@ -1,16 +1,35 @@
 from django.shortcuts import render
 
 # Create your views here.
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from django.db.models import Avg, Max, Min, Count
-from django.db.models.functions import TruncDate
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F, Max, Min
+from django.db.models.functions import TruncHour, TruncMonth, TruncWeek
 from django.utils import timezone
 from datetime import datetime
-from .models import HealthRecord
-from .serializers import HealthRecordSerializer
+from decimal import Decimal
+from uuid import UUID
+import csv
+import heapq
+import json
+import logging
+from .models import HealthRecord, HealthRecordTombstone, DailyHealthSummary
+from .serializers import HealthRecordReader, HealthRecordSerializer
+from . import analytics, archive, ingest, rollups, sync
+from .cache import statistics_cache
+from .dates import filter_by_local_days, local_date, local_day_bounds, parse_date
+from .downsampling import lttb_indices
+from .pagination import HealthRecordPagination
+from .rollups import SUMMARY_VALUE_FIELDS
+
+logger = logging.getLogger(__name__)
 
 # 注释掉独立的批量创建视图函数
 # @api_view(['POST'])
@@ -31,31 +50,182 @@ from .serializers import HealthRecordSerializer
 #     """
 #     # ... 原有代码 ...
 
+class _LineBuffer:
+    """供 csv.writer 使用的伪文件对象，write 直接返回写入的内容以便逐行流式输出"""
+
+    def write(self, value):
+        return value
+
+
 class HealthRecordViewSet(viewsets.ModelViewSet):
     serializer_class = HealthRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HealthRecordPagination
 
     def get_queryset(self):
         """获取用户的健康记录"""
         queryset = HealthRecord.objects.filter(user=self.request.user)
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
 
         try:
-            if start_date:
-                start_date = timezone.make_aware(datetime.strptime(start_date, '%Y-%m-%d'))
-                queryset = queryset.filter(record_time__date__gte=start_date.date())
-            if end_date:
-                end_date = timezone.make_aware(datetime.strptime(end_date, '%Y-%m-%d'))
-                end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                queryset = queryset.filter(record_time__date__lte=end_date.date())
+            start_date, end_date = self._get_date_params()
         except ValueError as e:
             # 添加详细的错误日志
             print(f"日期格式错误: {e}")
             # 如果日期格式无效，返回空查询集
             return HealthRecord.objects.none()
 
-        return queryset
+        # 本地日期转换为 record_time 的半开区间，可以使用 (user, record_time) 索引
+        return filter_by_local_days(queryset, start_date, end_date)
+    
+    # 列表和详情走只读快速路径：values() 读取字段，不创建模型实例，输出与序列化器一致
+    # 列表和详情同时包含已归档的记录；修改和删除已归档的记录前先把它恢复到原始表，见 get_object
+    def list(self, request, *args, **kwargs):
+        reader = HealthRecordReader()
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        bounds = self._get_archive_bounds()
+        if bounds is not None:
+            queryset = archive.ArchivedRecordList(queryset, request.user.id, *bounds)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.to_list(page))
+        return Response(reader.to_list(queryset))
+    
+    async def alist(self, request):
+        """list 的异步版本，由 ASGI 部署下的异步视图调用，分页查询使用异步 ORM"""
+        reader = HealthRecordReader()
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        bounds = await self._aget_archive_bounds()
+        if bounds is not None:
+            # 合并归档记录的序列只有同步实现
+            queryset = archive.ArchivedRecordList(queryset, request.user.id, *bounds)
+            page = await sync_to_async(self.paginate_queryset)(queryset)
+        else:
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        return self.get_paginated_response(reader.to_list(page))
+    
+    def retrieve(self, request, *args, **kwargs):
+        reader = HealthRecordReader()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = get_object_or_404(
+                reader.values(self.filter_queryset(self.get_queryset())),
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except Http404:
+            row = self._find_archived(self.kwargs[lookup_url_kwarg])
+            if row is None:
+                raise
+        return Response(reader.to_representation(row))
+    
+    def get_object(self):
+        """修改和删除时，记录不在原始表中则从归档块恢复后再查找"""
+        try:
+            return super().get_object()
+        except Http404:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            if self._find_archived(self.kwargs[lookup_url_kwarg]) is None:
+                raise
+            archive.restore(self.request.user.id, ids=[int(self.kwargs[lookup_url_kwarg])])
+            return super().get_object()
+    
+    def _find_archived(self, pk):
+        """按 id 查找日期参数范围内的归档记录，没有时返回 None"""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        bounds = self._get_archive_bounds()
+        if bounds is None:
+            return None
+        rows = archive.find(self.request.user.id, ids=[pk], start=bounds[0], end=bounds[1])
+        return rows[0] if rows else None
+    
+    def _get_date_params(self):
+        """解析 start_date / end_date 查询参数，格式错误时抛出 ValueError"""
+        return (
+            parse_date(self.request.query_params.get('start_date', None)),
+            parse_date(self.request.query_params.get('end_date', None)),
+        )
+    
+    def _get_archive_bounds(self, start_date=None, end_date=None):
+        """
+        读取归档记录的时间区间 (start, end)
+        
+        取 start_date / end_date 查询参数与给定日期区间的交集；
+        用户没有归档数据或日期参数无效（此时 get_queryset 返回空查询集）时返回 None。
+        """
+        if not archive.has_archives(self.request.user.id):
+            return None
+        return self._intersect_date_params(start_date, end_date)
+    
+    async def _aget_archive_bounds(self, start_date=None, end_date=None):
+        if not await archive.ahas_archives(self.request.user.id):
+            return None
+        return self._intersect_date_params(start_date, end_date)
+    
+    def _intersect_date_params(self, start_date, end_date):
+        try:
+            param_start, param_end = self._get_date_params()
+        except ValueError:
+            return None
+        if param_start and (start_date is None or param_start > start_date):
+            start_date = param_start
+        if param_end and (end_date is None or param_end < end_date):
+            end_date = param_end
+        return local_day_bounds(start_date, end_date)
+    
+    def _load_archive_for_period(self, period):
+        """读取时间周期内的归档记录，没有时返回 None"""
+        bounds = self._get_archive_bounds(*self._get_date_range_for_period(period))
+        if bounds is None:
+            return None
+        return archive.load(self.request.user.id, *bounds)
+    
+    def _raise_if_client_id_taken(self, client_id, exclude_pk=None):
+        """写入因唯一约束失败后，只有确实是 (user, client_id) 重复时才返回 400，其他完整性错误照常抛出"""
+        if client_id is None:
+            return
+        duplicates = HealthRecord.objects.filter(user=self.request.user, client_id=client_id)
+        if exclude_pk is not None:
+            duplicates = duplicates.exclude(pk=exclude_pk)
+        if duplicates.exists():
+            raise ValidationError({'client_id': ['该客户端记录ID已存在']})
+
+    # 写入原始记录的同时，在同一事务内维护每日汇总，并在提交后更换统计缓存版本
+    def perform_create(self, serializer):
+        client_id = serializer.validated_data.get('client_id')
+        if client_id and archive.has_archives(self.request.user.id) \
+                and archive.find(self.request.user.id, client_ids=[client_id]):
+            raise ValidationError({'client_id': ['该客户端记录ID已存在']})
+        try:
+            with transaction.atomic():
+                record = serializer.save()
+                rollups.add_records([record])
+                statistics_cache.bump(record.user_id)
+        except IntegrityError:
+            self._raise_if_client_id_taken(client_id)
+            raise
+    
+    def perform_update(self, serializer):
+        old_date = local_date(serializer.instance.record_time)
+        client_id = serializer.validated_data.get('client_id', serializer.instance.client_id)
+        try:
+            with transaction.atomic():
+                record = serializer.save()
+                rollups.refresh_days(record.user_id, {old_date, local_date(record.record_time)})
+                statistics_cache.bump(record.user_id)
+        except IntegrityError:
+            self._raise_if_client_id_taken(client_id, exclude_pk=serializer.instance.pk)
+            raise
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            record_id = instance.id
+            instance.delete()
+            HealthRecordTombstone.objects.create(user_id=instance.user_id, record_id=record_id)
+            rollups.refresh_days(instance.user_id, {local_date(instance.record_time)})
+            statistics_cache.bump(instance.user_id)
     
     # 添加批量创建健康记录的自定义动作
     @action(detail=False, methods=['post'])
@@ -72,6 +242,9 @@ class HealthRecordViewSet(viewsets.ModelViewSet):
         - heart_rate: 心率(次/分钟)
         - blood_sugar: 血糖(mmol/L)，可选
         - record_time: 记录时间
+        - client_id: 客户端生成的记录UUID，可选；同一 client_id 重复上传时覆盖原记录，内容相同则跳过
+        
+        默认任一记录校验失败时整批不写入；partial=true 时只拒绝无效记录，见 _partial_batch
         """
         # 获取请求中的记录数据
         request_data = request.data
@@ -97,21 +270,23 @@ class HealthRecordViewSet(viewsets.ModelViewSet):
                 "count": 0
             }, status=status.HTTP_200_OK)
         
-        # 为每条记录添加用户ID
-        user = request.user
-        for record in records_data:
-            record['user'] = user.id
+        if request.query_params.get('partial', '').lower() in ('true', '1'):
+            return self._partial_batch(records_data)
         
-        # 使用序列化器批量创建记录
+        # 使用序列化器批量创建记录，用户由 HealthRecordListSerializer 从请求上下文获取
         serializer = self.get_serializer(data=records_data, many=True)
         
         if serializer.is_valid():
-            records = serializer.save()
+            records = self._save_batch(serializer)
             # 返回更简洁的响应
+            message = f"成功创建 {len(records)} 条健康记录"
+            if serializer.skipped:
+                message += f"，跳过 {serializer.skipped} 条重复记录"
             return Response({
                 "success": True,
-                "message": f"成功创建 {len(records)} 条健康记录",
-                "count": len(records)
+                "message": message,
+                "count": len(records),
+                "skipped": serializer.skipped
             }, status=status.HTTP_201_CREATED)
         
         return Response({
@@ -119,9 +294,266 @@ class HealthRecordViewSet(viewsets.ModelViewSet):
             "errors": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    def _partial_batch(self, records_data):
+        """
+        部分成功模式的批量创建
+        
+        逐条校验，有效记录按 HEALTH_INGEST_CHUNK_SIZE 分块、各自在独立事务中提交，
+        某个分块写入失败只影响该分块。无效记录和写入失败的记录连同其在请求中的下标返回。
+        返回格式: { success, accepted, rejected, skipped, ids: [写入的记录ID...], errors: [{index, errors}] }
+        """
+        child = self.get_serializer()
+        valid, rejected = [], []
+        for index, record in enumerate(records_data):
+            try:
+                valid.append((index, child.run_validation(record)))
+            except ValidationError as e:
+                rejected.append({"index": index, "errors": e.detail})
+        
+        chunk_size = getattr(settings, 'HEALTH_INGEST_CHUNK_SIZE', 1000)
+        ids, skipped = [], 0
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            serializer = self.get_serializer(many=True)
+            try:
+                records = self._save_batch(serializer, [data for _, data in chunk])
+            except DatabaseError:
+                logger.exception("批量写入健康记录失败，第 %d 到 %d 条", chunk[0][0], chunk[-1][0])
+                rejected.extend({"index": index, "errors": "数据库写入失败，请重试"} for index, _ in chunk)
+                continue
+            ids.extend(record.id for record in records)
+            skipped += serializer.skipped
+        
+        rejected.sort(key=lambda error: error["index"])
+        accepted = len(records_data) - len(rejected)
+        return Response({
+            "success": not rejected,
+            "message": f"接收 {accepted} 条健康记录，拒绝 {len(rejected)} 条",
+            "accepted": accepted,
+            "rejected": len(rejected),
+            "skipped": skipped,
+            "ids": ids,
+            "errors": rejected
+        }, status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST)
+    
+    def _save_batch(self, serializer, validated_data=None):
+        """
+        在一个事务中批量写入已校验的记录，并维护每日汇总和统计缓存
+        
+        validated_data 为空时写入 serializer 自身校验过的数据
+        """
+        user_id = self.request.user.id
+        with transaction.atomic():
+            records = serializer.save() if validated_data is None else serializer.create(validated_data)
+            # 先增量累加新插入的记录，再重新汇总 upsert 涉及的日期
+            rollups.add_records(serializer.inserted)
+            rollups.refresh_days(user_id, serializer.refresh_dates)
+            if records:
+                statistics_cache.bump(user_id)
+        return records
+    
+    @action(detail=False, methods=['post'])
+    def ingest(self, request):
+        """
+        流式导入健康记录（用于可穿戴设备等大批量数据）
+        
+        请求体为 NDJSON（Content-Type: application/x-ndjson），每行一条记录，字段与 batch 相同。
+        逐行读取请求体，每 HEALTH_INGEST_CHUNK_SIZE 条记录校验一次并在独立事务中提交：
+        校验失败的分块整体不写入，其余分块照常提交。
+        支持分块传输（没有 Content-Length）的请求，读取超过上限时返回 413 和已提交分块的结果；
+        服务器无法确定请求体结尾时返回 411。
+        返回每个分块的处理结果: { success, count, skipped, chunks: [{index, start_line, end_line, count, skipped, errors}] }
+        """
+        content_type = request.content_type.split(';')[0].strip().lower()
+        if content_type not in ingest.NDJSON_CONTENT_TYPES:
+            return Response(
+                {"error": f"Content-Type 应为 {ingest.NDJSON_CONTENT_TYPES[0]}"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        max_body_size = getattr(settings, 'HEALTH_INGEST_MAX_BODY_SIZE', 64 * 1024 * 1024)
+        content_length = request.META.get('CONTENT_LENGTH')
+        if content_length:
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                return Response({"error": "Content-Length 格式错误"}, status=status.HTTP_400_BAD_REQUEST)
+            if content_length > max_body_size:
+                return Response(
+                    {"error": f"请求体超过 {max_body_size} 字节的上限"},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
+            stream = request.stream
+        elif request.META.get('wsgi.input_terminated'):
+            # 分块传输（Transfer-Encoding: chunked）没有 Content-Length，服务器保证输入流读到 EOF 即结束
+            stream = request.META['wsgi.input']
+        else:
+            # 无法确定请求体在哪里结束，继续读取可能一直阻塞
+            return Response({"error": "请求缺少 Content-Length"}, status=status.HTTP_411_LENGTH_REQUIRED)
+        
+        chunk_size = getattr(settings, 'HEALTH_INGEST_CHUNK_SIZE', 1000)
+        chunks, total, skipped = [], 0, 0
+        lines = ingest.iter_lines(stream, max_body_size)
+        try:
+            for chunk in ingest.iter_chunks(lines, chunk_size):
+                result = {
+                    "index": chunk.index,
+                    "start_line": chunk.start_line,
+                    "end_line": chunk.end_line,
+                    "count": 0,
+                    "skipped": 0,
+                    "errors": chunk.errors,
+                }
+                serializer = self.get_serializer(data=chunk.records, many=True)
+                if not serializer.is_valid():
+                    # 列表序列化器的错误可能是与输入对齐的列表，也可能是 {下标: 错误} 的字典
+                    errors = serializer.errors
+                    indexed = errors.items() if isinstance(errors, dict) else enumerate(errors)
+                    result["errors"] = sorted(chunk.errors + [
+                        {"line": chunk.lines[index], "errors": item_errors}
+                        for index, item_errors in indexed if item_errors
+                    ], key=lambda error: error["line"])
+                if not result["errors"]:
+                    result["count"] = len(self._save_batch(serializer))
+                    result["skipped"] = serializer.skipped
+                    total += result["count"]
+                    skipped += result["skipped"]
+                chunks.append(result)
+        except ingest.BodyTooLarge:
+            # 此前的分块已经提交，返回它们的结果以便客户端从中断处继续
+            return Response({
+                "error": f"请求体超过 {max_body_size} 字节的上限",
+                "count": total,
+                "skipped": skipped,
+                "chunks": chunks
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
+        failed = sum(1 for result in chunks if result["errors"])
+        message = f"成功导入 {total} 条健康记录"
+        if failed:
+            message += f"，{failed} 个分块校验失败未写入"
+        return Response({
+            "success": not failed,
+            "message": message,
+            "count": total,
+            "skipped": skipped,
+            "chunks": chunks
+        }, status=status.HTTP_400_BAD_REQUEST if failed else status.HTTP_201_CREATED)
+    
+    SYNC_DEFAULT_LIMIT = 500
+    SYNC_MAX_LIMIT = 1000
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        增量同步：返回同步令牌之后新建、修改和删除的健康记录
+        
+        参数 sync_token 为上次返回的令牌（首次同步不传），limit 为每类变更的最大条数。
+        返回格式: { created: [...], updated: [...], deleted: [记录ID...], sync_token, has_more }
+        has_more 为 true 时应立即使用新令牌继续请求。
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', self.SYNC_DEFAULT_LIMIT)), self.SYNC_MAX_LIMIT)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": f"limit 应为 1 到 {self.SYNC_MAX_LIMIT} 之间的整数"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        token = request.query_params.get('sync_token', None)
+        try:
+            position = sync.decode_token(token)
+            records, deleted, next_token, has_more = sync.get_changes(request.user, token, limit)
+        except sync.InvalidSyncToken:
+            return Response(
+                {"error": "无效的同步令牌"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # 插入位置 (created_seq, id) 在上次同步位置之后的记录客户端尚未见过，归为新建，其余为修改
+        since = (position['s'], position['i'])
+        created = [record for record in records if (record.created_seq, record.id) > since]
+        updated = [record for record in records if (record.created_seq, record.id) <= since]
+        return Response({
+            'created': self.get_serializer(created, many=True).data,
+            'updated': self.get_serializer(updated, many=True).data,
+            'deleted': deleted,
+            'sync_token': next_token,
+            'has_more': has_more,
+        })
+    
+    # 导出字段与 HealthRecordSerializer 的输出字段一致
+    EXPORT_FIELDS = ['id', 'weight', 'systolic_pressure', 'diastolic_pressure',
+                     'heart_rate', 'blood_sugar', 'record_time', 'client_id', 'created_at', 'updated_at']
+    EXPORT_FORMATS = ('csv', 'ndjson')
+    EXPORT_CHUNK_SIZE = 2000
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        流式导出当前用户的全部健康记录
+        
+        export_format 取值 csv（默认）或 ndjson；支持与列表接口相同的 start_date / end_date 参数。
+        数据按记录时间升序分块读取并逐行输出，内存占用与记录数无关；
+        已归档的记录按月解包，与原始记录按时间合并输出。
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in self.EXPORT_FORMATS:
+            return Response(
+                {"error": f"不支持的导出格式: {export_format}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = (self.get_queryset()
+            .order_by('record_time', 'id')
+            .values_list(*self.EXPORT_FIELDS)
+            .iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+        )
+        bounds = self._get_archive_bounds()
+        if bounds is not None:
+            archived = (
+                tuple(record[field] for field in self.EXPORT_FIELDS)
+                for record in archive.iter_records(request.user.id, *bounds)
+            )
+            order = (self.EXPORT_FIELDS.index('record_time'), self.EXPORT_FIELDS.index('id'))
+            rows = heapq.merge(archived, rows, key=lambda row: (row[order[0]], row[order[1]]))
+        if export_format == 'csv':
+            content = self._export_csv_lines(rows)
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            content = self._export_ndjson_lines(rows)
+            content_type = 'application/x-ndjson; charset=utf-8'
+        
+        response = StreamingHttpResponse(content, content_type=content_type)
+        filename = f"health_records_{timezone.localdate().strftime('%Y%m%d')}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    def _format_export_value(self, value):
+        """与序列化器输出一致：Decimal、UUID 转字符串，时间转为本地时区的 ISO 8601 格式"""
+        if isinstance(value, datetime):
+            return timezone.localtime(value).isoformat()
+        if isinstance(value, (Decimal, UUID)):
+            return str(value)
+        return value
+    
+    def _export_csv_lines(self, rows):
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        yield writer.writerow(self.EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow([self._format_export_value(value) for value in row])
+    
+    def _export_ndjson_lines(self, rows):
+        for row in rows:
+            record = dict(zip(self.EXPORT_FIELDS, (self._format_export_value(value) for value in row)))
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+    
     def _get_date_range_for_period(self, period):
         """根据时间周期计算日期范围"""
-        today = timezone.now().date()
+        today = timezone.localdate()
         if period == 'week':
             start_date = today - timezone.timedelta(days=7)
         elif period == 'month':
@@ -132,224 +564,405 @@ class HealthRecordViewSet(viewsets.ModelViewSet):
             start_date = None
         return start_date, today
     
-    def _get_filtered_queryset(self, period, record_type):
-        """获取根据时间周期和记录类型过滤的查询集"""
+    def _get_filtered_queryset(self, period):
+        """获取根据时间周期过滤的每日汇总查询集"""
         start_date, today = self._get_date_range_for_period(period)
         
-        # 构建基础查询
-        queryset = self.get_queryset()
+        # 统计数据读取每日汇总表，不再扫描原始记录
+        queryset = DailyHealthSummary.objects.filter(user=self.request.user)
         if start_date:
-            queryset = queryset.filter(record_time__date__gte=start_date)
-        queryset = queryset.filter(record_time__date__lte=today)
-        
-        # 根据记录类型过滤
-        if record_type == 'weight':
-            queryset = queryset.exclude(weight__isnull=True)
-        elif record_type == 'bloodPressure':
-            queryset = queryset.exclude(systolic_pressure__isnull=True).exclude(diastolic_pressure__isnull=True)
-        elif record_type == 'heartRate':
-            queryset = queryset.exclude(heart_rate__isnull=True)
-        elif record_type == 'bloodSugar':
-            queryset = queryset.exclude(blood_sugar__isnull=True)
+            queryset = queryset.filter(date__gte=start_date)
+        queryset = queryset.filter(date__lte=today)
+        
+        # 与列表接口一致，支持 start_date / end_date 参数进一步限定范围
+        try:
+            param_start, param_end = self._get_date_params()
+        except ValueError as e:
+            logger.warning("日期格式错误: %s", e)
+            return DailyHealthSummary.objects.none()
+        if param_start:
+            queryset = queryset.filter(date__gte=param_start)
+        if param_end:
+            queryset = queryset.filter(date__lte=param_end)
             
-        return queryset
+        return queryset.order_by('date')
     
-    def _get_weight_statistics(self, queryset):
-        """获取体重统计数据"""
-        # 使用单个聚合查询获取统计数据
-        stats = queryset.aggregate(
-            avg_value=Avg('weight'),
-            max_value=Max('weight'),
-            min_value=Min('weight'),
-            count=Count('id')
-        )
+    def _get_record_queryset_for_period(self, period):
+        """获取时间周期内的原始记录查询集（用于小时粒度）"""
+        start_date, today = self._get_date_range_for_period(period)
+        return filter_by_local_days(self.get_queryset(), start_date, today)
+    
+    def _choose_granularity(self, span, max_points):
+        """根据数据的实际跨度 {first, last}，选择点数不超过 max_points 的最细粒度"""
+        if span['first'] is None:
+            return 'day'
+        days = (span['last'] - span['first']).days + 1
+        if days * 24 <= max_points:
+            return 'hour'
+        if days <= max_points:
+            return 'day'
+        if days / 7 <= max_points:
+            return 'week'
+        return 'month'
+    
+    def _get_bucket_rows(self, period, granularity, max_points):
+        """
+        在数据库中按粒度分桶，返回 (实际粒度, 按时间升序的分桶统计行)
+        
+        天、周、月粒度读取每日汇总表；小时粒度需要读取原始记录，并合并归档记录的分桶结果。
+        """
+        summaries = self._get_filtered_queryset(period)
+        if granularity == 'auto':
+            span = summaries.aggregate(first=Min('date'), last=Max('date'))
+            granularity = self._choose_granularity(span, max_points)
         
-        # 获取趋势数据
-        trend_data = list(queryset
-            .annotate(date=TruncDate('record_time'))
-            .values('date')
-            .annotate(avg_value=Avg('weight'))
-            .order_by('date')
+        if granularity == 'hour':
+            rows = rollups.bucket_records(self._get_record_queryset_for_period(period), TruncHour('record_time'))
+            archived = self._load_archive_for_period(period)
+            if archived is not None and len(archived):
+                rows = rollups.merge_buckets(rows, rollups.bucket_archive(archived))
+        elif granularity == 'week':
+            rows = rollups.bucket_summaries(summaries, TruncWeek('date'))
+        elif granularity == 'month':
+            rows = rollups.bucket_summaries(summaries, TruncMonth('date'))
+        else:
+            rows = list(summaries.values(*SUMMARY_VALUE_FIELDS, bucket=F('date')))
+        return granularity, rows
+    
+    async def _aget_bucket_rows(self, period, granularity, max_points):
+        """_get_bucket_rows 的异步版本"""
+        summaries = self._get_filtered_queryset(period)
+        if granularity == 'auto':
+            span = await summaries.aaggregate(first=Min('date'), last=Max('date'))
+            granularity = self._choose_granularity(span, max_points)
+        
+        if granularity == 'hour':
+            rows = await rollups.abucket_records(
+                self._get_record_queryset_for_period(period), TruncHour('record_time')
+            )
+            bounds = await self._aget_archive_bounds(*self._get_date_range_for_period(period))
+            if bounds is not None:
+                archived = await sync_to_async(archive.load)(self.request.user.id, *bounds)
+                if len(archived):
+                    rows = rollups.merge_buckets(rows, rollups.bucket_archive(archived))
+        elif granularity == 'week':
+            rows = await rollups.abucket_summaries(summaries, TruncWeek('date'))
+        elif granularity == 'month':
+            rows = await rollups.abucket_summaries(summaries, TruncMonth('date'))
+        else:
+            rows = [row async for row in summaries.values(*SUMMARY_VALUE_FIELDS, bucket=F('date'))]
+        return granularity, rows
+    
+    def _format_bucket(self, bucket):
+        """格式化分桶时间：小时粒度精确到小时，其余粒度为桶的起始日期"""
+        if isinstance(bucket, datetime):
+            return timezone.localtime(bucket).strftime('%Y-%m-%d %H:00')
+        return bucket.strftime('%Y-%m-%d')
+    
+    def _downsample(self, points, max_points, value_key):
+        """
+        点数超过 max_points 时使用 LTTB 降采样
+        
+        points 为 (分桶时间, 数据点) 列表，value_key 指定用于保持折线形状的取值
+        """
+        if not max_points or len(points) <= max_points:
+            return [item for _, item in points]
+        xs = [
+            bucket.timestamp() / 86400 if isinstance(bucket, datetime) else bucket.toordinal()
+            for bucket, _ in points
+        ]
+        ys = [item[value_key] for _, item in points]
+        return [points[index][1] for index in lttb_indices(xs, ys, max_points)]
+    
+    def _summarize(self, rows, metric):
+        """合并多个分桶的统计行，返回 (平均值, 最大值, 最小值, 记录数)"""
+        rows = [row for row in rows if row[f'{metric}_count']]
+        count = sum(row[f'{metric}_count'] for row in rows)
+        if not count:
+            return 0, 0, 0, 0
+        total = sum(row[f'{metric}_sum'] for row in rows)
+        return (
+            float(total) / count,
+            max(row[f'{metric}_max'] for row in rows),
+            min(row[f'{metric}_min'] for row in rows),
+            count,
         )
+    
+    def _bucket_average(self, row, metric):
+        """单个分桶的平均值，该桶无此指标数据时返回 None"""
+        if not row[f'{metric}_count']:
+            return None
+        return float(row[f'{metric}_sum']) / row[f'{metric}_count']
+    
+    def _get_weight_statistics(self, rows, max_points=None):
+        """获取体重统计数据"""
+        avg_value, max_value, min_value, count = self._summarize(rows, 'weight')
         
-        # 格式化数据
-        data = []
-        for item in trend_data:
-            if item['date'] and item['avg_value']:
-                data.append({
-                    'date': item['date'].strftime('%Y-%m-%d'),
-                    'value': round(float(item['avg_value']), 2)
-                })
+        # 格式化趋势数据，每个分桶一个点
+        points = []
+        for row in rows:
+            value = self._bucket_average(row, 'weight')
+            if value:
+                points.append((row['bucket'], {
+                    'date': self._format_bucket(row['bucket']),
+                    'value': round(value, 2)
+                }))
         
         return {
-            'average': round(float(stats['avg_value'] or 0), 2),
-            'max': round(float(stats['max_value'] or 0), 2),
-            'min': round(float(stats['min_value'] or 0), 2),
-            'count': stats['count'] or 0,
-            'data': data
+            'average': round(float(avg_value), 2),
+            'max': round(float(max_value), 2),
+            'min': round(float(min_value), 2),
+            'count': count,
+            'data': self._downsample(points, max_points, 'value')
         }
     
-    def _get_blood_pressure_statistics(self, queryset):
+    def _get_blood_pressure_statistics(self, rows, max_points=None):
         """获取血压统计数据"""
-        # 使用单个聚合查询获取统计数据
-        stats = queryset.aggregate(
-            avg_systolic=Avg('systolic_pressure'),
-            max_systolic=Max('systolic_pressure'),
-            min_systolic=Min('systolic_pressure'),
-            avg_diastolic=Avg('diastolic_pressure'),
-            max_diastolic=Max('diastolic_pressure'),
-            min_diastolic=Min('diastolic_pressure'),
-            count=Count('id')
-        )
+        avg_systolic, max_systolic, min_systolic, count = self._summarize(rows, 'systolic')
+        avg_diastolic, max_diastolic, min_diastolic, _ = self._summarize(rows, 'diastolic')
         
-        # 获取趋势数据
-        trend_data = list(queryset
-            .annotate(date=TruncDate('record_time'))
-            .values('date')
-            .annotate(
-                avg_systolic=Avg('systolic_pressure'),
-                avg_diastolic=Avg('diastolic_pressure')
-            )
-            .order_by('date')
-        )
-        
-        # 格式化数据
-        data = []
-        for item in trend_data:
-            if item['date'] and item['avg_systolic'] and item['avg_diastolic']:
-                data.append({
-                    'date': item['date'].strftime('%Y-%m-%d'),
-                    'systolic': round(float(item['avg_systolic']), 0),
-                    'diastolic': round(float(item['avg_diastolic']), 0)
-                })
+        # 格式化趋势数据
+        points = []
+        for row in rows:
+            systolic = self._bucket_average(row, 'systolic')
+            diastolic = self._bucket_average(row, 'diastolic')
+            if systolic and diastolic:
+                points.append((row['bucket'], {
+                    'date': self._format_bucket(row['bucket']),
+                    'systolic': round(systolic, 0),
+                    'diastolic': round(diastolic, 0)
+                }))
         
         # 计算平均值
-        avg_systolic = round(float(stats['avg_systolic'] or 0), 0)
-        avg_diastolic = round(float(stats['avg_diastolic'] or 0), 0)
+        avg_systolic = round(float(avg_systolic), 0)
+        avg_diastolic = round(float(avg_diastolic), 0)
         
         return {
             'average': f"{avg_systolic}/{avg_diastolic}",
-            'max': f"{round(float(stats['max_systolic'] or 0), 0)}/{round(float(stats['max_diastolic'] or 0), 0)}",
-            'min': f"{round(float(stats['min_systolic'] or 0), 0)}/{round(float(stats['min_diastolic'] or 0), 0)}",
-            'count': stats['count'] or 0,
-            'data': data
+            'max': f"{round(float(max_systolic), 0)}/{round(float(max_diastolic), 0)}",
+            'min': f"{round(float(min_systolic), 0)}/{round(float(min_diastolic), 0)}",
+            'count': count,
+            # 收缩压波动更大，以其折线形状为准选点
+            'data': self._downsample(points, max_points, 'systolic')
         }
     
-    def _get_heart_rate_statistics(self, queryset):
+    def _get_heart_rate_statistics(self, rows, max_points=None):
         """获取心率统计数据"""
-        # 使用聚合查询获取统计数据
-        stats = queryset.aggregate(
-            avg_value=Avg('heart_rate'),
-            max_value=Max('heart_rate'),
-            min_value=Min('heart_rate'),
-            count=Count('id')
-        )
-        
-        # 获取趋势数据
-        trend_data = list(queryset
-            .annotate(date=TruncDate('record_time'))
-            .values('date')
-            .annotate(
-                avg_value=Avg('heart_rate')
-            )
-            .order_by('date')
-        )
+        avg_value, max_value, min_value, count = self._summarize(rows, 'heart_rate')
         
-        # 格式化数据
-        data = []
-        for item in trend_data:
-            if item['date'] and item['avg_value']:
-                data.append({
-                    'date': item['date'].strftime('%Y-%m-%d'),
-                    'value': round(float(item['avg_value']), 0)  # 心率取整数
-                })
-        
-        # 计算平均值
-        avg_value = round(float(stats['avg_value'] or 0), 0)
-        max_value = round(float(stats['max_value'] or 0), 0)
-        min_value = round(float(stats['min_value'] or 0), 0)
+        # 格式化趋势数据
+        points = []
+        for row in rows:
+            value = self._bucket_average(row, 'heart_rate')
+            if value:
+                points.append((row['bucket'], {
+                    'date': self._format_bucket(row['bucket']),
+                    'value': round(value, 0)  # 心率取整数
+                }))
         
         return {
-            'average': str(avg_value),
-            'max': str(max_value),
-            'min': str(min_value),
-            'count': stats['count'] or 0,
-            'data': data
+            'average': str(round(float(avg_value), 0)),
+            'max': str(round(float(max_value), 0)),
+            'min': str(round(float(min_value), 0)),
+            'count': count,
+            'data': self._downsample(points, max_points, 'value')
         }
     
-    def _get_blood_sugar_statistics(self, queryset):
+    def _get_blood_sugar_statistics(self, rows, max_points=None):
         """获取血糖统计数据"""
-        # 使用聚合查询获取统计数据
-        stats = queryset.aggregate(
-            avg_value=Avg('blood_sugar'),
-            max_value=Max('blood_sugar'),
-            min_value=Min('blood_sugar'),
-            count=Count('id')
-        )
-        
-        # 获取趋势数据
-        trend_data = list(queryset
-            .annotate(date=TruncDate('record_time'))
-            .values('date')
-            .annotate(
-                avg_value=Avg('blood_sugar')
-            )
-            .order_by('date')
-        )
+        avg_value, max_value, min_value, count = self._summarize(rows, 'blood_sugar')
         
-        # 格式化数据
-        data = []
-        for item in trend_data:
-            if item['date'] and item['avg_value']:
-                data.append({
-                    'date': item['date'].strftime('%Y-%m-%d'),
-                    'value': round(float(item['avg_value']), 1)  # 血糖保留一位小数
-                })
-        
-        # 计算平均值
-        avg_value = round(float(stats['avg_value'] or 0), 1)
-        max_value = round(float(stats['max_value'] or 0), 1)
-        min_value = round(float(stats['min_value'] or 0), 1)
+        # 格式化趋势数据
+        points = []
+        for row in rows:
+            value = self._bucket_average(row, 'blood_sugar')
+            if value:
+                points.append((row['bucket'], {
+                    'date': self._format_bucket(row['bucket']),
+                    'value': round(value, 1)  # 血糖保留一位小数
+                }))
         
         return {
-            'average': str(avg_value),
-            'max': str(max_value),
-            'min': str(min_value),
-            'count': stats['count'] or 0,
-            'data': data
+            'average': str(round(float(avg_value), 1)),
+            'max': str(round(float(max_value), 1)),
+            'min': str(round(float(min_value), 1)),
+            'count': count,
+            'data': self._downsample(points, max_points, 'value')
         }
 
+    # 统计类型 -> 处理函数名
+    STATISTICS_HANDLERS = {
+        'weight': '_get_weight_statistics',
+        'bloodPressure': '_get_blood_pressure_statistics',
+        'heartRate': '_get_heart_rate_statistics',
+        'bloodSugar': '_get_blood_sugar_statistics',
+    }
+    
+    GRANULARITIES = ('hour', 'day', 'week', 'month', 'auto')
+    
+    # 趋势数据点数上限：auto 粒度的默认值和允许的最大值
+    DEFAULT_MAX_POINTS = getattr(settings, 'HEALTH_STATISTICS_MAX_POINTS', 300)
+    MAX_POINTS_LIMIT = 2000
+
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """获取健康记录统计数据"""
+        """
+        获取健康记录统计数据
+        
+        type 取值 weight / bloodPressure / heartRate / bloodSugar；
+        type=all 时一次查询返回全部指标，结构为 {类型: 该类型的统计结果}
+        
+        granularity 取值 hour / day / week / month / auto，默认 day，
+        auto 根据数据跨度选择点数不超过 max_points 的最细粒度；
+        分桶后点数仍超过 max_points 时使用 LTTB 降采样。
+        未指定 max_points 时只有 auto 粒度使用默认上限，其他粒度不降采样
+        """
+        params, error = self._get_statistics_params(request)
+        if error is not None:
+            return error
+        
+        try:
+            result, hit = statistics_cache.get_or_set(
+                request.user.id,
+                self._get_statistics_cache_parts(request, *params),
+                lambda: self._compute_statistics(*params),
+            )
+            return self._statistics_response(result, hit)
+        except Exception as e:
+            # 统一异常处理
+            return self._statistics_error(e)
+    
+    async def astatistics(self, request):
+        """statistics 的异步版本，由 ASGI 部署下的异步视图调用，缓存和查询都使用异步接口"""
+        params, error = self._get_statistics_params(request)
+        if error is not None:
+            return error
+        
+        try:
+            result, hit = await statistics_cache.aget_or_set(
+                request.user.id,
+                self._get_statistics_cache_parts(request, *params),
+                lambda: self._acompute_statistics(*params),
+            )
+            return self._statistics_response(result, hit)
+        except Exception as e:
+            return self._statistics_error(e)
+    
+    def _get_statistics_params(self, request):
+        """
+        解析统计参数
+        
+        返回 ((type, period, granularity, max_points), None)，参数无效时返回 (None, 400 响应)；
+        max_points 为 None 表示不降采样
+        """
         # 获取统计类型和周期参数
         record_type = request.query_params.get('type', 'weight')
         period = request.query_params.get('period', 'week')
+        granularity = request.query_params.get('granularity', 'day')
         
+        if record_type != 'all' and record_type not in self.STATISTICS_HANDLERS:
+            return None, Response(
+                {"error": f"不支持的记录类型: {record_type}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if granularity not in self.GRANULARITIES:
+            return None, Response(
+                {"error": f"不支持的统计粒度: {granularity}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if 'max_points' not in request.query_params:
+            # 未指定 max_points 时只有 auto 粒度需要点数上限，其他粒度与旧版客户端一致，返回全部分桶
+            max_points = self.DEFAULT_MAX_POINTS if granularity == 'auto' else None
+            return (record_type, period, granularity, max_points), None
         try:
-            # 获取过滤后的查询集
-            queryset = self._get_filtered_queryset(period, record_type)
-            
-            # 根据记录类型选择相应的处理函数
-            if record_type == 'weight':
-                result = self._get_weight_statistics(queryset)
-            elif record_type == 'bloodPressure':
-                result = self._get_blood_pressure_statistics(queryset)
-            elif record_type == 'heartRate':
-                result = self._get_heart_rate_statistics(queryset)
-            elif record_type == 'bloodSugar':
-                result = self._get_blood_sugar_statistics(queryset)
-            else:
-                return Response(
-                    {"error": f"不支持的记录类型: {record_type}"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            return Response(result)
+            max_points = int(request.query_params['max_points'])
+        except ValueError:
+            max_points = 0
+        if not 3 <= max_points <= self.MAX_POINTS_LIMIT:
+            return None, Response(
+                {"error": f"max_points 应为 3 到 {self.MAX_POINTS_LIMIT} 之间的整数"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return (record_type, period, granularity, max_points), None
+    
+    def _get_statistics_cache_parts(self, request, record_type, period, granularity, max_points):
+        # 统计结果只取决于用户数据版本、参数和当天日期，命中缓存时不访问数据库
+        return (
+            record_type,
+            period,
+            granularity,
+            max_points,
+            request.query_params.get('start_date', ''),
+            request.query_params.get('end_date', ''),
+            timezone.localdate().isoformat(),
+        )
+    
+    def _statistics_response(self, result, hit):
+        response = Response(result)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+    
+    def _statistics_error(self, e):
+        print(f"健康统计发生错误: {str(e)}")
+        return Response(
+            {"error": "获取统计数据失败", "detail": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        获取健康数据分析结果
+        
+        包括各指标的均值、标准差、中位数、P90、线性趋势斜率、7/30 天滚动均值，
+        以及血压变异性（SD、CV、ARV）。period 取值同 statistics，默认 month
+        """
+        period = request.query_params.get('period', 'month')
+        cache_parts = (
+            'analytics',
+            period,
+            request.query_params.get('start_date', ''),
+            request.query_params.get('end_date', ''),
+            timezone.localdate().isoformat(),
+        )
+        
+        try:
+            result, hit = statistics_cache.get_or_set(
+                request.user.id,
+                cache_parts,
+                lambda: {
+                    'period': period,
+                    **analytics.compute(analytics.load_series(
+                        self._get_record_queryset_for_period(period),
+                        self._load_archive_for_period(period),
+                    )),
+                },
+            )
+            response = Response(result)
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response
         except Exception as e:
-            # 统一异常处理
-            print(f"健康统计发生错误: {str(e)}")
+            logger.exception("健康数据分析发生错误")
             return Response(
-                {"error": "获取统计数据失败", "detail": str(e)},
+                {"error": "获取分析数据失败", "detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+    
+    def _compute_statistics(self, record_type, period, granularity='day', max_points=None):
+        """计算统计结果"""
+        # 一次查询取出周期内的分桶统计行，所有指标共用
+        granularity, rows = self._get_bucket_rows(period, granularity, max_points or self.DEFAULT_MAX_POINTS)
+        return self._format_statistics(record_type, granularity, rows, max_points)
+    
+    async def _acompute_statistics(self, record_type, period, granularity='day', max_points=None):
+        granularity, rows = await self._aget_bucket_rows(period, granularity, max_points or self.DEFAULT_MAX_POINTS)
+        return self._format_statistics(record_type, granularity, rows, max_points)
+    
+    def _format_statistics(self, record_type, granularity, rows, max_points):
+        """把分桶统计行整理为各指标的统计结果"""
+        if record_type == 'all':
+            return {
+                name: {**getattr(self, handler)(rows, max_points), 'granularity': granularity}
+                for name, handler in self.STATISTICS_HANDLERS.items()
+            }
+        return {**getattr(self, self.STATISTICS_HANDLERS[record_type])(rows, max_points), 'granularity': granularity}
@@ -0,0 +1,131 @@
+"""
+健康数据分析性能对比：NumPy 向量化实现 vs 纯 Python 逐行实现
+
+用法: python tests/bench_analytics.py [记录数 ...]
+"""
+import os
+import sys
+import math
+import random
+import statistics
+import time
+from datetime import date
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+from health_info import analytics
+
+
+def generate_rows(count, per_day=3):
+    """生成模拟读数：(时间(天), 日期序数, 体重, 收缩压, 舒张压, 心率, 血糖)"""
+    start = date(2020, 1, 1).toordinal()
+    rows = []
+    for i in range(count):
+        day = start + i // per_day
+        rows.append((
+            day + (i % per_day) / per_day,
+            day,
+            70 + random.gauss(0, 1.5),
+            120 + random.gauss(0, 10),
+            80 + random.gauss(0, 6),
+            72 + random.gauss(0, 8),
+            random.gauss(5.6, 0.8) if i % 2 else None,
+        ))
+    return rows
+
+
+def to_series(rows):
+    columns = list(zip(*rows))
+    series = {'time': np.array(columns[0], dtype=float), 'day': np.array(columns[1], dtype=np.int64)}
+    for index, metric in enumerate(analytics.METRIC_FIELDS):
+        series[metric] = np.array(columns[index + 2], dtype=float)
+    return series
+
+
+def python_metric(times, days, values, windows=(7, 30)):
+    """纯 Python 基线：逐行循环计算与 analytics 相同的指标"""
+    points = [(t, d, v) for t, d, v in zip(times, days, values) if v is not None]
+    data = sorted(v for _, _, v in points)
+    count = len(data)
+    result = {'count': count}
+    if not count:
+        return result
+    result['mean'] = round(statistics.fmean(data), 2)
+    result['std'] = round(statistics.stdev(data), 2) if count > 1 else 0.0
+    result['median'] = round(statistics.median(data), 2)
+    # 与 numpy 默认的线性插值分位数一致
+    position = 0.9 * (count - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, count - 1)
+    result['p90'] = round(data[lower] + (data[upper] - data[lower]) * (position - lower), 2)
+
+    mean_t = sum(t for t, _, _ in points) / count
+    mean_v = sum(v for _, _, v in points) / count
+    numerator = sum((t - mean_t) * (v - mean_v) for t, _, v in points)
+    denominator = sum((t - mean_t) ** 2 for t, _, _ in points)
+    result['slope_per_day'] = round(numerator / denominator, 4) if denominator else None
+
+    # 滑动窗口：按日期排序后用首尾两个指针维护窗口内的和与个数
+    ordered = sorted((d, v) for _, d, v in points)
+    for window in windows:
+        rolling = []
+        head = tail = 0
+        total = 0.0
+        while tail < count:
+            day = ordered[tail][0]
+            while tail < count and ordered[tail][0] == day:
+                total += ordered[tail][1]
+                tail += 1
+            while ordered[head][0] <= day - window:
+                total -= ordered[head][1]
+                head += 1
+            rolling.append(round(total / (tail - head), 2))
+        result[f'rolling_{window}d'] = rolling
+    return result
+
+
+def python_baseline(rows):
+    columns = list(zip(*rows))
+    return {
+        metric: python_metric(columns[0], columns[1], columns[index + 2])
+        for index, metric in enumerate(analytics.METRIC_FIELDS)
+    }
+
+
+def measure(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    random.seed(42)
+    print(f"{'记录数':>10} {'NumPy(ms)':>12} {'纯Python(ms)':>14} {'加速比':>8}")
+    for size in sizes:
+        rows = generate_rows(size)
+        series = to_series(rows)
+
+        # 校验两种实现的描述性统计结果一致
+        vectorized = analytics.compute(series)
+        baseline = python_baseline(rows)
+        for key in ('count', 'mean', 'std', 'median', 'p90', 'slope_per_day'):
+            expected = baseline['weight'].get(key)
+            actual = vectorized['weight'][key]
+            assert expected is None or abs(actual - expected) < 0.011, (key, actual, expected)
+
+        assert [point['value'] for point in vectorized['weight']['rolling_7d']] == baseline['weight']['rolling_7d']
+
+        numpy_time = measure(analytics.compute, series)
+        python_time = measure(python_baseline, rows)
+        print(f"{size:>10} {numpy_time * 1000:>12.2f} {python_time * 1000:>14.2f} {python_time / numpy_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+冷数据归档的存储和读取性能测试
+
+生成若干用户约两年的健康记录，对比归档前后：
+- 数据库文件大小（VACUUM 后）以及健康记录表和归档表的记录数
+- 列表首页、深度分页、导出、按小时统计、全周期分析的耗时
+测试数据库使用临时文件，以便统计实际占用的磁盘空间。
+用法: python tests/bench_archive.py [每个用户的记录数]
+"""
+import sys
+import uuid
+
+from bench_utils import setup_bench_database, create_bench_user, make_records, measure
+
+setup_bench_database(file_based=True)
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from health_info import rollups
+from health_info.models import HealthRecord, HealthRecordArchive
+
+USERS = 5
+DAYS = 730
+
+
+def database_size():
+    """VACUUM 后的数据库文件大小（字节）"""
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+        cursor.execute('PRAGMA page_count')
+        page_count = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        return page_count * cursor.fetchone()[0]
+
+
+def read_timings(client):
+    def export():
+        b''.join(client.get('/api/health-records/export/').streaming_content)
+
+    cases = [
+        ('列表首页', lambda: client.get('/api/health-records/')),
+        ('列表第 100 页', lambda: client.get('/api/health-records/', {'page': 100, 'page_size': 20})),
+        ('导出 CSV', export),
+        ('按小时统计（全部）', lambda: client.get(
+            '/api/health-records/statistics/', {'type': 'all', 'period': 'all', 'granularity': 'hour'},
+        )),
+        ('分析（全部）', lambda: client.get('/api/health-records/analytics/', {'period': 'all'})),
+    ]
+    # 统计和分析结果有缓存，每次计时前清空
+    from django.core.cache import cache
+    results = {}
+    for label, func in cases:
+        results[label] = measure(lambda: (cache.clear(), func()), repeat=3)
+    return results
+
+
+def main():
+    per_user = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    users = [create_bench_user(f'bench_user_{index}') for index in range(USERS)]
+    for user in users:
+        records = make_records(user, per_user, days=DAYS)
+        for index, record in enumerate(records):
+            if index % 2:
+                record.client_id = uuid.uuid4()
+        HealthRecord.objects.bulk_create(records, batch_size=1000)
+    rollups.rebuild()
+
+    client = APIClient()
+    client.force_authenticate(users[0])
+
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        before_size = database_size()
+        before = read_timings(client)
+        raw_before = HealthRecord.objects.count()
+
+        call_command('archive_health_records', days=90, stdout=open('/dev/null', 'w'))
+        after_size = database_size()
+        after = read_timings(client)
+
+    print(f'{USERS} 个用户，每人 {per_user} 条记录，跨度 {DAYS} 天')
+    print(f'健康记录表: {raw_before} -> {HealthRecord.objects.count()} 条；'
+          f'归档块 {HealthRecordArchive.objects.count()} 个')
+    print(f'数据库大小: {before_size / 1024:.0f} KB -> {after_size / 1024:.0f} KB '
+          f'({after_size / before_size - 1:+.1%})')
+    print(f"{'接口':<20} {'归档前(ms)':>12} {'归档后(ms)':>12}")
+    for label in before:
+        print(f'{label:<20} {before[label]:>12.2f} {after[label]:>12.2f}')
+    print('汇总校验:', '一致' if not rollups.verify() else '不一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+同步 WSGI 与原生异步 ASGI 的并发性能对比
+
+分别在 100 和 500 个并发连接下，请求健康记录列表、统计（type=all）和当前用户信息三个读接口：
+- wsgi: 同步视图，由固定大小的线程池执行（模拟 gunicorn gthread 等多线程 WSGI 服务器）
+- asgi-sync: ASGI 下仍使用同步视图，每个请求经 sync_to_async 交给线程执行
+- asgi-async: ASGI 下使用原生异步视图（settings.ASYNC_API_VIEWS）
+环境中不一定安装了 ASGI/WSGI 服务器，这里在进程内直接调用 WSGI/ASGI 应用，不包含网络开销，
+只比较框架层面的调度开销。每个场景在独立的子进程和临时数据库中运行。
+用法: python tests/bench_async.py [--threads 32] [--requests-per-connection 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+SCENARIOS = ('wsgi', 'asgi-sync', 'asgi-async')
+CONCURRENCY = (100, 500)
+PATHS = (
+    ('/api/health-records/', 'count=false'),
+    ('/api/health-records/statistics/', 'type=all&period=month'),
+    ('/api/users/me/', ''),
+)
+
+
+def prepare(scenario):
+    # 必须在加载配置前设置，决定是否注册异步视图的路由
+    os.environ['DJANGO_ASYNC_API_VIEWS'] = '1' if scenario == 'asgi-async' else '0'
+    from bench_utils import setup_bench_database, create_bench_user, make_records
+    setup_bench_database(file_based=True)
+
+    from rest_framework_simplejwt.tokens import AccessToken
+    from health_info import rollups
+    from health_info.models import HealthRecord
+
+    user = create_bench_user()
+    HealthRecord.objects.bulk_create(make_records(user, 2000), batch_size=1000)
+    rollups.rebuild()
+    return f'Bearer {AccessToken.for_user(user)}'
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def run_wsgi(token, concurrency, total, threads):
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+
+    def call(index):
+        path, query = PATHS[index % len(PATHS)]
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+            'HTTP_AUTHORIZATION': token, 'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+        }
+        statuses = []
+        body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+        assert statuses[0].startswith('200'), (statuses[0], body[:200])
+
+    # 同时在途的请求数为 concurrency，超出线程数的请求排队等待
+    latencies = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        for offset in range(0, total, concurrency):
+            submitted = []
+            for index in range(offset, min(offset + concurrency, total)):
+                submitted.append((time.perf_counter(), pool.submit(call, index)))
+            for begin, future in submitted:
+                future.result()
+                latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed)
+
+
+def run_asgi(token, concurrency, total):
+    from django.core.asgi import get_asgi_application
+    application = get_asgi_application()
+
+    async def call(index):
+        path, query = PATHS[index % len(PATHS)]
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'headers': [(b'host', b'testserver'), (b'authorization', token.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        }
+        messages = []
+        requested = False
+        finished = asyncio.Event()
+
+        async def receive():
+            # 请求体只发送一次，之后等待响应结束再通知断开
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        begin = time.perf_counter()
+        await application(scope, receive, send)
+        assert messages[0]['status'] == 200, messages
+        return time.perf_counter() - begin
+
+    async def main():
+        latencies = []
+        start = time.perf_counter()
+        for offset in range(0, total, concurrency):
+            latencies.extend(await asyncio.gather(
+                *(call(index) for index in range(offset, min(offset + concurrency, total)))
+            ))
+        return summarize(latencies, time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+
+def run_scenario(scenario, threads, per_connection):
+    token = prepare(scenario)
+    results = {}
+    for concurrency in CONCURRENCY:
+        total = concurrency * per_connection
+        if scenario == 'wsgi':
+            results[concurrency] = run_wsgi(token, concurrency, total, threads)
+        else:
+            results[concurrency] = run_asgi(token, concurrency, total)
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32, help='WSGI 线程池大小')
+    parser.add_argument('--requests-per-connection', type=int, default=4)
+    parser.add_argument('--scenario', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(args.scenario, args.threads, args.requests_per_connection)
+        return
+
+    print(f"{'场景':<12} {'并发':>6} {'请求/秒':>10} {'P50(ms)':>10} {'P99(ms)':>10}")
+    for scenario in SCENARIOS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--scenario', scenario,
+             '--threads', str(args.threads), '--requests-per-connection', str(args.requests_per_connection)],
+            check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+        for concurrency, result in results.items():
+            print(f"{scenario:<12} {concurrency:>6} {result['rps']:>10.0f} {result['p50']:>10.1f} {result['p99']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+JWT 认证的性能测试
+
+比较 simplejwt 默认的 JWTAuthentication 与从缓存读取用户的 CachedJWTAuthentication，
+统计常用读接口每个请求的查询次数和吞吐量（缓存使用 settings 中的默认后端）。
+用法: python tests/bench_auth.py [--requests 1000]
+"""
+import argparse
+import time
+
+from bench_utils import setup_bench_database, create_bench_user, make_records
+
+AUTHENTICATION_CLASSES = (
+    'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'user_management.authentication.CachedJWTAuthentication',
+)
+PATHS = (
+    '/api/users/me/',
+    '/api/health-records/?count=false',
+    '/api/health-records/statistics/?type=all&period=week',
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_bench_database()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils.module_loading import import_string
+    from rest_framework.views import APIView
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+    from health_info.models import HealthRecord
+
+    user = create_bench_user()
+    HealthRecord.objects.bulk_create(make_records(user, 500), batch_size=500)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    print(f"{'认证类':<28} {'接口':<52} {'查询/请求':>10} {'请求/秒':>10}")
+    for authentication_class in AUTHENTICATION_CLASSES:
+        # 视图类在导入时读取 DEFAULT_AUTHENTICATION_CLASSES，这里直接替换基类上的属性
+        APIView.authentication_classes = [import_string(authentication_class)]
+        for path in PATHS:
+            # 预热缓存
+            client.get(path)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(args.requests):
+                    response = client.get(path)
+                    assert response.status_code == 200, response.content
+                elapsed = time.perf_counter() - start
+            print(f'{authentication_class.rsplit(".", 1)[1]:<28} {path:<52} '
+                  f'{len(queries) / args.requests:>10.2f} {args.requests / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
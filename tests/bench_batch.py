@@ -0,0 +1,60 @@
+"""
+健康记录批量上传性能对比：逐条 INSERT 与分块 bulk_create
+
+对比两种写入方式在 10、100、1000 条记录时的耗时：
+- 逐条写入：DRF 默认 ListSerializer，每条记录调用一次 create，各自隐式提交
+- 批量写入：HealthRecordListSerializer，在一个事务中分块 bulk_create
+两者都包含数据校验和按日汇总的维护；另外给出批量上传接口的整体耗时。
+测试数据库使用临时文件，以便体现每次提交的开销。
+用法: python tests/bench_batch.py
+"""
+from bench_utils import setup_bench_database, create_bench_user, make_record_payloads, measure
+
+setup_bench_database(file_based=True)
+
+from rest_framework import serializers
+from rest_framework.test import APIClient, APIRequestFactory
+from health_info import rollups
+from health_info.models import HealthRecord
+from health_info.serializers import HealthRecordSerializer
+
+BATCH_SIZES = (10, 100, 1000)
+
+
+def per_row_insert(payloads, context):
+    """改动前的写入方式：默认 ListSerializer 逐条调用 HealthRecordSerializer.create"""
+    serializer = serializers.ListSerializer(child=HealthRecordSerializer(), data=payloads, context=context)
+    serializer.is_valid(raise_exception=True)
+    records = serializer.save()
+    for record in records:
+        rollups.add_records([record])
+
+
+def bulk_insert(payloads, context):
+    serializer = HealthRecordSerializer(data=payloads, many=True, context=context)
+    serializer.is_valid(raise_exception=True)
+    rollups.add_records(serializer.save())
+
+
+def main():
+    user = create_bench_user()
+    request = APIRequestFactory().post('/api/health-records/batch/')
+    request.user = user
+    context = {'request': request}
+
+    client = APIClient()
+    client.force_authenticate(user)
+
+    print(f"{'记录数':>6} {'逐条写入(ms)':>14} {'bulk_create(ms)':>16} {'加速比':>8} {'接口(ms)':>10}")
+    for size in BATCH_SIZES:
+        payloads = make_record_payloads(size)
+        repeat = 3 if size >= 1000 else 5
+        per_row = measure(lambda: per_row_insert(payloads, context), repeat)
+        bulk = measure(lambda: bulk_insert(payloads, context), repeat)
+        api = measure(lambda: client.post('/api/health-records/batch/', payloads, format='json'), repeat)
+        print(f'{size:>6} {per_row:>14.2f} {bulk:>16.2f} {per_row / bulk:>7.1f}x {api:>10.2f}')
+    print(f'共写入 {HealthRecord.objects.count()} 条记录')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+JSON 编码/解码性能对比：DRF 默认 JSONRenderer/JSONParser 与 orjson 实现
+
+使用接口返回的典型数据：
+- 统计接口 type=all、granularity=hour 的趋势数据
+- 健康记录列表（100 条一页）
+- 批量上传的请求体（1000 条记录）
+并校验两种实现的输出完全相同。
+用法: python tests/bench_json.py [记录数]
+"""
+import sys
+from io import BytesIO
+
+from bench_utils import setup_bench_database, create_bench_user, make_records, make_record_payloads, measure
+
+setup_bench_database()
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from backend_xyyl.utils.fast_json import FastJSONParser, FastJSONRenderer, orjson
+from health_info import rollups
+from health_info.models import HealthRecord
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    user = create_bench_user()
+    HealthRecord.objects.bulk_create(make_records(user, total, days=28), batch_size=2000)
+    rollups.rebuild([user.id])
+
+    client = APIClient()
+    client.force_authenticate(user)
+    payloads = {
+        'statistics': client.get('/api/health-records/statistics/', {
+            'type': 'all', 'period': 'month', 'granularity': 'hour', 'max_points': 2000,
+        }).data,
+        'list': client.get('/api/health-records/', {'page_size': 100}).data,
+        'batch': make_record_payloads(1000),
+    }
+
+    print(f"orjson: {'已安装 ' + orjson.__version__ if orjson else '未安装'}")
+    print(f"{'数据':<12} {'大小(KB)':>9} {'编码(ms)':>10} {'orjson(ms)':>11} {'加速比':>7} "
+          f"{'解码(ms)':>10} {'orjson(ms)':>11} {'加速比':>7}")
+    for name, data in payloads.items():
+        body = JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data) == body
+        assert FastJSONParser().parse(BytesIO(body)) == JSONParser().parse(BytesIO(body))
+
+        encode = measure(lambda: JSONRenderer().render(data), repeat=20)
+        fast_encode = measure(lambda: FastJSONRenderer().render(data), repeat=20)
+        decode = measure(lambda: JSONParser().parse(BytesIO(body)), repeat=20)
+        fast_decode = measure(lambda: FastJSONParser().parse(BytesIO(body)), repeat=20)
+        print(f'{name:<12} {len(body) / 1024:>9.1f} {encode:>10.3f} {fast_encode:>11.3f} {encode / fast_encode:>6.1f}x '
+              f'{decode:>10.3f} {fast_decode:>11.3f} {decode / fast_decode:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
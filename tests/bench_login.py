@@ -0,0 +1,63 @@
+"""
+用户名密码登录的性能测试
+
+比较 simplejwt 默认的 TokenObtainPairSerializer（每次登录立即 User.save() 更新 last_login，
+并由信号再保存一次用户资料）与缓冲后批量写入 last_login 的 user_management.serializers.TokenObtainPairSerializer。
+为了只比较数据库写入，密码哈希改用 MD5（正式环境的 PBKDF2 每次需要几十到上百毫秒）。
+多个线程同时登录不同用户，使用文件数据库以体现 SQLite 写锁的竞争。
+用法: python tests/bench_login.py [--users 200] [--logins 2000] [--threads 8]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import setup_bench_database
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--logins', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    from django.conf import settings
+    setup_bench_database(file_based=True)
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+    from django.contrib.auth.models import User
+    from django.db import connection, connections
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as DefaultSerializer
+    from user_management import last_login
+    from user_management.serializers import TokenObtainPairSerializer
+
+    for index in range(args.users):
+        User.objects.create_user(username=f'login{index}', password='benchpass123')
+
+    def login(serializer_class, index):
+        try:
+            serializer = serializer_class(data={'username': f'login{index % args.users}', 'password': 'benchpass123'})
+            serializer.is_valid(raise_exception=True)
+        finally:
+            connections.close_all()
+
+    print(f"{'序列化器':<16} {'查询/次':>8} {'登录/秒':>10}")
+    for name, serializer_class in (('默认', DefaultSerializer), ('批量写入', TokenObtainPairSerializer)):
+        with CaptureQueriesContext(connection) as queries:
+            for index in range(20):
+                serializer = serializer_class(data={'username': f'login{index}', 'password': 'benchpass123'})
+                serializer.is_valid(raise_exception=True)
+            last_login.buffer.flush()
+        per_login = len(queries) / 20
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(lambda index: login(serializer_class, index), range(args.logins)))
+        last_login.buffer.flush()
+        elapsed = time.perf_counter() - start
+        print(f'{name:<16} {per_login:>8.2f} {args.logins / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
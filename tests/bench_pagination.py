@@ -0,0 +1,54 @@
+"""
+健康记录列表分页性能对比：第 1 页与第 500 页
+
+对比三种方式：页码分页（含 COUNT）、页码分页（count=false）、键集分页（cursor）。
+用法: python tests/bench_pagination.py [记录数]
+"""
+import sys
+
+from bench_utils import setup_bench_database, create_bench_user, make_records, measure
+
+setup_bench_database()
+
+from rest_framework.test import APIClient
+from health_info.models import HealthRecord
+from health_info.pagination import HealthRecordPagination
+
+PAGE_SIZE = 20
+
+
+def cursor_for_offset(user, offset):
+    """构造从第 offset 条记录之后开始的游标，相当于客户端连续翻页得到的 next 链接"""
+    item = (HealthRecord.objects.filter(user=user)
+        .order_by('-record_time', '-id')
+        .values('record_time', 'id')[offset - 1])
+    return HealthRecordPagination()._encode_cursor(item, reverse=False)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    user = create_bench_user()
+    # 其他用户的数据，使表规模更接近线上
+    other = create_bench_user('bench_other')
+    HealthRecord.objects.bulk_create(make_records(user, total), batch_size=2000)
+    HealthRecord.objects.bulk_create(make_records(other, total), batch_size=2000)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    deep_page = min(500, total // PAGE_SIZE)
+
+    cases = [
+        ('页码分页', {'page': 1}, {'page': deep_page}),
+        ('页码分页 count=false', {'page': 1, 'count': 'false'}, {'page': deep_page, 'count': 'false'}),
+        ('键集分页', {'pagination': 'cursor'}, {'cursor': cursor_for_offset(user, (deep_page - 1) * PAGE_SIZE)}),
+    ]
+    print(f'记录数: {total}，每页 {PAGE_SIZE} 条，深页为第 {deep_page} 页')
+    print(f"{'方式':<22} {'第1页(ms)':>10} {'深页(ms)':>10}")
+    for name, first_params, deep_params in cases:
+        first = measure(lambda: client.get('/api/health-records/', first_params))
+        deep = measure(lambda: client.get('/api/health-records/', deep_params))
+        print(f'{name:<22} {first:>10.2f} {deep:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+健康记录列表序列化性能对比：HealthRecordSerializer 与 HealthRecordReader 快速路径
+
+分别测量：
+- 序列化: 从查询集得到可输出的字典列表（包含查询和模型实例/字典的构造）
+- 仅转换: 数据已读入内存时，字段转换本身的耗时
+- 接口: GET /api/health-records/ 的整体耗时
+并校验两者渲染出的 JSON 完全相同。
+用法: python tests/bench_serializer.py [记录数]
+"""
+import sys
+
+from bench_utils import setup_bench_database, create_bench_user, make_records, measure
+
+setup_bench_database()
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from health_info.models import HealthRecord
+from health_info.serializers import HealthRecordReader, HealthRecordSerializer
+
+PAGE_SIZES = (20, 100, 1000)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    user = create_bench_user()
+    HealthRecord.objects.bulk_create(make_records(user, total), batch_size=2000)
+    queryset = HealthRecord.objects.filter(user=user)
+
+    client = APIClient()
+    client.force_authenticate(user)
+
+    print(f'记录数: {total}')
+    print(f"{'条数':>6} {'序列化器(ms)':>14} {'快速路径(ms)':>14} {'加速比':>8} {'仅转换(ms)':>12} {'仅转换(快)':>12} {'加速比':>8}")
+    for size in PAGE_SIZES:
+        page = queryset[:size]
+
+        def serializer_path():
+            return HealthRecordSerializer(page, many=True).data
+
+        def reader_path():
+            reader = HealthRecordReader()
+            return reader.to_list(reader.values(page))
+
+        assert JSONRenderer().render(serializer_path()) == JSONRenderer().render(reader_path())
+        slow = measure(serializer_path, repeat=10)
+        fast = measure(reader_path, repeat=10)
+
+        instances = list(page)
+        reader = HealthRecordReader()
+        rows = list(reader.values(page))
+        slow_convert = measure(lambda: HealthRecordSerializer(instances, many=True).data, repeat=10)
+        fast_convert = measure(lambda: HealthRecordReader().to_list(rows), repeat=10)
+        print(f'{size:>6} {slow:>14.2f} {fast:>14.2f} {slow / fast:>7.1f}x '
+              f'{slow_convert:>12.2f} {fast_convert:>12.2f} {slow_convert / fast_convert:>7.1f}x')
+
+    api = measure(lambda: client.get('/api/health-records/', {'page_size': 100}), repeat=10)
+    print(f'接口 page_size=100: {api:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+刷新令牌的性能测试
+
+比较 simplejwt 默认的 TokenRefreshSerializer 与 user_management.serializers.TokenRefreshSerializer
+（缓存读取用户、更少的黑名单语句），在令牌表逐渐增大时的刷新吞吐量，以及 prune_tokens 清理过期记录后的结果。
+每次刷新使用上一次返回的新令牌（开启轮换时客户端的正常用法）。使用文件数据库以包含提交开销。
+用法: python tests/bench_token_refresh.py [--refreshes 500] [--sizes 0,20000,100000]
+"""
+import argparse
+import time
+import uuid
+from datetime import timedelta
+
+from bench_utils import setup_bench_database, create_bench_user
+
+
+def add_expired_tokens(user, count):
+    """写入 count 条已过期的令牌记录，其中一半在黑名单中（模拟长期运行后积累的数据）"""
+    from django.utils import timezone
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+    expired_at = timezone.now() - timedelta(days=1)
+    for offset in range(0, count, 5000):
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=user, jti=uuid.uuid4().hex, token='x' * 250,
+                             created_at=expired_at - timedelta(days=1), expires_at=expired_at)
+            for _ in range(min(5000, count - offset))
+        ])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens[::2]])
+
+
+def measure(serializer_class, user, refreshes):
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    token = str(RefreshToken.for_user(user))
+    start = time.perf_counter()
+    for _ in range(refreshes):
+        serializer = serializer_class(data={'refresh': token})
+        serializer.is_valid(raise_exception=True)
+        token = serializer.validated_data['refresh']
+    return refreshes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--refreshes', type=int, default=500)
+    parser.add_argument('--sizes', default='0,20000,100000', help='逐步增加到的过期令牌数量')
+    args = parser.parse_args()
+
+    setup_bench_database(file_based=True)
+    from io import StringIO
+    from django.core.management import call_command
+    from rest_framework_simplejwt.serializers import TokenRefreshSerializer as DefaultSerializer
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+    from user_management.serializers import TokenRefreshSerializer
+
+    user = create_bench_user()
+    print(f"{'令牌记录数':>10} {'默认(次/秒)':>12} {'优化(次/秒)':>12}")
+    added = 0
+    for size in (int(size) for size in args.sizes.split(',')):
+        add_expired_tokens(user, size - added)
+        added = size
+        rows = OutstandingToken.objects.count()
+        print(f'{rows:>10} {measure(DefaultSerializer, user, args.refreshes):>12.0f} '
+              f'{measure(TokenRefreshSerializer, user, args.refreshes):>12.0f}')
+
+    start = time.perf_counter()
+    call_command('prune_tokens', batch_size=5000, stdout=StringIO())
+    print(f'prune_tokens: {time.perf_counter() - start:.2f} 秒，剩余 {OutstandingToken.objects.count()} 条记录')
+    print(f'{"清理后":>10} {measure(DefaultSerializer, user, args.refreshes):>12.0f} '
+          f'{measure(TokenRefreshSerializer, user, args.refreshes):>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+性能测试脚本的公共工具
+
+在独立的测试数据库中运行（不会修改 db.sqlite3），并提供计时和造数函数。
+"""
+import os
+import sys
+import time
+import random
+from datetime import timedelta
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+
+def setup_bench_database(file_based=False):
+    """
+    初始化 Django 并创建测试数据库
+
+    SQLite 测试数据库默认在内存中，file_based=True 时改为临时文件，
+    用于需要体现提交（磁盘同步）开销的写入测试。
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_xyyl.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    if file_based and connection.vendor == 'sqlite':
+        import atexit
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        connection.settings_dict['TEST']['NAME'] = path
+        atexit.register(lambda: os.path.exists(path) and os.remove(path))
+    connection.creation.create_test_db(verbosity=0)
+
+
+def create_bench_user(username='bench_user'):
+    from django.contrib.auth.models import User
+    return User.objects.create_user(username=username, password='benchpass123')
+
+
+def make_records(user, count, days=None):
+    """生成 count 条未保存的健康记录，时间均匀分布在最近 days 天内"""
+    from django.utils import timezone
+    from health_info.models import HealthRecord
+
+    days = days or max(count // 3, 1)
+    now = timezone.now()
+    step = timedelta(days=days) / count
+    return [
+        HealthRecord(
+            user=user,
+            weight=f'{70 + random.uniform(-3, 3):.2f}',
+            systolic_pressure=random.randint(105, 140),
+            diastolic_pressure=random.randint(65, 90),
+            heart_rate=random.randint(58, 95),
+            blood_sugar=f'{random.uniform(4.2, 7.5):.2f}' if index % 2 else None,
+            record_time=now - step * index,
+        )
+        for index in range(count)
+    ]
+
+
+def make_record_payloads(count):
+    """生成 count 条批量上传接口的请求数据"""
+    from django.utils import timezone
+
+    now = timezone.now()
+    return [
+        {
+            'weight': f'{70 + random.uniform(-3, 3):.2f}',
+            'systolic_pressure': random.randint(105, 140),
+            'diastolic_pressure': random.randint(65, 90),
+            'heart_rate': random.randint(58, 95),
+            'blood_sugar': f'{random.uniform(4.2, 7.5):.2f}',
+            'record_time': (now - timedelta(hours=index)).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+
+def measure(func, repeat=5):
+    """返回多次执行中最快一次的耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
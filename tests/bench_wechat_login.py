@@ -0,0 +1,98 @@
+"""
+微信登录调用 jscode2session 的性能测试
+
+在进程内启动模拟微信接口（user_management.wechat_stub），比较：
+- 每次调用 requests.get（原实现，每次新建连接）与复用连接池的 WechatClient，分别测串行和多线程并发
+- 完整的 /api/auth/wx-login/ 登录流程（新用户，以及缓存有效期内重复使用同一个 code）
+- 多个线程同时用同一个 code 登录时，合并后实际发出的微信接口请求数
+模拟接口是本地 HTTP 服务，新建连接只有 TCP 握手开销；真实微信接口使用 HTTPS，
+每次新建连接还要额外进行 TLS 握手，连接复用的收益会比这里更大。
+用法: python tests/bench_wechat_login.py [--calls 500] [--threads 16] [--latency 0.005]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import setup_bench_database
+
+
+def summarize(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    print(
+        f'{name:<28} {len(latencies) / elapsed:>10.0f} {statistics.median(latencies) * 1000:>10.2f} '
+        f'{latencies[int(len(latencies) * 0.99) - 1] * 1000:>10.2f}'
+    )
+
+
+def run(name, call, calls, threads):
+    def timed(index):
+        begin = time.perf_counter()
+        call(index)
+        return time.perf_counter() - begin
+
+    start = time.perf_counter()
+    if threads == 1:
+        latencies = [timed(index) for index in range(calls)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(timed, range(calls)))
+    summarize(name, latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.005, help='模拟接口每个请求的延迟（秒）')
+    args = parser.parse_args()
+
+    setup_bench_database()
+    import requests
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from user_management import wechat
+    from user_management.wechat_stub import StubServer
+
+    server = StubServer(latency=args.latency).start()
+    client = wechat.WechatClient('app', 'secret', base_url=server.url, pool_size=args.threads)
+
+    def bare(index):
+        url = f'{server.url}/sns/jscode2session?appid=app&secret=secret&js_code=code-{index}&grant_type=authorization_code'
+        requests.get(url).json()
+
+    def pooled(index):
+        client.code_to_session(f'code-{index}')
+
+    print(f"{'场景':<28} {'请求/秒':>10} {'P50(ms)':>10} {'P99(ms)':>10}")
+    for threads in (1, args.threads):
+        run(f'requests.get x{threads}', bare, args.calls, threads)
+        run(f'WechatClient x{threads}', pooled, args.calls, threads)
+
+    with override_settings(WECHAT_API_BASE_URL=server.url):
+        wechat.get_client.cache_clear()
+        api = APIClient()
+
+        def login(index):
+            response = api.post('/api/auth/wx-login/', {'code': f'login-{index}'}, format='json')
+            assert response.status_code == 200, response.content
+
+        # 测试数据库在内存中，登录流程串行执行
+        run('登录（新用户）', login, args.calls, 1)
+        run('登录（重复 code）', login, args.calls, 1)
+
+        # 突发登录：每个 code 同时有 threads 个请求，只统计微信接口调用次数（不经过数据库）
+        bursts = 20
+        before = server.requests
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for burst in range(bursts):
+                list(pool.map(lambda _: wechat.resolve_login(f'burst-{burst}', lambda openid: 0),
+                              range(args.threads)))
+        print(f'突发登录: {bursts * args.threads} 个请求 -> 微信接口请求 {server.requests - before} 次')
+
+    print('WechatClient 指标:', client.metrics.snapshot())
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
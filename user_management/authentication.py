@@ -0,0 +1,64 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from backend_xyyl.utils.async_auth import AsyncJWTAuthentication
+from .cache import local_users, user_cache
+
+
+class CachedJWTAuthentication(AsyncJWTAuthentication):
+    """
+    从缓存读取用户的 JWT 认证
+
+    默认的 JWTAuthentication 每个请求都要查询一次用户表，访问 request.user.profile 时还要再查询一次。
+    这里把 select_related('profile') 读取的用户对象按用户数据版本号缓存，分两层：
+    进程内的 local_users 在确认后的几秒内直接命中，不访问共享缓存；之后只读取一次版本号，
+    版本未变即继续使用；版本变化时再读取共享缓存，最后才查询数据库。
+    用户或用户资料保存、删除后由信号更换版本号（见 signals.py）。
+    停用用户和修改密码的校验在每个请求上对缓存的用户对象执行，与默认实现一致。
+    通过 QuerySet.update 批量修改用户不会触发信号，需要自行调用 invalidate_user。
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = local_users.get(user_id)
+        if user is None:
+            version = user_cache.get_version(user_id)
+            user = local_users.get(user_id, version)
+            if user is None:
+                key = user_cache.make_key(user_id, 'user', version=version)
+                user = user_cache.cache.get(key)
+                if user is None:
+                    user = self.load_user(user_id)
+                    user_cache.cache.set(key, user, user_cache.timeout)
+                local_users.set(user_id, version, user)
+        self.check_user(user, validated_token)
+        return user
+
+    async def aget_user(self, validated_token, queryset=None):
+        user_id = self.get_user_id(validated_token)
+        user = local_users.get(user_id)
+        if user is None:
+            version = await user_cache.aget_version(user_id)
+            user = local_users.get(user_id, version)
+            if user is None:
+                key = await user_cache.amake_key(user_id, 'user', version=version)
+                user = await user_cache.cache.aget(key)
+                if user is None:
+                    try:
+                        user = await self.user_queryset().aget(**{api_settings.USER_ID_FIELD: user_id})
+                    except self.user_model.DoesNotExist as e:
+                        raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+                    await user_cache.cache.aset(key, user, user_cache.timeout)
+                local_users.set(user_id, version, user)
+        self.check_user(user, validated_token)
+        return user
+
+    def user_queryset(self):
+        return self.user_model.objects.select_related('profile')
+
+    def load_user(self, user_id):
+        try:
+            return self.user_queryset().get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
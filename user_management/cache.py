@@ -0,0 +1,91 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from backend_xyyl.utils.versioned_cache import VersionedCache
+
+# 认证用户缓存：保存连同用户资料一起读取的用户对象，用户或用户资料保存后更换版本号即可使其失效
+user_cache = VersionedCache(
+    'auth-user',
+    timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300),
+)
+
+
+class LocalUserCache:
+    """
+    进程内的认证用户 LRU，位于共享缓存之前
+
+    共享缓存为数据库缓存时，每次读取版本号和用户对象都是一条 SQL。这里按用户 ID 保存
+    (版本号, 序列化的用户对象, 上次确认时间)：确认后 ttl 秒内直接使用，不访问共享缓存；
+    超过 ttl 后只读取一次版本号，版本未变即继续使用。其他 worker 修改用户（停用、修改密码）后，
+    本进程最多在 ttl 秒内仍使用旧对象；本进程内的修改由 invalidate_user 立即生效。
+    保存序列化后的字节，每个请求得到独立的用户对象，与共享缓存的行为一致。
+    令牌中的用户 ID 为字符串，信号中为整数，统一转换为字符串作为键。
+    """
+
+    def __init__(self, maxsize=10000, ttl=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, version=None):
+        """
+        version 为 None 时只返回 ttl 内确认过的对象；
+        否则返回版本号相同的对象，并重新开始计算 ttl
+        """
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            entry_version, data, checked_at = entry
+            now = time.monotonic()
+            if version is None:
+                if now - checked_at >= self.ttl:
+                    return None
+            elif version == entry_version:
+                self._entries[user_id] = (entry_version, data, now)
+            else:
+                return None
+            self._entries.move_to_end(user_id)
+        return pickle.loads(data)
+
+    def set(self, user_id, version, user):
+        user_id = str(user_id)
+        data = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[user_id] = (version, data, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_users = LocalUserCache(
+    maxsize=getattr(settings, 'AUTH_USER_LOCAL_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_USER_LOCAL_TTL', 5),
+)
+
+
+def invalidate_user(user_id):
+    """
+    使认证缓存中的用户失效
+
+    立即丢弃本进程的副本并在提交后更换共享版本号；提交后再丢弃一次，
+    避免提交前其他线程用旧数据重新填充本进程的副本。
+    """
+    local_users.discard(user_id)
+    user_cache.bump(user_id)
+    transaction.on_commit(lambda: local_users.discard(user_id))
@@ -0,0 +1,96 @@
+"""
+合并写入用户的最后登录时间
+
+开启 SIMPLE_JWT['UPDATE_LAST_LOGIN'] 后每次签发令牌都要执行一次 User.save()，
+登录集中时这些 UPDATE 会争抢 SQLite 唯一的写锁。这里把登录时间先记录在进程内，
+累计到 LAST_LOGIN_FLUSH_SIZE 个用户或距上次写入超过 LAST_LOGIN_FLUSH_INTERVAL 秒时，
+用一条 UPDATE ... SET last_login = CASE ... WHERE id IN (...) 批量写入；进程退出时写入剩余的记录。
+
+批量 UPDATE 不触发 post_save 信号，认证缓存中用户的 last_login 可能稍旧，不影响认证。
+进程异常退出时最多丢失一个周期内的登录时间。
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 每个用户占用 3 个参数（WHEN、THEN 和 IN），保持在 SQLite 的参数数量限制以内
+UPDATE_CHUNK_SIZE = 300
+
+
+class LastLoginBuffer:
+    def __init__(self, interval=10, max_size=200):
+        """interval 为 None 时不启动后台线程，只在记录时检查时间和在退出时写入"""
+        self.interval = interval
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._thread = None
+
+    def record(self, user_id, when=None):
+        when = when or timezone.now()
+        with self._lock:
+            if self._pending.get(user_id) is None or self._pending[user_id] < when:
+                self._pending[user_id] = when
+            due = (
+                len(self._pending) >= self.max_size
+                or (self.interval is not None and time.monotonic() - self._last_flush >= self.interval)
+            )
+            if self.interval is not None and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='last-login-flush', daemon=True)
+                self._thread.start()
+        if due:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """写入缓冲的登录时间，返回更新的用户数"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        items = list(pending.items())
+        try:
+            for offset in range(0, len(items), UPDATE_CHUNK_SIZE):
+                chunk = items[offset:offset + UPDATE_CHUNK_SIZE]
+                User.objects.filter(pk__in=[user_id for user_id, _ in chunk]).update(last_login=Case(
+                    *(When(pk=user_id, then=Value(when)) for user_id, when in chunk),
+                    output_field=DateTimeField(),
+                ))
+        except Exception:
+            logger.exception('写入 %d 个用户的最后登录时间失败，下次重试', len(pending))
+            with self._lock:
+                for user_id, when in pending.items():
+                    if self._pending.get(user_id) is None or self._pending[user_id] < when:
+                        self._pending[user_id] = when
+            return 0
+        return len(pending)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if self.pending():
+                self.flush()
+                # 后台线程的数据库连接不会被请求结束时的清理关闭
+                connection.close()
+
+
+buffer = LastLoginBuffer(
+    interval=getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 10),
+    max_size=getattr(settings, 'LAST_LOGIN_FLUSH_SIZE', 200),
+)
+atexit.register(buffer.flush)
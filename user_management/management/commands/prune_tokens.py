@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        '分批删除已过期的刷新令牌记录（OutstandingToken 及其 BlacklistedToken）。'
+        '与 simplejwt 的 flushexpiredtokens 相比，每批在独立的语句中删除，不会长时间锁住 SQLite 数据库'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批删除的令牌数')
+        parser.add_argument('--sleep', type=float, default=0, help='每批之间暂停的秒数，降低对在线请求的影响')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size 必须大于 0')
+
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lt=now).order_by('id')
+        total = 0
+        while True:
+            # 令牌的有效期相同，过期的记录集中在 ID 较小的一端，按主键顺序扫描很快能取满一批
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            self.stdout.write(f'已删除 {total} 个过期令牌')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'共删除 {total} 个过期令牌'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user_management.wechat_stub import StubServer
+
+
+class Command(BaseCommand):
+    help = (
+        '启动本地模拟的微信 jscode2session 接口，用于离线压测登录流程。'
+        '把 WECHAT_API_BASE_URL 环境变量设置为输出的地址后启动服务即可'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8900)
+        parser.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟（秒）')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='返回系统繁忙（errcode=-1）的比例，0~1')
+        parser.add_argument('--verbose', action='store_true', help='输出每个请求的访问日志')
+
+    def handle(self, *args, **options):
+        if options['latency'] < 0 or not 0 <= options['error_rate'] <= 1:
+            raise CommandError('--latency 不能为负数，--error-rate 需要在 0~1 之间')
+        server = StubServer(
+            options['host'], options['port'],
+            latency=options['latency'], error_rate=options['error_rate'], verbose=options['verbose'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'模拟微信接口已启动: {server.url}（Ctrl+C 退出）'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
+            self.stdout.write(f'共处理 {server.requests} 个请求')
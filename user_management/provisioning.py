@@ -0,0 +1,43 @@
+"""
+微信用户的查找和创建
+
+已有用户通过一次 JOIN 查询连同用户资料一起读取；新用户在一个事务中只执行两条 INSERT
+（用户和带 openid 的用户资料），不再由 post_save 信号先创建空资料再更新 openid。
+两个首次登录请求同时创建同一个 openid 的用户时，后提交的一方会违反唯一约束，
+此时回滚自己的事务并读取先创建的用户。
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .models import UserProfile
+
+
+def get_wechat_user(openid):
+    """按 openid 读取用户（已加载 profile），不存在时抛出 User.DoesNotExist"""
+    return User.objects.select_related('profile').get(profile__openid=openid)
+
+
+def provision_wechat_user(openid):
+    """查找或创建 openid 对应的用户，返回 (用户, 是否新建)"""
+    try:
+        return get_wechat_user(openid), False
+    except User.DoesNotExist:
+        return create_wechat_user(openid)
+
+
+def create_wechat_user(openid):
+    """创建 openid 对应的用户和用户资料；已被并发请求创建时返回已有用户，返回 (用户, 是否新建)"""
+    user = User(username=f'wx_{openid}', email='')
+    user.set_unusable_password()  # 微信用户无需密码
+    try:
+        with transaction.atomic():
+            # bulk_create 不发送 post_save，用户资料直接带 openid 创建，不经过信号创建空资料
+            User.objects.bulk_create([user])
+            UserProfile.objects.create(user=user, openid=openid)
+    except IntegrityError as exc:
+        try:
+            return get_wechat_user(openid), False
+        except User.DoesNotExist:
+            # 不是同一个 openid 的并发创建（例如用户名已被占用），交给调用方处理
+            raise exc from None
+    return user, True
@@ -0,0 +1,166 @@
+"""
+刷新令牌黑名单
+
+开启 ROTATE_REFRESH_TOKENS 和 BLACKLIST_AFTER_ROTATION 后，每次刷新都会把旧的刷新令牌加入黑名单，
+并检查提交的令牌是否已在黑名单中。simplejwt 默认的实现在一次刷新中要多次读取用户、
+用 get_or_create 读写 OutstandingToken 和 BlacklistedToken，黑名单检查也是一次连表查询。
+
+这里的黑名单检查依次查询：
+1. 进程内的 LRU：保存已确认被吊销的 jti，令牌过期后自动移除
+2. 共享缓存中的吊销集合：每个被吊销的 jti 一个条目，有效期到令牌过期为止，多个 worker 共享。
+   任何途径写入 BlacklistedToken（刷新、退出登录、管理后台）提交后都会由 post_save 信号写入集合；
+   集合标记 token-blacklist:loaded 存在时集合是完整的，未命中即表示未吊销，不再查询数据库
+3. 数据库：标记不存在（首次启动、缓存被清空或重启）时，从数据库重建集合中未过期的 jti 并写入标记
+
+重建和吊销并发时，重建查询之后提交的吊销由自身的信号写入集合，不会遗漏。
+集合依赖共享缓存不提前淘汰未过期的条目（数据库缓存需要足够大的 MAX_ENTRIES，Redis 不能使用 allkeys-* 淘汰策略）。
+即使条目被淘汰，开启轮换时 revoke() 插入 BlacklistedToken 的唯一约束仍会拒绝重复使用的令牌。
+
+过期令牌的数据库记录由 prune_tokens 命令分批删除。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+CACHE_PREFIX = 'token-blacklist'
+LOADED_KEY = f'{CACHE_PREFIX}:loaded'
+
+# 重建吊销集合时每次写入缓存的条目数
+LOAD_CHUNK_SIZE = 500
+
+
+class RevokedTokenLRU:
+    """进程内已吊销 jti 的 LRU，值为令牌的过期时间戳"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __contains__(self, jti):
+        with self._lock:
+            exp = self._entries.get(jti)
+            if exp is None:
+                return False
+            if exp <= time.time():
+                del self._entries[jti]
+                return False
+            self._entries.move_to_end(jti)
+            return True
+
+    def add(self, jti, exp):
+        with self._lock:
+            self._entries[jti] = exp
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+revoked_tokens = RevokedTokenLRU(getattr(settings, 'TOKEN_BLACKLIST_LRU_SIZE', 10000))
+
+
+def _cache():
+    return caches['default']
+
+
+def _cache_key(jti):
+    return f'{CACHE_PREFIX}:{jti}'
+
+
+def remember(jti, exp):
+    """记录已吊销的 jti（进程内 LRU 和共享缓存）"""
+    revoked_tokens.add(jti, exp)
+    timeout = int(exp - time.time()) + 1
+    if timeout > 0:
+        _cache().set(_cache_key(jti), exp, timeout)
+
+
+def load():
+    """从数据库重建共享缓存中的吊销集合（只包含未过期的令牌），返回写入的条目数"""
+    now = time.time()
+    rows = (
+        BlacklistedToken.objects
+        .filter(token__expires_at__gt=timezone.now())
+        .values_list('token__jti', 'token__expires_at')
+        .iterator(chunk_size=LOAD_CHUNK_SIZE)
+    )
+    count = 0
+    chunk = {}
+    for jti, expires_at in rows:
+        chunk[_cache_key(jti)] = expires_at.timestamp()
+        if len(chunk) >= LOAD_CHUNK_SIZE:
+            count += _store(chunk, now)
+            chunk = {}
+    count += _store(chunk, now)
+    _cache().set(LOADED_KEY, now, None)
+    return count
+
+
+def _store(entries, now):
+    if entries:
+        # 同一批使用最晚的过期时间，提前过期的令牌多保留一段时间不影响判断
+        _cache().set_many(entries, int(max(entries.values()) - now) + 1)
+    return len(entries)
+
+
+def is_revoked(jti, exp):
+    if jti in revoked_tokens:
+        return True
+    key = _cache_key(jti)
+    found = _cache().get_many([key, LOADED_KEY])
+    if key in found:
+        revoked_tokens.add(jti, exp)
+        return True
+    if LOADED_KEY in found:
+        return False
+    load()
+    if BlacklistedToken.objects.filter(token__jti=jti).exists():
+        remember(jti, exp)
+        return True
+    return False
+
+
+def revoke(token, user_id):
+    """
+    把刷新令牌加入黑名单，返回 False 表示令牌已被其他请求吊销
+
+    直接插入 BlacklistedToken，由唯一约束判断是否重复吊销：两个并发请求使用同一个令牌刷新时，
+    只有一个能成功（get_or_create 会让两个请求都成功）。
+    """
+    jti, exp = token.payload[api_settings.JTI_CLAIM], token.payload['exp']
+    outstanding = OutstandingToken.objects.filter(jti=jti).only('id', 'jti', 'expires_at').first()
+    try:
+        with transaction.atomic():
+            if outstanding is None:
+                # 黑名单功能启用前签发的令牌
+                outstanding = OutstandingToken.objects.create(
+                    user_id=user_id, jti=jti, token=str(token),
+                    created_at=token.current_time, expires_at=datetime_from_epoch(exp),
+                )
+            BlacklistedToken.objects.create(token=outstanding)
+    except IntegrityError:
+        # 其他请求已提交了吊销记录
+        remember(jti, exp)
+        return False
+    # 提交后由 signals.remember_revoked_token 写入吊销集合
+    return True
+
+
+def outstand(token, user_id):
+    """记录新签发的刷新令牌（不再额外读取用户）"""
+    OutstandingToken.objects.create(
+        user_id=user_id, jti=token.payload[api_settings.JTI_CLAIM], token=str(token),
+        created_at=token.current_time, expires_at=datetime_from_epoch(token.payload['exp']),
+    )
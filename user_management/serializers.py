@@ -1,5 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer, TokenObtainSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import last_login, revocation
+from .authentication import CachedJWTAuthentication
 from .models import UserProfile
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -41,4 +49,75 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = User.objects.create_user(**validated_data)
         # 不需要手动创建 UserProfile，信号处理器会处理
-        return user 
\ No newline at end of file
+        return user 
+
+
+class RevocableRefreshToken(RefreshToken):
+    """黑名单检查先查询进程内 LRU 和共享缓存（见 revocation.py）"""
+
+    def check_blacklist(self):
+        if revocation.is_revoked(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    """
+    刷新令牌（通过 SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'] 启用）
+
+    与 simplejwt 默认实现的行为相同，区别在于：用户从认证缓存读取；吊销旧令牌和记录新令牌
+    各只需一条 INSERT，且在同一个事务中完成；同一个令牌的并发刷新只有一个能成功。
+    """
+    refresh = serializers.CharField()
+    access = serializers.CharField(read_only=True)
+
+    default_error_messages = {
+        'no_active_account': _('No active account found for the given token.')
+    }
+
+    def validate(self, attrs):
+        refresh = RevocableRefreshToken(attrs['refresh'])
+
+        try:
+            user = CachedJWTAuthentication().get_user(refresh)
+        except AuthenticationFailed:
+            user = None
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            with transaction.atomic():
+                if api_settings.BLACKLIST_AFTER_ROTATION and not revocation.revoke(refresh, user.pk):
+                    raise TokenError(_("Token is blacklisted"))
+
+                refresh.set_jti()
+                refresh.set_exp()
+                refresh.set_iat()
+                revocation.outstand(refresh, user.pk)
+
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    """
+    用户名密码登录（通过 SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER'] 启用）
+
+    与 simplejwt 默认实现相同，只是 last_login 记录到缓冲区批量写入（见 last_login.py），
+    不再每次登录都执行 User.save()。
+    """
+
+    def validate(self, attrs):
+        # 跳过父类中立即更新 last_login 的部分，只执行用户认证
+        data = TokenObtainSerializer.validate(self, attrs)
+
+        refresh = self.get_token(self.user)
+        data['refresh'] = str(refresh)
+        data['access'] = str(refresh.access_token)
+
+        if api_settings.UPDATE_LAST_LOGIN:
+            last_login.buffer.record(self.user.pk)
+
+        return data
@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from . import revocation
+from .cache import invalidate_user
 from .models import UserProfile
 
 @receiver(post_save, sender=User)
@@ -10,6 +14,27 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """确保用户资料随用户一起保存"""
-    instance.profile.save() 
\ No newline at end of file
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    """确保用户资料随用户一起保存（新用户的资料刚刚创建、只更新登录时间时无需再次保存）"""
+    if not created and update_fields != {'last_login'}:
+        instance.profile.save()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    """用户保存（包括停用、修改密码）或删除后，使认证缓存中的用户失效；只更新登录时间时不影响认证"""
+    if update_fields != {'last_login'}:
+        invalidate_user(instance.pk)
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """认证缓存中的用户连同资料一起保存，资料变化时同样失效"""
+    invalidate_user(instance.user_id)
+
+@receiver(post_save, sender=BlacklistedToken)
+def remember_revoked_token(sender, instance, created, **kwargs):
+    """任何途径吊销的刷新令牌提交后都写入共享缓存中的吊销集合，未命中集合即可认定未吊销"""
+    if created:
+        jti, exp = instance.token.jti, instance.token.expires_at.timestamp()
+        transaction.on_commit(lambda: revocation.remember(jti, exp))
@@ -1,3 +1,378 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from backend_xyyl.utils.async_views import AsyncAPIView
+from backend_xyyl.utils.single_flight import SingleFlight
+from . import last_login, provisioning, revocation, wechat
+from .cache import local_users, user_cache
+from .models import UserProfile
+from .views import UserViewSet
+from .wechat_stub import StubServer, openid_for_code
+
+
+class AsyncMeViewTests(TestCase):
+    me_view = staticmethod(AsyncAPIView.as_view(
+        viewset_class=UserViewSet, action='me', sync_actions={'patch': 'me'},
+        user_queryset=User.objects.select_related('profile'),
+    ))
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='testpass123', email='t@example.com')
+        self.user.profile.name = '测试'
+        self.user.profile.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def call(self, method='get', data=None, **extra):
+        request = getattr(AsyncRequestFactory(), method)('/api/users/me/', data, headers=self.headers, **extra)
+        return async_to_sync(self.me_view)(request)
+
+    def test_me_matches_sync_view_in_one_query(self):
+        expected = self.client.get('/api/users/me/').json()
+        with self.assertNumQueries(1):
+            response = self.call()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), expected)
+
+    def test_patch_uses_sync_view(self):
+        response = self.call('patch', json.dumps({'email': 'new@example.com'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'new@example.com')
+
+
+class WechatLoginTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubServer().start()
+        cls.slow_stub = StubServer(latency=0.5).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+        cls.slow_stub.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        for factory in (wechat.get_client, wechat.get_login_flight):
+            factory.cache_clear()
+            self.addCleanup(factory.cache_clear)
+        settings_override = override_settings(WECHAT_API_BASE_URL=self.stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def login(self, code):
+        return APIClient().post('/api/auth/wx-login/', {'code': code}, format='json')
+
+    def test_login_creates_user_once(self):
+        response = self.login('code-1')
+        self.assertEqual(response.status_code, 200)
+        profile = UserProfile.objects.get(openid=openid_for_code('code-1'))
+        self.assertEqual(response.json()['userInfo']['id'], str(profile.user_id))
+
+        self.assertEqual(self.login('code-1').status_code, 200)
+        self.assertEqual(User.objects.filter(profile__openid=openid_for_code('code-1')).count(), 1)
+
+    def test_api_error_returns_400(self):
+        response = self.login('invalid-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], '微信登录失败: invalid code')
+
+    def test_repeated_code_reuses_session(self):
+        before = self.stub.requests
+        first = self.login('code-repeat').json()
+        second = self.login('code-repeat').json()
+        self.assertEqual(self.stub.requests - before, 1)
+        self.assertEqual(first['userInfo'], second['userInfo'])
+        self.assertNotEqual(first['refreshToken'], second['refreshToken'])
+
+        # code 无效的结果同样被缓存
+        self.assertEqual(self.login('invalid-2').status_code, 400)
+        self.assertEqual(self.login('invalid-2').status_code, 400)
+        self.assertEqual(self.stub.requests - before, 2)
+
+    def test_timeout_returns_503(self):
+        with override_settings(WECHAT_API_BASE_URL=self.slow_stub.url, WECHAT_API_READ_TIMEOUT=0.1):
+            wechat.get_client.cache_clear()
+            wechat.get_login_flight.cache_clear()
+            response = self.login('code-slow')
+        self.assertEqual(response.status_code, 503)
+        # 读取超时不重试，code 可能已被微信使用
+        self.assertEqual(wechat.get_client().metrics.snapshot()['/sns/jscode2session']['retries'], 0)
+
+    def test_busy_is_retried_with_limit(self):
+        client = wechat.WechatClient('app', 'secret', base_url=self.stub.url, retries=2, backoff=0)
+        before = self.stub.requests
+        with self.assertRaises(wechat.WechatAPIError) as ctx:
+            client.code_to_session('busy-1')
+        self.assertEqual(ctx.exception.errcode, -1)
+        self.assertEqual(self.stub.requests - before, 3)
+
+        client.code_to_session('code-2')
+        metrics = client.metrics.snapshot()['/sns/jscode2session']
+        self.assertEqual((metrics['ok'], metrics['api_error'], metrics['retries']), (1, 1, 2))
+        self.assertGreaterEqual(metrics['p99_ms'], metrics['p50_ms'])
+
+    def test_connection_error_is_unavailable(self):
+        stub = StubServer()
+        url = stub.url
+        stub.httpd.server_close()
+        client = wechat.WechatClient('app', 'app-secret-value', base_url=url, retries=1, backoff=0)
+        with self.assertLogs('user_management.wechat', 'WARNING') as logs:
+            with self.assertRaises(wechat.WechatUnavailable) as ctx:
+                client.code_to_session('code-3')
+        self.assertEqual(client.metrics.snapshot()['/sns/jscode2session']['retries'], 1)
+        # 异常信息中的请求 URL 不能带出 AppSecret 和 code
+        for text in logs.output + [str(ctx.exception)]:
+            self.assertNotIn('app-secret-value', text)
+            self.assertNotIn('code-3', text)
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.flight = SingleFlight('test-flight', timeout=60, lock_timeout=2, poll_interval=0.01)
+
+    def test_concurrent_calls_compute_once(self):
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return {'value': 1}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.flight.do('k', compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 7)
+        self.assertEqual(self.flight.do('k', compute), ({'value': 1}, True))
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_other_worker(self):
+        # 另一个 worker 持有锁，完成后写入结果
+        other = SingleFlight('test-flight')
+        result_key, lock_key = other._keys('k')
+        cache.add(lock_key, 'other', 60)
+        threading.Timer(0.05, lambda: cache.set(result_key, 'done', 60)).start()
+        self.assertEqual(self.flight.do('k', lambda: self.fail('不应重复计算')), ('done', True))
+
+    def test_errors_are_shared_but_not_cached(self):
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            self.flight.do('k', fail)
+        self.assertEqual(self.flight.do('k', lambda: 'ok'), ('ok', False))
+
+
+class ProvisioningTests(TestCase):
+    def test_new_user_in_two_inserts(self):
+        # 事务的 SAVEPOINT / RELEASE 之外只有用户和用户资料两条 INSERT
+        with self.assertNumQueries(4):
+            user, created = provisioning.create_wechat_user('openid-1')
+        self.assertTrue(created)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(UserProfile.objects.get(user=user).openid, 'openid-1')
+
+    def test_existing_user_in_one_query(self):
+        provisioning.create_wechat_user('openid-1')
+        with self.assertNumQueries(1):
+            user, created = provisioning.provision_wechat_user('openid-1')
+            self.assertEqual(user.profile.openid, 'openid-1')
+        self.assertFalse(created)
+
+    def test_concurrent_create_returns_existing_user(self):
+        # 模拟另一个请求在本次查找之后抢先创建了同一个 openid 的用户
+        existing, _ = provisioning.create_wechat_user('openid-1')
+        user, created = provisioning.create_wechat_user('openid-1')
+        self.assertFalse(created)
+        self.assertEqual(user.pk, existing.pk)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_other_conflict_keeps_integrity_error(self):
+        User.objects.create_user(username='wx_openid-1')
+        with self.assertRaises(IntegrityError):
+            provisioning.create_wechat_user('openid-1')
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.user = User.objects.create_user(username='tester', password='testpass123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_cache_hit_needs_no_queries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.json()['username'], 'tester')
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_cache_table',
+    }})
+    def test_database_cache_hit_needs_no_queries(self):
+        call_command('createcachetable', stdout=StringIO())
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+        # 超过进程内缓存的确认时间后只读取一次版本号
+        with mock.patch.object(local_users, 'ttl', 0):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('test_cache_table', queries.captured_queries[0]['sql'])
+
+    def test_change_in_other_worker_applies_after_ttl(self):
+        self.client.get('/api/users/me/')
+        # 其他 worker 停用用户：只更换共享版本号，本进程的副本仍在
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            user_cache.bump(self.user.pk)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        with mock.patch.object(local_users, 'ttl', 0):
+            self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_profile_save_invalidates(self):
+        self.client.get('/api/users/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.name = '新名字'
+            self.user.profile.save()
+        self.assertEqual(self.client.get('/api/users/me/').json()['profile']['name'], '新名字')
+
+    def test_deactivated_user_rejected(self):
+        self.client.get('/api/users/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class TokenRefreshTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation.revoked_tokens.clear()
+        self.user = User.objects.create_user(username='tester', password='testpass123')
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_rotation_blacklists_old_token(self):
+        token = RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=token['jti']).exists())
+        self.assertTrue(OutstandingToken.objects.filter(jti=RefreshToken(response.json()['refresh'])['jti']).exists())
+
+        # 重复使用旧令牌由进程内 LRU 拒绝，不访问数据库
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_revoked_token_found_in_database(self):
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()
+        # 缓存已清空，吊销集合从数据库重建
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertIn(token['jti'], revocation.revoked_tokens)
+        self.assertIsNotNone(cache.get(revocation.LOADED_KEY))
+
+    def test_valid_refresh_skips_blacklist_lookup(self):
+        revocation.load()
+        token = RefreshToken.for_user(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        lookups = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and 'token_blacklist_blacklistedtoken' in query['sql']
+        ]
+        self.assertEqual(lookups, [])
+
+    def test_blacklist_outside_refresh_joins_revoked_set(self):
+        revocation.load()
+        token = RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        revocation.revoked_tokens.clear()
+        # 退出登录等途径吊销的令牌由信号写入共享缓存，检查时无需查询数据库
+        self.assertTrue(revocation.is_revoked(token['jti'], token['exp']))
+
+    def test_concurrent_refresh_only_one_succeeds(self):
+        token = RefreshToken.for_user(self.user)
+        # 第一个请求已吊销令牌，第二个请求在此之前通过了黑名单检查
+        self.assertTrue(revocation.revoke(token, self.user.pk))
+        self.assertFalse(revocation.revoke(token, self.user.pk))
+
+    def test_prune_tokens(self):
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()
+        OutstandingToken.objects.filter(jti=token['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+        live = RefreshToken.for_user(self.user)
+        call_command('prune_tokens', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class LastLoginTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpass123') for i in range(3)]
+        # 不启动后台线程，由测试控制写入时机
+        self.buffer = last_login.LastLoginBuffer(interval=None, max_size=100)
+        patcher = mock.patch.object(last_login, 'buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_login_is_buffered_and_flushed_in_one_update(self):
+        for user in self.users:
+            response = APIClient().post('/api/auth/login/', {'username': user.username, 'password': 'testpass123'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.buffer.pending(), 3)
+        self.assertFalse(User.objects.filter(last_login__isnull=False).exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(User.objects.filter(last_login__isnull=False).count(), 3)
+
+    def test_flush_when_full(self):
+        self.buffer.max_size = 2
+        self.buffer.record(self.users[0].pk)
+        self.assertEqual(self.buffer.pending(), 1)
+        self.buffer.record(self.users[1].pk)
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(User.objects.filter(last_login__isnull=False).count(), 2)
+
+    def test_last_login_save_skips_profile(self):
+        user = self.users[0]
+        user.last_login = timezone.now()
+        # 只有 users 表的一条 UPDATE，不再保存用户资料
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
@@ -5,6 +7,7 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
     TokenVerifyView,
 )
+from backend_xyyl.utils.async_views import AsyncAPIView
 from . import views
 
 router = DefaultRouter()
@@ -16,4 +19,13 @@ urlpatterns = [
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('auth/wx-login/', views.WechatLoginView.as_view(), name='wechat_login'),
-] 
\ No newline at end of file
+]
+
+if settings.ASYNC_API_VIEWS:
+    # ASGI 部署时当前用户信息的 GET 请求使用原生异步视图，认证时一并读取用户资料
+    urlpatterns = [
+        path('users/me/', AsyncAPIView.as_view(
+            viewset_class=views.UserViewSet, action='me', sync_actions={'patch': 'me'},
+            user_queryset=User.objects.select_related('profile'),
+        )),
+    ] + urlpatterns
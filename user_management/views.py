@@ -5,13 +5,14 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from django.conf import settings
 from rest_framework_simplejwt.tokens import RefreshToken
-import requests
 import json
-from .models import UserProfile
+import logging
+from . import provisioning, wechat
 from .serializers import UserSerializer, UserProfileSerializer, UserRegistrationSerializer
 
+logger = logging.getLogger(__name__)
+
 # Create your views here.
 
 class WechatLoginView(APIView):
@@ -19,65 +20,62 @@ class WechatLoginView(APIView):
     
     def post(self, request):
         """微信小程序登录"""
-        # 记录请求内容，帮助调试
-        print(f"收到微信登录请求，数据: {request.data}")
+        # 请求数据包含一次性的登录 code，不写入日志
+        logger.debug("收到微信登录请求")
         
         code = request.data.get('code')
         if not code:
-            print("错误: 请求中缺少code参数")
+            logger.warning("微信登录请求缺少code参数")
             return Response(
                 {'error': '缺少code参数'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
-            # 这里需要替换为您的小程序AppID和AppSecret
-            appid = settings.WECHAT_APP_ID
-            secret = settings.WECHAT_APP_SECRET
-            
-            print(f"使用的配置 - AppID: {appid}, AppSecret: {secret[:3]}***")
-            
-            # 调用微信API获取openid
-            wx_url = f'https://api.weixin.qq.com/sns/jscode2session?appid={appid}&secret={secret}&js_code={code}&grant_type=authorization_code'
-            response = requests.get(wx_url)
-            data = response.json()
-            
-            print(f"微信API响应: {data}")
-            
-            if 'errcode' in data and data['errcode'] != 0:
-                print(f"微信API错误: {data.get('errcode')} - {data.get('errmsg')}")
+            # 调用微信API获取openid并查找或创建用户（复用连接池，带超时和有限次重试；
+            # 同一个 code 的重复请求合并为一次调用，结果短时间缓存）
+            provisioned = {}
+
+            def provision(openid):
+                user, created = provisioning.provision_wechat_user(openid)
+                logger.debug("%s: user_id=%s", '创建新用户' if created else '找到已存在用户', user.pk)
+                provisioned['user'] = user
+                return user.id
+
+            try:
+                session, shared = wechat.resolve_login(code, provision)
+            except wechat.WechatAPIError as e:
+                logger.warning("微信API错误: %s - %s", e.errcode, e.errmsg)
                 return Response(
-                    {'error': f'微信登录失败: {data.get("errmsg")}'}, 
+                    {'error': f'微信登录失败: {e.errmsg}'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            except wechat.WechatUnavailable as e:
+                logger.warning("微信API不可用: %s", e)
+                return Response(
+                    {'error': '微信服务暂时不可用，请稍后重试'}, 
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             
-            openid = data.get('openid')
+            logger.debug("微信登录会话: 共享结果=%s", shared)
+            
+            openid = session['openid']
             if not openid:
-                print("错误: 未获取到openid")
+                logger.warning("微信登录失败: 未获取到openid")
                 return Response(
                     {'error': '微信登录失败: 未获取到openid'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # 查找或创建用户
-            try:
-                profile = UserProfile.objects.get(openid=openid)
-                user = profile.user
-                username = user.username  # 为现有用户获取username
-                print(f"找到已存在用户: {username}")
-            except UserProfile.DoesNotExist:
-                # 创建新用户
-                username = f'wx_{openid}'
-                user = User.objects.create_user(
-                    username=username,
-                    password=None,  # 微信用户无需密码
-                    email=''
-                )
-                # 创建或获取用户档案
-                profile, created = UserProfile.objects.get_or_create(user=user)
-                profile.openid = openid
-                profile.save()
-                print(f"创建新用户: {username}")
+            # 本次请求完成了查找或创建时直接使用，共享其他请求的结果时按ID读取
+            user = provisioned.get('user')
+            if user is None:
+                user = User.objects.select_related('profile').filter(pk=session['user_id']).first()
+            if user is None:
+                # 缓存有效期内用户被删除，重新创建
+                user, created = provisioning.provision_wechat_user(openid)
+            profile = user.profile
+            username = user.username
             
             # 生成JWT令牌
             refresh = RefreshToken.for_user(user)
@@ -104,14 +102,11 @@ class WechatLoginView(APIView):
                 }
             }
             
-            print("登录成功，返回用户信息和令牌")
-            print(f"返回数据: {response_data}")
+            # 返回数据包含令牌和 openid，不写入日志
+            logger.debug("微信登录成功: user_id=%s", user.pk)
             return Response(response_data)
         except Exception as e:
-            import traceback
-            error_trace = traceback.format_exc()
-            print(f"服务器错误: {str(e)}")
-            print(f"错误详情: {error_trace}")
+            logger.exception("微信登录处理失败")
             return Response(
                 {'error': f'服务器错误: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -146,6 +141,14 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    async def ame(self, request):
+        """
+        me 的 GET 异步版本，由 ASGI 部署下的异步视图调用
+
+        异步视图认证时已用 select_related 一并读取用户资料，序列化时不再访问数据库
+        """
+        return Response(UserSerializer(request.user).data)
+
     @action(detail=False, methods=['get', 'put'], url_path='me/profile')
     def my_profile(self, request):
         """获取或更新当前用户的详细资料"""
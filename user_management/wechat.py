@@ -0,0 +1,230 @@
+"""
+微信开放接口客户端
+
+所有请求复用同一个 requests.Session 的连接池，避免每次登录都重新建立 TLS 连接；
+每次请求都设置连接超时和读取超时，微信接口变慢时不会无限期占用 worker。
+失败重试次数有上限，每次重试前按指数退避并加入随机抖动，避免大量请求同时重试。
+
+jscode2session 的 code 只能使用一次，请求已经发出后（读取超时）再重试可能得到 code 已被使用的错误，
+因此只在请求未送达（连接失败）或微信返回系统繁忙（errcode=-1）时重试。
+
+小程序启动时常常连续发起两次登录，resolve_login 把同一个 code 的并发请求合并为一次微信接口调用和一次用户查找，
+结果在共享缓存中保存 WECHAT_LOGIN_CACHE_TIMEOUT 秒，跨线程和 worker 生效。
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from backend_xyyl.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 微信返回系统繁忙，可以重试
+ERRCODE_BUSY = -1
+
+# requests 的异常信息带有完整的请求 URL，其中的 AppSecret 和一次性 code 不能写入日志
+SENSITIVE_PARAMS = re.compile(r'\b(secret|js_code)=[^&\s\'"]*')
+
+
+def redact(text):
+    return SENSITIVE_PARAMS.sub(r'\1=***', text)
+
+
+class WechatError(Exception):
+    """调用微信接口失败"""
+
+
+class WechatAPIError(WechatError):
+    """微信接口返回了错误码"""
+
+    def __init__(self, errcode, errmsg):
+        super().__init__(f'{errcode} - {errmsg}')
+        self.errcode = errcode
+        self.errmsg = errmsg
+
+
+class WechatUnavailable(WechatError):
+    """网络错误、超时或微信服务端错误，重试后仍然失败"""
+
+
+class LatencyMetrics:
+    """
+    进程内的接口调用指标
+
+    按接口和结果（ok / api_error / unavailable）计数，并保留最近 window 次调用的耗时用于计算分位数。
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counts = {}
+        self._latencies = {}
+
+    def record(self, endpoint, outcome, seconds, attempts=1):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, {'ok': 0, 'api_error': 0, 'unavailable': 0, 'retries': 0})
+            counts[outcome] += 1
+            counts['retries'] += attempts - 1
+            self._latencies.setdefault(endpoint, deque(maxlen=self._window)).append(seconds)
+
+    def snapshot(self):
+        """返回 {接口: {计数..., p50_ms, p95_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            result = {}
+            for endpoint, counts in self._counts.items():
+                latencies = sorted(self._latencies[endpoint])
+                result[endpoint] = {
+                    **counts,
+                    **{
+                        f'p{int(q * 100)}_ms': round(latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000, 2)
+                        for q in (0.5, 0.95, 0.99)
+                    },
+                    'max_ms': round(latencies[-1] * 1000, 2),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._latencies.clear()
+
+
+class WechatClient:
+    def __init__(self, appid, secret, base_url='https://api.weixin.qq.com', timeout=(3.05, 5),
+                 retries=2, backoff=0.1, pool_size=10):
+        self.appid = appid
+        self.secret = secret
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.metrics = LatencyMetrics()
+
+        self.session = requests.Session()
+        # 重试由 _get 控制，适配器本身不重试
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def max_duration(self):
+        """一次调用（含全部重试）的最长耗时估计（秒）"""
+        timeout = sum(self.timeout) if isinstance(self.timeout, tuple) else self.timeout
+        return timeout * (self.retries + 1) + self.backoff * (2 ** (self.retries + 1))
+
+    def code_to_session(self, code):
+        """用小程序登录 code 换取 {openid, session_key, unionid?}"""
+        return self._get('/sns/jscode2session', {
+            'appid': self.appid,
+            'secret': self.secret,
+            'js_code': code,
+            'grant_type': 'authorization_code',
+        })
+
+    def _sleep_before_retry(self, attempt):
+        # 全抖动的指数退避：在 [0, backoff * 2^attempt] 内随机等待
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def _get(self, path, params):
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                data = self._request(path, params)
+            except requests.ConnectionError as e:
+                # 读取超时（ReadTimeout 不是 ConnectionError）说明请求已送达，不能重试
+                error = WechatUnavailable(redact(f'连接微信服务失败: {e}'))
+                retryable = not isinstance(e, requests.ReadTimeout)
+            except requests.Timeout as e:
+                error, retryable = WechatUnavailable(redact(f'微信服务响应超时: {e}')), False
+            except (requests.RequestException, ValueError) as e:
+                error, retryable = WechatUnavailable(redact(f'微信服务响应异常: {e}')), False
+            else:
+                errcode = data.get('errcode', 0)
+                if not errcode:
+                    self._record(path, 'ok', start, attempt)
+                    return data
+                error = WechatAPIError(errcode, data.get('errmsg', ''))
+                retryable = errcode == ERRCODE_BUSY
+
+            if not retryable or attempt >= self.retries:
+                self._record(path, 'api_error' if isinstance(error, WechatAPIError) else 'unavailable', start, attempt)
+                raise error
+            attempt += 1
+            logger.warning('微信接口 %s 调用失败，第 %d 次重试: %s', path, attempt, error)
+            self._sleep_before_retry(attempt)
+
+    def _request(self, path, params):
+        response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout)
+        if response.status_code >= 500:
+            # 服务端错误时请求可能已被处理，按不可重试处理
+            raise requests.HTTPError(f'HTTP {response.status_code}', response=response)
+        return response.json()
+
+    def _record(self, path, outcome, start, attempt):
+        elapsed = time.perf_counter() - start
+        self.metrics.record(path, outcome, elapsed, attempts=attempt + 1)
+        logger.debug('微信接口 %s %s，耗时 %.1fms，尝试 %d 次', path, outcome, elapsed * 1000, attempt + 1)
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """进程内共享的客户端（连接池在线程间共享）；修改配置后调用 get_client.cache_clear() 重新创建"""
+    return WechatClient(
+        appid=settings.WECHAT_APP_ID,
+        secret=settings.WECHAT_APP_SECRET,
+        base_url=settings.WECHAT_API_BASE_URL,
+        timeout=(settings.WECHAT_API_CONNECT_TIMEOUT, settings.WECHAT_API_READ_TIMEOUT),
+        retries=settings.WECHAT_API_RETRIES,
+        pool_size=settings.WECHAT_API_POOL_SIZE,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_login_flight():
+    return SingleFlight(
+        'wechat-login',
+        timeout=settings.WECHAT_LOGIN_CACHE_TIMEOUT,
+        # 留出查找或创建用户的时间
+        lock_timeout=get_client().max_duration + 10,
+    )
+
+
+def resolve_login(code, provision):
+    """
+    用 code 换取 openid，并调用 provision(openid) 找到或创建对应的用户
+
+    同一个 code 的并发请求以及缓存有效期内的重复请求只调用一次微信接口和 provision。
+    code 无效、已被使用等错误同样会被缓存，重复请求得到相同的错误而不是 code 已被使用；
+    系统繁忙和网络错误不缓存。
+    返回 ({'openid', 'unionid', 'user_id'}, 是否共享了其他请求的结果)
+    """
+    def compute():
+        try:
+            data = get_client().code_to_session(code)
+        except WechatAPIError as e:
+            if e.errcode == ERRCODE_BUSY:
+                raise
+            return {'errcode': e.errcode, 'errmsg': e.errmsg}
+        openid = data.get('openid')
+        return {
+            'openid': openid,
+            'unionid': data.get('unionid'),
+            'user_id': provision(openid) if openid else None,
+        }
+
+    try:
+        result, shared = get_login_flight().do(code, compute)
+    except TimeoutError as e:
+        raise WechatUnavailable(str(e))
+    if result.get('errcode'):
+        raise WechatAPIError(result['errcode'], result['errmsg'])
+    return result, shared
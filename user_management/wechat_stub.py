@@ -0,0 +1,112 @@
+"""
+本地模拟的微信开放接口，用于离线联调和压测登录流程
+
+只实现 /sns/jscode2session：同一个 code 总是得到同一个 openid（由 code 计算），
+可以设置固定延迟和按比例返回的错误。约定的 code 用于触发特定响应：
+- invalid-*: 返回 errcode=40029（code 无效）
+- busy-*: 返回 errcode=-1（系统繁忙）
+
+    server = StubServer(latency=0.05).start()
+    ... settings.WECHAT_API_BASE_URL = server.url ...
+    server.stop()
+"""
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def openid_for_code(code):
+    return 'stub-' + hashlib.sha256(code.encode()).hexdigest()[:24]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # 使用 HTTP/1.1 以支持长连接，客户端的连接池才能复用连接
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体一次写出，避免长连接上 Nagle 算法与延迟确认叠加造成约 40ms 的等待
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/sns/jscode2session':
+            self._send(404, {'errcode': 404, 'errmsg': 'not found'})
+            return
+
+        stub = self.server.stub
+        stub.count_request()
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        code = params.get('js_code', '')
+        if not code or code.startswith('invalid-'):
+            self._send(200, {'errcode': 40029, 'errmsg': 'invalid code'})
+        elif code.startswith('busy-') or (stub.error_rate and random.random() < stub.error_rate):
+            self._send(200, {'errcode': -1, 'errmsg': 'system error'})
+        else:
+            self._send(200, {
+                'openid': openid_for_code(code),
+                'session_key': hashlib.md5(code.encode()).hexdigest(),
+            })
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.stub.verbose:
+            super().log_message(format, *args)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端超时后断开连接是预期情况，不输出异常
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, verbose=False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = _HTTPServer((host, port), StubHandler)
+        self.httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        """在后台线程中运行"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()